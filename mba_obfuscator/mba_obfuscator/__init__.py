@@ -1,6 +1,7 @@
 """MBA generation module, containing:
 
 - truthtable_generate.py: functions to generate entire 2/3/4-variable truth table.
+- truthtable_dataset.py: the process-wide registry of the parsed entire truth tables.
 - lMBA_generate.py: module of linear MBA expression generation
 - pMBA_generate.py: module of polynomial MBA expression generation
 - npMBA_generate.py: module of non-polynomial MBA expression generation
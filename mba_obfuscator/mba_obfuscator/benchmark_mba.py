@@ -0,0 +1,327 @@
+#!/usr/bin/python3
+
+"""
+benchmark for the performance of MBA expression generation,
+comparing the new implementation with the original one.
+"""
+
+import os
+import re
+import sys
+sys.path.append("../tools")
+import time
+
+from lMBA_generate import complex_groundtruth
+from mba_string_operation import postfix, postfix_cal, truthtable_bitwise, expression_2_term, generate_coe_bit, variable_list, truthtable_cache_info, truthtable_cache_clear, truthtable_expression, truthtable_matrix
+
+
+
+#the string helpers before the shared term scanner and parser, the references of benchmark_parse.
+def legacy_postfix(itemString):
+    """the character loop of postfix before the shared parser.
+    """
+    itemStr = ""
+    boperatorList = ["&", "|", "^"]
+    uoperator = "~"
+    opeList = []
+
+    for (idx, char) in enumerate(itemString):
+         #open parenthesis, stack it
+        if char == "(":
+            opeList.append(char)
+        #binary operatork, stack it
+        elif char in boperatorList:
+            opeList.append(char)
+        #unary operator
+        elif uoperator in char:
+            opeList.append(char)
+        #closed parenthesis, pop out the operator to string
+        elif char == ")":
+            while(opeList and opeList[-1] != "("):
+                itemStr += opeList[-1]
+                opeList.pop()
+            if opeList and opeList[-1] != "(":
+                print("error!")
+                sys.exit(0)
+            #open parenthesis found
+            opeList.pop()
+            #unary operator found before open parenthesis
+            while(opeList and opeList[-1] == "~"):
+                itemStr += opeList[-1]
+                opeList.pop()
+        #variable name found
+        else:
+            itemStr += char
+            #top of stack is unary operator
+            while(opeList and opeList[-1] in uoperator):
+                itemStr += opeList[-1]
+                opeList.pop()
+
+    if len(opeList) > 1:
+        print("error in function postfix!")
+        sys.exit(0)
+    #have one operator without parenthesis
+    elif len(opeList):
+        itemStr += opeList[0]
+
+    return itemStr
+
+
+def legacy_expression_2_term(expreStr):
+    """the regex split of expression_2_term before the shared parser, the "+"/"-" in the parentheses are split as well.
+    """
+    itemList = re.split("([\+-])", expreStr)
+    item0 = itemList[0]
+    termList = []
+    constantList = []
+    if item0 != "":
+        itemList.insert(0, "")
+    for (idx, item) in enumerate(itemList):
+        if item == "+" or item == "-" or item == "":
+            continue
+        #bitwise term
+        elif re.search("\w+", item):
+            term = itemList[idx - 1] + itemList[idx]
+            termList.append(term)
+        #constant term
+        elif re.search("\d+", item):
+            term = itemList[idx - 1] + itemList[idx]
+            constantList.append(term)
+        else:
+            print("This is something wrong in mba expression.")
+            traceback.print_stack()
+            sys.exit(0)
+
+    return termList +  constantList
+
+
+def legacy_generate_coe_bit(mbatermList):
+    """the regex split of generate_coe_bit before the shared parser.
+    """
+    coeBitList = []
+    for term in mbatermList:
+        itemList = re.split("\*", term)
+        maycoe= itemList[0]
+        #not coefficient
+        if not bool(re.search("\d", maycoe)):
+            bit = itemList[0]
+            bit = bit.replace("+", "")
+            if "-" not in term:
+                coe = 1
+            else:
+                coe = -1
+                bit = bit.replace("-", "")
+            coeBitList.append([coe, bit])
+        #multi bitwise expression
+        elif len(itemList) >= 2:
+            #1 is for the first time synbol
+            bit = term[len(maycoe)+1:]
+            coeBitList.append([maycoe, bit])
+        #only constant
+        elif len(itemList) == 1 and bool(re.search("\d", maycoe)):
+            coeValue = int(maycoe) * -1
+            coeBitList.append([str(coeValue), "~(x&~x)"])
+            
+        else:
+            print("error in function of generate_coe_bit")
+            exit(0)
+
+    return coeBitList
+
+
+def legacy_variable_list(expreStr):
+    """the character scan of variable_list before the shared parser.
+    """
+    varSet = set(expreStr)
+    variableList = []
+    for i in varSet:
+        #the variable name
+        if i in ["x", "y", "z", "t", "a", "b", "c", "d", "e", "f"]:
+            variableList.append(i)
+
+    return variableList
+
+
+
+def get_bitwise_expression(vnumber):
+    """collect the bitwise expressions from the truth table and linear MBA datasets.
+    Args:
+        vnumber: the number of variables.
+    Returns:
+        bitList: the list of bitwise expressions.
+    """
+    abspath = os.path.realpath(__file__)
+    (dirpath, filename) = os.path.split(abspath)
+    bitList = []
+    filename = "{dirpath}/../dataset/{vnumber}variable_truthtable.txt".format(dirpath=dirpath, vnumber=vnumber)
+    if os.path.exists(filename):
+        with open(filename, "r") as fr:
+            for line in fr:
+                if "#" not in line:
+                    bitList.append(re.split(",", line.strip())[1])
+    filename = "{dirpath}/../dataset/lMBA_{vnumber}variable.dataset.sorted.txt".format(dirpath=dirpath, vnumber=vnumber)
+    if os.path.exists(filename):
+        with open(filename, "r") as fr:
+            for line in fr:
+                if "#" not in line:
+                    expreStr = re.split(",", line.strip())[0]
+                    for (coe, bit) in generate_coe_bit(expression_2_term(expreStr)):
+                        bitList.append(bit)
+
+    return bitList
+
+
+def benchmark_truthtable(repeat=3):
+    """the packed integer truth table against postfix/postfix_cal.
+    Args:
+        repeat: the number of times to evaluate every bitwise expression.
+    """
+    for vnumber in [2, 3, 4]:
+        bitList = get_bitwise_expression(vnumber)
+        if not bitList:
+            continue
+        start = time.time()
+        for i in range(repeat):
+            oldList = [postfix_cal(postfix(bit), vnumber) for bit in bitList]
+        oldElapsed = time.time() - start
+        #every pass misses the cache
+        start = time.time()
+        for i in range(repeat):
+            truthtable_cache_clear()
+            newList = [truthtable_bitwise(bit, vnumber) for bit in bitList]
+        newElapsed = time.time() - start
+        assert oldList == newList, "the packed truth table is different from postfix_cal!"
+        #the following passes hit the cache
+        start = time.time()
+        for i in range(repeat):
+            newList = [truthtable_bitwise(bit, vnumber) for bit in bitList]
+        cacheElapsed = time.time() - start
+        print("{vnumber}-variable, {number} bitwise expressions: postfix {old:.3f}s, bitmask {new:.3f}s, speedup {speedup:.1f}x, cached {cache:.3f}s".format(vnumber=vnumber, number=len(bitList) * repeat, old=oldElapsed, new=newElapsed, speedup=oldElapsed / newElapsed, cache=cacheElapsed))
+
+    return None
+
+
+def benchmark_cache(groundtruthList=None, repeat=10):
+    """the effect of the bitwise expression cache on a batch of linear MBA generation.
+    Args:
+        groundtruthList: the ground truths to complex.
+        repeat: the number of times to complex every ground truth.
+    """
+    if not groundtruthList:
+        groundtruthList = ["x+y", "x-y", "(x&y)", "(x|y)", "(x^y)", "0", "1", "x", "~x"]
+    truthtable_cache_clear()
+    start = time.time()
+    for i in range(repeat):
+        for groundtruth in groundtruthList:
+            complex_groundtruth(groundtruth)
+    elapsed = time.time() - start
+    print("linear MBA generation of {number} expressions costs {elapsed:.3f}s, bitwise cache:".format(number=len(groundtruthList) * repeat, elapsed=elapsed), truthtable_cache_info())
+
+    return None
+
+def benchmark_matrix(vnumber=4):
+    """the batch signature matrix against truthtable_expression on the sample datasets,
+    the complex linear expression and its ground truth in one line have the same signature.
+    Args:
+        vnumber: the number of variables.
+    """
+    abspath = os.path.realpath(__file__)
+    (dirpath, filename) = os.path.split(abspath)
+    for name in ["nonpoly", "poly"]:
+        filename = "{dirpath}/../../samples/ground.linear.{name}.txt".format(dirpath=dirpath, name=name)
+        if not os.path.exists(filename):
+            continue
+        linearList = []
+        groundtruthList = []
+        with open(filename, "r") as fr:
+            for line in fr:
+                if "#" in line:
+                    continue
+                itemList = re.split(",", line.strip())
+                linearList.append(itemList[0])
+                groundtruthList.append(itemList[1])
+        truthtable_cache_clear()
+        start = time.time()
+        oldList = [truthtable_expression(expreStr, vnumber) for expreStr in linearList + groundtruthList]
+        oldElapsed = time.time() - start
+        truthtable_cache_clear()
+        start = time.time()
+        signatureMatrix = truthtable_matrix(linearList + groundtruthList, vnumber)
+        newElapsed = time.time() - start
+        assert signatureMatrix.tolist() == oldList, "the signature matrix is different from truthtable_expression!"
+        number = len(linearList)
+        sameNumber = int((signatureMatrix[:number] == signatureMatrix[number:]).all(axis=1).sum())
+        print("ground.linear.{name}.txt, {number} lines, {same} equal signatures: truthtable_expression {old:.3f}s, truthtable_matrix {new:.3f}s".format(name=name, number=number, same=sameNumber, old=oldElapsed, new=newElapsed))
+
+    return None
+
+
+
+def benchmark_parse(repeat=3):
+    """the shared term scanner and parser against the regex string helpers on ground.linear.nonpoly.txt,
+    the throughput of expression_2_term + generate_coe_bit + variable_list on every column, and postfix on the bitwise expressions.
+    Args:
+        repeat: the number of times to parse every expression.
+    """
+    abspath = os.path.realpath(__file__)
+    (dirpath, filename) = os.path.split(abspath)
+    filename = "{dirpath}/../../samples/ground.linear.nonpoly.txt".format(dirpath=dirpath)
+    if not os.path.exists(filename):
+        return None
+    columnList = [[], [], []]
+    with open(filename, "r") as fr:
+        for line in fr:
+            if "#" in line:
+                continue
+            for (idx, item) in enumerate(re.split(",", line.strip())):
+                columnList[idx].append(item)
+    for (name, expreList) in zip(["linear", "groundtruth", "nonpoly"], columnList):
+        start = time.time()
+        for i in range(repeat):
+            oldList = []
+            for expreStr in expreList:
+                try:
+                    oldList.append((legacy_expression_2_term(expreStr), legacy_generate_coe_bit(legacy_expression_2_term(expreStr)), legacy_variable_list(expreStr)))
+                except SystemExit:
+                    oldList.append(None)
+        oldElapsed = time.time() - start
+        start = time.time()
+        for i in range(repeat):
+            newList = [(expression_2_term(expreStr), generate_coe_bit(expression_2_term(expreStr)), variable_list(expreStr)) for expreStr in expreList]
+        newElapsed = time.time() - start
+        #the terms make up the expression
+        for (expreStr, newItem) in zip(expreList, newList):
+            assert "".join(newItem[0]).replace(" ", "") == expreStr.replace(" ", ""), "the terms are different from the expression!"
+        splitNumber = sum(1 for (oldItem, newItem) in zip(oldList, newList) if not oldItem or oldItem[0] != newItem[0])
+        if name != "nonpoly":
+            assert splitNumber == 0, "the terms are different from the regex split!"
+            assert all(sorted(oldItem[2]) == sorted(newItem[2]) for (oldItem, newItem) in zip(oldList, newList)), "the variables are different!"
+        number = len(expreList) * repeat
+        print("{name}, {number} expressions: regex {old:.3f}s({oldput:.0f}/s), shared {new:.3f}s({newput:.0f}/s), {split} expressions split differently".format(name=name, number=number, old=oldElapsed, oldput=number / oldElapsed, new=newElapsed, newput=number / newElapsed, split=splitNumber))
+    bitList = [bit for expreStr in columnList[0] for (coe, bit) in generate_coe_bit(expression_2_term(expreStr))]
+    start = time.time()
+    for i in range(repeat):
+        oldList = [legacy_postfix(bit) for bit in bitList]
+    oldElapsed = time.time() - start
+    start = time.time()
+    for i in range(repeat):
+        newList = [postfix(bit) for bit in bitList]
+    newElapsed = time.time() - start
+    assert [postfix_cal(item, 4) for item in oldList] == [postfix_cal(item, 4) for item in newList], "the postfix is different from the character loop!"
+    print("postfix, {number} bitwise expressions: character loop {old:.3f}s, shared {new:.3f}s".format(number=len(bitList) * repeat, old=oldElapsed, new=newElapsed))
+
+    return None
+
+
+
+def main():
+    benchmark_truthtable()
+    benchmark_cache()
+    benchmark_matrix()
+    benchmark_parse()
+
+    return None
+
+
+if __name__ == "__main__":
+    main()
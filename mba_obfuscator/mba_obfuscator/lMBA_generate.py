@@ -13,6 +13,7 @@ Given one simplified MBA expression:
 """
 
 import argparse
+import itertools
 import numpy as np
 import os
 import random
@@ -21,7 +22,11 @@ import sys
 sys.path.append("../tools")
 import traceback
 import z3
-from mba_string_operation import verify_mba_unsat, truthtable_term_list, truthtable_expression, combine_term, variable_list
+from mba_ir import LinearMBA, linear_mba_parse
+from mba_shard import generate_dataset_shards
+from mba_string_operation import truthtable_term_list, truthtable_expression, truthtable_vnumber, expression_2_term, DEFAULT_POLICY
+from mba_verify_pool import Z3VerifyPool, Z3_FLAG
+from truthtable_dataset import get_truthtable_basis
 
 
 class LinearMBAGenerator():
@@ -30,8 +35,10 @@ class LinearMBAGenerator():
         vnumber: the number of variables.
         coeList: the set of coefficient existing in one mba expression 
         maxterm: the maximum number of terms contained in one mba expression.
+        basis: "default" for the truth table of the dataset, "minimal" for the minimal truth table.
+        policy: the VerifyPolicy object of the verification of the rows.
     """
-    def __init__(self, vnumber, coeList=None, maxterm=100):
+    def __init__(self, vnumber, coeList=None, maxterm=100, basis="default", policy=None):
         if vnumber in [1, 2, 3, 4]:
             self.vnumber = vnumber
         else:
@@ -43,96 +50,131 @@ class LinearMBAGenerator():
         else:
             self.coeList = coeList
         self.maxterm = maxterm
-        self.standardBitList = [None] * 2**vnumber
-        self.nonstandardBitList = [] 
+        self.basis = basis
+        if not policy:
+            self.policy = DEFAULT_POLICY
+        else:
+            self.policy = policy
+        self.standardBitList = None
+        self.nonstandardBitList = None
         self.get_truthtable()
 
         return None
 
 
     def get_truthtable(self):
-        """read the entire truth table from the related file. 
+        """get the entire truth table from the process-wide registry, the related file is read only once.
         Args:
             vnumber: the number of variables.
         """
-        abspath = os.path.realpath(__file__)
-        (dirpath, filename) = os.path.split(abspath)
-        fileread = "{dirpath}/../dataset/{vnumber}variable_truthtable.txt".format(dirpath=dirpath, vnumber=self.vnumber)
-        #check the file of truth table
-        #try:
-        #    with open(fileread, "r") as fr:
-        #        pass
-        #except:
-        #    command = """ python3 -c "from truthtable_generate import exec_all; exec_all()" """
-        #    os.system(command)
-
-        with open(fileread, "r") as fr:
-            linenum = 0
-            for line in fr:
-                if "#" not in line:
-                    line = line.strip("\n")
-                    itemList = re.split(",", line)
-                    truthtable = itemList[0]
-                    bitwiseExpre = itemList[1]
-                    #discard the zero value
-                    if not re.search("1", truthtable):
-                        continue
-                    #standard basis vector
-                    elif truthtable.count("1") == 1:
-                        truthtable = truthtable.strip("[]")
-                        truthtableList = [int(item) for item in truthtable.split(" ")]
-                        index = truthtableList.index(1)
-                        self.standardBitList[index] = bitwiseExpre
-                    else:
-                        self.nonstandardBitList.append(bitwiseExpre)
+        truthBasis = get_truthtable_basis(self.vnumber, basis=self.basis)
+        self.standardBitList = truthBasis.standardBitList
+        self.nonstandardBitList = truthBasis.nonstandardBitList
     
         return None
 
 
-    def generate_lmba_dataset(self, mbanumber):
+    def generate_lmba_dataset(self, mbanumber, pool=None, jobs=None, seed=0, shardnumber=None, bitnumber=2):
         """generate the linear MBA expression dataset.
         Args:
             mbanumber: the nubmer of mba expression in the dataset.
+            pool: the Z3VerifyPool object verifying the expressions in parallel, None for one by one.
+            jobs: the number of the processes generating the shards, None for the global random module in this process.
+            seed: the master seed of the shards.
+            shardnumber: the number of the shards, None for the number of the processes.
+            bitnumber: the number of the bits of the variable in the verification.
+        """
+        if pool and jobs:
+            print("the pool can not verify the shards of the jobs, choose one of them!")
+            traceback.print_stack()
+            sys.exit(0)
+        filewrite = "../dataset/lMBA_" + str(self.vnumber) + "variable.dataset.txt"
+        if jobs:
+            stats = generate_dataset_shards(self.generate_lmba_row, {}, self.verify_row, mbanumber, filewrite, "#complex, groundtruth, z3flag", jobs, seed, shardnumber, bitnumber)
+            print(stats)
+            return None
+        with open(filewrite, "w") as fw:
+            print("#complex, groundtruth, z3flag", file=fw)
+            for row in self.lmba_iter(mbanumber, pool, bitnumber=bitnumber):
+                if not pool:
+                    print("z3 solved: ", row[2])
+                print(*row, sep=",", file=fw, flush=True)
+
+        return None
+
+
+    def lmba_iter(self, mbanumber=None, pool=None, rng=None, bitnumber=2):
+        """the rows of the linear MBA expression dataset one by one, at most one window of rows is in the pool.
+        Args:
+            mbanumber: the nubmer of mba expression, None for no end.
+            pool: the Z3VerifyPool object verifying the expressions in parallel, None for one by one.
+            rng: the random.Random object, None for the global random module.
+            bitnumber: the number of the bits of the variable in the verification.
+        Yields:
+            (leftExpre, rightExpre, z3res): one row of the dataset.
+        """
+        indexIter = range(mbanumber) if mbanumber is not None else itertools.count()
+        pairIter = (self.generate_lmba_row(rng) for i in indexIter)
+        if not pool:
+            for (leftExpre, rightExpre) in pairIter:
+                yield (leftExpre, rightExpre, self.verify_row(leftExpre, rightExpre, bitnumber))
+        else:
+            for ((leftExpre, rightExpre), result) in pool.verify_iter(((pair[0], pair[1], pair) for pair in pairIter), bitnumber):
+                yield (leftExpre, rightExpre, Z3_FLAG[result])
+
+        return None
+
+
+    def verify_row(self, leftExpre, rightExpre, bitnumber=2):
+        """verify one row of the dataset by the policy of the generator, the row is one final expression.
+        Args:
+            leftExpre: the left side of the equation.
+            rightExpre: the right side of the equation.
+            bitnumber: the number of the bits of the variable.
+        Returns:
+            z3res: True for the equation.
+        """
+        return self.policy.verify(leftExpre, rightExpre, bitnumber, kind="linear", final=True)
+
+
+    def generate_lmba_row(self, rng=None):
+        """generate one row of the linear MBA expression dataset.
+        Args:
+            rng: the random.Random object, None for the global random module.
+        Returns:
+            (leftExpre, rightExpre): the left and right side of one mba equation.
         """
         leftLen = len(self.nonstandardBitList)
-        filewrite = "../dataset/lMBA_" + str(vnumber) + "variable.dataset.txt"
-        fw = open(filewrite, "w")
-        print("#complex, groundtruth, z3flag", file=fw)
-    
-        #linenum = 0
         #the number of the bitwise items from 2 to self.maxterm.
         termNumberList = list(range(3, leftLen, 1))[:self.maxterm]
         #termNumberList = list(range(3, leftLen, 1))[:20]
         #termNumberList = list(range(3, leftLen, 1))[:2]
-        for i in range(mbanumber):
-            k = random.choice(termNumberList)
-            bitExprek = random.sample(self.nonstandardBitList, k)
-            coek = random.sample(self.coeList, k)
-            leftExpreList = []
-            #obtain the mba items of left side of the equation 
-            for i in range(len(coek)):
-                coe = coek[i]
-                bitwiseExpre = bitExprek[i]
-                if coe == 1:
-                    #for the consistent format
-                    leftExpreList.append(str(coe) + "*" + bitwiseExpre)
-                else:
-                    leftExpreList.append(str(coe) + "*" + bitwiseExpre)
-            #generate the mba expression over 3 variables.
-            (leftExpre, rightExpre) = self.generate_mba_expression(leftExpreList)
-            print("z3 solving...")
-            z3res = verify_mba_unsat(leftExpre, rightExpre, 2)
-            print("z3 solved: ", z3res)
-            print(leftExpre, rightExpre, z3res, sep=",", file=fw, flush=True)
-
-        fw.close()
-        return None
+        if not rng:
+            rng = random
+        k = rng.choice(termNumberList)
+        bitExprek = rng.sample(self.nonstandardBitList, k)
+        coek = rng.sample(self.coeList, k)
+        leftExpreList = []
+        #obtain the mba items of left side of the equation 
+        for i in range(len(coek)):
+            coe = coek[i]
+            bitwiseExpre = bitExprek[i]
+            if coe == 1:
+                #for the consistent format
+                leftExpreList.append(str(coe) + "*" + bitwiseExpre)
+            else:
+                leftExpreList.append(str(coe) + "*" + bitwiseExpre)
+        #generate the mba expression over 3 variables.
+        (leftExpre, rightExpre) = self.generate_mba_expression(leftExpreList, rng)
+
+        return (leftExpre, rightExpre)
 
 
-    def generate_mba_expression(self, leftExpreList):
+    def generate_mba_expression(self, leftExpreList, rng=None):
         """based on the fact that left expression is equal to right expression, generate mba expression. rightBitwiseList is the bitwise expression which truth table is the standard vector.
         Args:
             leftExpreList: left expression list.
+            rng: the random.Random object, None for the global random module.
         Returns:
             (left, right): the left and right side of one mba expression.
         Raises:
@@ -140,54 +182,38 @@ class LinearMBAGenerator():
         """
         #calculate the signature vector
         truthtableRes = truthtable_term_list(leftExpreList, self.vnumber)
+        termList = [linear_mba_parse(expreStr).terms()[0] for expreStr in leftExpreList]
     
         #get the entire mbaExpression = 0
-        rightExpreList = []
         for index in range(2**self.vnumber):
             number = truthtableRes[index]
             if not number:
                 continue
             else:
-                expreStr = str(number*-1)  + "*" + self.standardBitList[index]
-                leftExpreList.append(expreStr)
+                termList.append((int(number)*-1, self.standardBitList[index]))
     
         #get one or two items as the ground truth 
-        number = random.randint(1,2)
+        if not rng:
+            rng = random
+        number = rng.randint(1,2)
         #number = 1
         #rangdomly choice number terms
-        groundTruthList = random.sample(leftExpreList, number)
+        groundTruthList = rng.sample(termList, number)
         #remove the selected terms
         for idx in range(number):
-            leftExpreList.remove(groundTruthList[idx])
+            termList.remove(groundTruthList[idx])
     
         #obtain the complex mba expression.
-        expreList = leftExpreList
-        leftExpre = expreList[0]
-        for index in range(1, len(expreList)):
-            itemExpre = expreList[index]
-            if itemExpre[0] == "-":
-                leftExpre += itemExpre
-            else:
-                leftExpre +=  "+"  + itemExpre
+        leftMBA = LinearMBA()
+        for (coe, bit) in termList:
+            leftMBA.add_term(coe, bit)
+        leftExpre = leftMBA.to_string()
     
         #the ground truth of mba expression.
-        rightExpre = ""
-        for (idx, itemExpre) in enumerate(groundTruthList):
-            #split the term by "*"
-            itemList = re.split("\*", itemExpre)
-            if len(itemList) > 1:
-                number = -1 * int(itemList[0])
-                if number > 0:
-                    if idx == 0:
-                        rightExpre = str(number) + "*" + itemList[1]
-                    else:
-                        rightExpre += "+" + str(number) + "*" + itemList[1]
-                else:
-                    rightExpre += str(number) + "*" + itemList[1]
-            elif itemExpre[0] == "-":
-                rightExpre += "+" + itemExpre[1:]
-            else:
-                rightExpre += "-" + itemExpre
+        rightMBA = LinearMBA()
+        for (coe, bit) in groundTruthList:
+            rightMBA.add_term(coe, bit)
+        rightExpre = rightMBA.negate().to_string()
     
         lefttruthtable = truthtable_expression(leftExpre, self.vnumber)
         righttruthtable = truthtable_expression(rightExpre, self.vnumber)
@@ -195,7 +221,7 @@ class LinearMBAGenerator():
 
         return (leftExpre, rightExpre)
 
-def complex_groundtruth_handle(groundtruth, vnumber, partterm=None):
+def complex_groundtruth_handle(groundtruth, vnumber, partterm=None, policy=None, rng=None):
     """given one ground truth, construct one related complex linear mba expression
     Algorithm:
         step1: get the truth table of groundtruth.
@@ -205,9 +231,15 @@ def complex_groundtruth_handle(groundtruth, vnumber, partterm=None):
     Args:
         groundtruth: one simplified mba expression defined by the users.
         partterm: the partterm must be constained in the complex MBA expression.
+        policy: the VerifyPolicy object, None for DEFAULT_POLICY.
+        rng: the random.Random object, None for the global random module.
     Returns:
         expreStr: the related complex linear mba expression.
     """
+    if not policy:
+        policy = DEFAULT_POLICY
+    if not rng:
+        rng = random
     gtruth = truthtable_expression(groundtruth, vnumber)
     if partterm:
         ptruth = truthtable_expression(partterm, vnumber)
@@ -221,73 +253,43 @@ def complex_groundtruth_handle(groundtruth, vnumber, partterm=None):
 
     #the number of bitwise selcted from the standard bitwise list
     cnumber = vnumber 
-    coeList = random.sample(lmbaObj.coeList, cnumber)
-    bitList = random.sample(nsbitList, cnumber)
-    termList = []
+    coeList = rng.sample(lmbaObj.coeList, cnumber)
+    bitList = rng.sample(nsbitList, cnumber)
+    randomMBA = LinearMBA()
     for i in range(cnumber):
-        coe = coeList[i]
-        bit = bitList[i]
-        if coe > 0:
-            term = "+" + str(coe) + "*" + bit
-        else:
-            term = str(coe) + "*" + bit
-        termList.append(term)
-    #get the randomly selected term expression
-    cexpre = "".join(termList)
-    if cexpre[0] == "+":
-        cexpre = cexpre[1:]
+        randomMBA.add_term(coeList[i], bitList[i])
 
     #the difference between ground truth and konwn expression
-    ctruth = truthtable_expression(cexpre, vnumber)
+    ctruth = truthtable_expression(randomMBA.to_string(), vnumber)
     #ground truth = partterm_truth + random_truth + standard_truth
     diftruth = np.array(gtruth) - np.array(ptruth) - np.array(ctruth) 
     difList = list(diftruth)
     #construce the standard expression
-    sexpreList = []
+    standardMBA = LinearMBA()
     for idx in range(2**vnumber):
-        coe = difList[idx]
-        if not coe:
-            continue
-        else:
-            if coe > 0:
-                term = "+" + str(coe) + "*" + sbitList[idx]
-            else:
-                term = str(coe) + "*" + sbitList[idx]
-            sexpreList.append(term)
-    sexpre = "".join(sexpreList)
+        coe = int(difList[idx])
+        if coe:
+            standardMBA.add_term(coe, sbitList[idx])
     
-    #construct the final complex expression
+    #construct the final complex expression, combine like term
     if partterm:
-        complexExpre = partterm
-    else:
-        complexExpre = ""
-    if cexpre[0] == "-":
-        complexExpre += cexpre
+        complexMBA = linear_mba_parse(partterm)
     else:
-        complexExpre += "+" + cexpre
-    #sexpre may be one null string
-    if sexpre:
-        if sexpre[0] == "-":
-            complexExpre += sexpre
-        else:
-            complexExpre += "+" + sexpre
-    if complexExpre[0] == "+":
-        complexExpre = complexExpre[1:]
+        complexMBA = LinearMBA()
+    complexMBA = complexMBA.add(randomMBA).add(standardMBA)
+    complexExpre = complexMBA.bitwise_constant().combine().sort().to_string()
 
     #verification
-    z3res = verify_mba_unsat(groundtruth, complexExpre)
+    z3res = policy.verify(groundtruth, complexExpre, kind="linear")
     if not z3res:
         print("error in complex_groundtruth!")
         sys.exit(0)
 
-    #combine like term
-    complexExpre = combine_term(complexExpre)
-
     return complexExpre
 
 
 
-def complex_groundtruth(groundtruth, partterm=None):
+def complex_groundtruth(groundtruth, partterm=None, policy=None, rng=None):
     """given one ground truth, construct one related complex linear mba expression
     Algorithm:
         step1: get the truth table of groundtruth.
@@ -297,23 +299,41 @@ def complex_groundtruth(groundtruth, partterm=None):
     Args:
         groundtruth: one simplified mba expression defined by the users.
         partterm: the partterm must be constained in the complex MBA expression.
+        policy: the VerifyPolicy object, None for DEFAULT_POLICY.
+        rng: the random.Random object, None for the global random module, the same seed gives the same expression.
     Returns:
         expreStr: the related complex linear mba expression.
     """
-    #get the number of variable in the expression
-    vnumber1 = len(variable_list(groundtruth))
+    #get the number of variable of the truth table on the expression
+    vnumber1 = truthtable_vnumber(groundtruth)
     if partterm:
-        vnumber2 = len(variable_list(partterm))
+        vnumber2 = truthtable_vnumber(partterm)
         vnumber = max([vnumber1, vnumber2, 2])
     else:
         vnumber = max([vnumber1, 2])
 
     #get the related compplexExpre
-    complexExpre = complex_groundtruth_handle(groundtruth, vnumber, partterm)
+    complexExpre = complex_groundtruth_handle(groundtruth, vnumber, partterm, policy, rng)
 
     return complexExpre
 
 
+def iter_lmba(vnumber, mbanumber=None, pool=None, rng=None):
+    """the rows of the linear MBA expression dataset in the memory, generated lazily.
+    Args:
+        vnumber: the number of variables.
+        mbanumber: the nubmer of mba expression, None for no end.
+        pool: the Z3VerifyPool object verifying the expressions in parallel, None for one by one.
+        rng: the random.Random object, None for the global random module.
+    Yields:
+        (leftExpre, rightExpre, z3res): one row of the dataset.
+    """
+    lmbaObj = LinearMBAGenerator(vnumber)
+    yield from lmbaObj.lmba_iter(mbanumber, pool, rng)
+
+    return None
+
+
 def lMBA_sort_by_term(fileread=None, filewrite=None):
     """sort the linear MBA expression.
     Args:
@@ -338,9 +358,7 @@ def lMBA_sort_by_term(fileread=None, filewrite=None):
     for (idx, expre) in enumerate(expreList):
         MBAexpreList = re.split(",", expre)
         MBAexpre = MBAexpreList[0]
-        itemList = re.split("[\+-]", MBAexpre) 
-        itemList = [i for i in itemList if i]
-        term = len(itemList)
+        term = len(expression_2_term(MBAexpre))
         expreList[idx] = [expre, term]
 
     #the sorted key is the terms of one expression
@@ -365,11 +383,18 @@ def lMBA_sort_by_term(fileread=None, filewrite=None):
     return None
 
 
-def unittest(vnumber, MBAnumber=100):
+def unittest(vnumber, MBAnumber=100, workers=0, jobs=None, seed=0, shardnumber=None):
     """unit test of the class.
     """
     lmbaObj = LinearMBAGenerator(vnumber)
-    lmbaObj.generate_lmba_dataset(MBAnumber)
+    if jobs:
+        lmbaObj.generate_lmba_dataset(MBAnumber, jobs=jobs, seed=seed, shardnumber=shardnumber)
+    elif not workers:
+        lmbaObj.generate_lmba_dataset(MBAnumber)
+    else:
+        with Z3VerifyPool(workers) as pool:
+            lmbaObj.generate_lmba_dataset(MBAnumber, pool)
+            print(pool.info())
 
     fileread = "../dataset/lMBA_{vnumber}variable.dataset.txt".format(vnumber=vnumber)
     filewrite = "../dataset/lMBA_{vnumber}variable.dataset.sorted.txt".format(vnumber=vnumber)
@@ -384,19 +409,19 @@ def unittest(vnumber, MBAnumber=100):
 
 
 
-def main(vnumber, MBAnumber=100):
-    unittest(vnumber, MBAnumber)
+def main(vnumber, MBAnumber=100, workers=0, jobs=None, seed=0, shardnumber=None):
+    unittest(vnumber, MBAnumber, workers, jobs, seed, shardnumber)
 
     return None
 
 
 if __name__ == "__main__":
-    vnumber = int(sys.argv[1])
-    if len(sys.argv) > 2:
-        MBAnumber = int(sys.argv[2])
-        main(vnumber, MBAnumber)
-    else:
-        main(vnumber)
-
-
-
+    parser = argparse.ArgumentParser(description="generate the linear MBA dataset and the sorted one.")
+    parser.add_argument("vnumber", type=int)
+    parser.add_argument("MBAnumber", type=int, nargs="?", default=100)
+    parser.add_argument("workers", type=int, nargs="?", default=0, help="the number of the z3 processes verifying the rows.")
+    parser.add_argument("--jobs", type=int, default=None, help="the number of the processes generating the shards.")
+    parser.add_argument("--seed", type=int, default=0, help="the master seed of the shards.")
+    parser.add_argument("--shards", type=int, default=None, help="the number of the shards, the number of the jobs by default.")
+    args = parser.parse_args()
+    main(args.vnumber, args.MBAnumber, args.workers, args.jobs, args.seed, args.shards)
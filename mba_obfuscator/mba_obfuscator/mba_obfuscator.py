@@ -4,63 +4,71 @@
 MBA expression generation including linear, polynomial, non-polynomial.
 """
 
+import random
 import sys
 sys.path.append("../tools")
+import time
+import traceback
 import z3
 
 from lMBA_generate import complex_groundtruth
-from mba_string_operation import verify_mba_unsat
+from mba_ast_operation import get_z3_verifier
+from mba_string_operation import verify_mba_unsat, verify_stats_info, verify_cache_info, truthtable_cache_info, truthtable_vnumber, VerifyPolicy, DEFAULT_POLICY
+from truthtable_dataset import get_truthtable_basis
 from pMBA_generate import groundtruth_2_pmba
 from nonpMBA_generate import add_zero,recursively_apply,replace_sub_expre,replace_one_variable
 
 
 
-def mba_obfuscator(sexpre, flag="p"):
+#the transformation and the class of the output expression of every flag.
+OBFUSCATOR_FLAG = {
+    "l": (complex_groundtruth, "linear"),
+    "p": (groundtruth_2_pmba, "poly"),
+    "np_zero": (add_zero, "mba"),
+    "np_recur": (recursively_apply, "mba"),
+    "np_replace": (replace_sub_expre, "mba"),
+}
+
+
+def mba_obfuscator_verify(sexpre, flag="p", policy=None, rng=None):
+    """MBA expression generation and the verification of the final expression.
+    Args:
+        sexpre: a simple expression.
+        flag: transformation choice, must in OBFUSCATOR_FLAG.
+        policy: the VerifyPolicy object honored by every stage, None for DEFAULT_POLICY.
+        rng: the random.Random object of every stage, None for the global random module.
+    Returns:
+        (cexpre, z3res): the related complex MBA expression, z3res is False when the verification fails.
+    """
+    if not policy:
+        policy = DEFAULT_POLICY
+    (transformation, kind) = OBFUSCATOR_FLAG[flag]
+    cexpre = transformation(sexpre, policy=policy, rng=rng)
+    z3res = policy.verify(sexpre, cexpre, 8, kind=kind, final=True)
+
+    return (cexpre, z3res)
+
+
+def mba_obfuscator(sexpre, flag="p", policy=None, rng=None):
     """MBA expression generation..
     Args:
         sexpre: a simple expression.
         flag:transformation choice, must in ["l", "p", "np"].
+        policy: the VerifyPolicy object honored by every stage, None for DEFAULT_POLICY,
+                such as VerifyPolicy("signature", 8, finalonly=True) only verifies the final expression.
+        rng: the random.Random object of every stage, None for the global random module,
+             random.Random(seed) reproduces the same expression for the same seed.
     Returns:
         cexpre: the related complex MBA expression.
     """
        
-    if flag in ["l", "p", "np_zero", "np_recur", "np_replace"]:
+    if flag in OBFUSCATOR_FLAG:
         pass
     else:
         print("flag wrong! pleaxe input l or p or np")
 
-    testall = True
-    if flag == "l":
-        cexpre = complex_groundtruth(sexpre)
-        z3res = verify_mba_unsat(sexpre, cexpre, 8)
-        #print(sexpre, cexpre, z3res)
-        if not z3res:
-            testall = False
-    elif flag == "p":
-        cexpre = groundtruth_2_pmba(sexpre)
-        z3res = verify_mba_unsat(sexpre, cexpre, 8)
-        #print(sexpre, cexpre, z3res)
-        if not z3res:
-            testall = False
-    elif flag == "np_zero":
-        cexpre = add_zero(sexpre)
-        z3res = verify_mba_unsat(sexpre, cexpre, 8)
-        #print(sexpre, cexpre, z3res)
-        if not z3res:
-            testall = False
-    elif flag == "np_recur":
-        cexpre = recursively_apply(sexpre)
-        z3res = verify_mba_unsat(sexpre, cexpre, 8)
-        #print(sexpre, cexpre, z3res)
-        if not z3res:
-            testall = False
-    elif flag == "np_replace":
-        cexpre = replace_sub_expre(sexpre)
-        z3res = verify_mba_unsat(sexpre, cexpre, 8)
-        #print(sexpre, cexpre, z3res)
-        if not z3res:
-            testall = False
-    if testall:
+    (cexpre, z3res) = mba_obfuscator_verify(sexpre, flag, policy, rng)
+    if z3res:
         pass
         #pass verification.
     else:
@@ -71,6 +79,67 @@ def mba_obfuscator(sexpre, flag="p"):
 
 
 
+def mba_obfuscator_batch(expressions, flag="p", policy=None, seed=None):
+    """MBA expression generation of a batch, the truth tables, the caches and the z3 solver of the process are
+    loaded once and shared by all the expressions, one failed expression does not stop the batch.
+    Args:
+        expressions: the iterable of the simple expressions.
+        flag: transformation choice, must in OBFUSCATOR_FLAG.
+        policy: the VerifyPolicy object honored by every stage, None for DEFAULT_POLICY.
+        seed: every expression is generated by its own random.Random(seed), so the result only depends on
+              the expression and the seed, None for the global random module.
+    Returns:
+        (resultList, stats): resultList keeps the order of the expressions, every item is one dictionary:
+                                 {"expression", "result": the complex expression or None, 
+                                  "status": "ok", "unverified" for the failed verification, "error" for the failed generation,
+                                  "error": the error message, "elapsed": the time in seconds},
+                             stats: the number of every status, the time, the throughput, the verification and the caches.
+    """
+    if flag not in OBFUSCATOR_FLAG:
+        print("flag wrong! pleaxe input one of", list(OBFUSCATOR_FLAG))
+        traceback.print_stack()
+        sys.exit(0)
+    if not policy:
+        policy = DEFAULT_POLICY
+    expreList = list(expressions)
+    #warm up the truth tables of the batch and the z3 solver of the final verification
+    for vnumber in sorted(set(max(truthtable_vnumber(sexpre), 2) for sexpre in expreList)):
+        get_truthtable_basis(vnumber)
+    get_z3_verifier(policy.bitnumber if policy.bitnumber else 8)
+    verifyStart = verify_stats_info()
+    stats = {"number": len(expreList), "ok": 0, "unverified": 0, "error": 0, "elapsed": 0.0, "throughput": 0.0}
+
+    resultList = []
+    start = time.time()
+    for sexpre in expreList:
+        itemStart = time.time()
+        item = {"expression": sexpre, "result": None, "status": "ok", "error": None, "elapsed": 0.0}
+        try:
+            rng = random.Random(seed) if seed is not None else None
+            (item["result"], z3res) = mba_obfuscator_verify(sexpre, flag, policy, rng)
+            if not z3res:
+                item["status"] = "unverified"
+        #the stages exit on their errors
+        except (Exception, SystemExit) as error:
+            item["status"] = "error"
+            if isinstance(error, SystemExit):
+                item["error"] = "the generation stopped on its error."
+            else:
+                item["error"] = "{name}: {error}".format(name=type(error).__name__, error=error)
+        item["elapsed"] = time.time() - itemStart
+        stats[item["status"]] += 1
+        resultList.append(item)
+    stats["elapsed"] = time.time() - start
+    stats["throughput"] = stats["number"] / stats["elapsed"] if stats["elapsed"] else 0.0
+    verifyEnd = verify_stats_info()
+    stats["verification"] = {key: verifyEnd[key] - verifyStart[key] for key in verifyEnd}
+    stats["truthtable"] = truthtable_cache_info()
+    stats["cache"] = verify_cache_info()
+
+    return (resultList, stats)
+
+
+
 def unittest( ):
     sexpre = "x+y"
 
@@ -80,6 +149,26 @@ def unittest( ):
     print(sexpre, mba_obfuscator(sexpre, "np_recur"))
     print(sexpre, mba_obfuscator(sexpre, "np_replace"))
 
+    (resultList, stats) = mba_obfuscator_batch(["x+y", "x-y", "x&y", "x^y", "~x", "x|y", "2*x+3*y", "x**2"], "l")
+    for item in resultList:
+        print(item["expression"], item["status"], item["result"], item["error"])
+    print(stats)
+    if [item["status"] for item in resultList] != ["ok"] * 7 + ["error"]:
+        print("error in the batch obfuscation!")
+        traceback.print_stack()
+        sys.exit(0)
+
+    #the same seed gives the same expression
+    for flag in OBFUSCATOR_FLAG:
+        if mba_obfuscator(sexpre, flag, rng=random.Random(7)) != mba_obfuscator(sexpre, flag, rng=random.Random(7)):
+            print("error in the seeded obfuscation!")
+            traceback.print_stack()
+            sys.exit(0)
+    (resultList, stats) = mba_obfuscator_batch(["x+y", "x&y", "x+y"], "np_recur", seed=7)
+    if resultList[0]["result"] != resultList[2]["result"]:
+        print("error in the seeded batch obfuscation!")
+        traceback.print_stack()
+        sys.exit(0)
 
 
     return None
@@ -0,0 +1,275 @@
+#!/usr/bin/python3
+
+"""
+the generate-then-verify pipeline of the MBA datasets:
+    generators: every process generates the rows of its shard into its own bounded queue,
+    verifier: the Z3VerifyPool checks the rows in a sliding window,
+    writer: the rows are output in the order of the generation, the same format as the dataset functions.
+A full queue blocks its generator (backpressure), the waiting time of every stage is counted.
+The row i comes from the shard i % generators, so the output does not depend on the speed of the processes.
+"""
+
+import argparse
+import multiprocessing
+import queue
+import random
+import sys
+sys.path.append("../tools")
+import time
+import traceback
+from lMBA_generate import LinearMBAGenerator
+from pMBA_generate import PolyMBAGenerator
+from nonpMBA_generate import nonpoly_row_checked, NONPOLY_ERROR
+from mba_shard import shard_seed
+from mba_verify_pool import Z3VerifyPool, Z3_FLAG
+
+
+#the datasets of the pipeline, column: the columns of the left expression, the right expression and the z3flag in the output.
+PIPELINE_KIND = {
+    "lmba": {"header": "#complex, groundtruth, z3flag", "column": (0, 1, 2)},
+    "pmba": {"header": "#complex, groundtruth, z3flag, c_terms, g_terms", "column": (0, 1, 2)},
+    "pmba_transformation": {"header": "#complex, groundtruth, z3flag, c_terms, g_terms", "column": (0, 1, 2)},
+    "nonpoly": {"header": "#original,complex,groundtruth,z3flag,transformation", "column": (1, 2, 3)},
+}
+
+#the seconds of one wait on the queue of the generator before its process is checked.
+GENERATOR_POLL = 1.0
+
+
+def row_iterator(kind, argDict, shard=0, shardnumber=1, number=None, rng=None):
+    """the rows of one shard of the dataset.
+    Args:
+        kind: the key of PIPELINE_KIND.
+        argDict: the arguments of the generator, vnumber for lmba, vnumber1/vnumber2 for pmba, fileread for nonpoly.
+        shard: the index of the shard.
+        shardnumber: the number of the shards.
+        number: the number of the rows in all shards, None for all the lines of the file of nonpoly.
+        rng: the random.Random object of the shard, None for the global random module.
+    Yields:
+        row: one row of the dataset without the z3flag, the left expression of the failed nonpoly row is None.
+    """
+    if kind == "lmba":
+        lmbaObj = LinearMBAGenerator(argDict["vnumber"])
+        for idx in range(shard, number, shardnumber):
+            yield lmbaObj.generate_lmba_row(rng)
+    elif kind in ["pmba", "pmba_transformation"]:
+        pmbaObj = PolyMBAGenerator(**argDict)
+        for idx in range(shard, number, shardnumber):
+            yield pmbaObj.generate_pmba_row(transformation=(kind == "pmba_transformation"), rng=rng)
+    elif kind == "nonpoly":
+        with open(argDict["fileread"], "r") as fr:
+            lineList = [line for line in fr if "#" not in line]
+        if number is not None:
+            lineList = lineList[:number]
+        for idx in range(shard, len(lineList), shardnumber):
+            yield nonpoly_row_checked(lineList[idx], rng)
+    else:
+        print("the kind of the dataset is wrong!")
+        traceback.print_stack()
+        sys.exit(0)
+
+    return None
+
+
+def generator_worker(kind, argDict, shard, shardnumber, number, seed, rowQueue):
+    """the generator process of one shard, the last item in the queue is one dictionary:
+    {"blocked": the number of the blocked puts, "blockedTime": the time in seconds} or {"error": the traceback},
+    the generators stop by sys.exit on the error, so SystemExit is posted as well.
+    """
+    rng = random.Random(shard_seed(seed, shard)) if seed is not None else None
+    blocked = 0
+    blockedTime = 0.0
+    try:
+        for row in row_iterator(kind, argDict, shard, shardnumber, number, rng):
+            try:
+                rowQueue.put_nowait(row)
+            except queue.Full:
+                #backpressure: wait for the verifier
+                blocked += 1
+                start = time.time()
+                rowQueue.put(row)
+                blockedTime += time.time() - start
+    except BaseException:
+        rowQueue.put({"error": traceback.format_exc()})
+        return None
+    rowQueue.put({"blocked": blocked, "blockedTime": blockedTime})
+
+    return None
+
+
+class MBAPipeline():
+    """the generate-then-verify pipeline of one dataset.
+    Attributes:
+        kind: the key of PIPELINE_KIND.
+        argDict: the arguments of the generator.
+        pool: the Z3VerifyPool object.
+        generators: the number of the generator processes.
+        queuesize: the capacity of the queue of every generator.
+        seed: the master seed of the random generators of the shards, None for the global random module.
+        bitnumber: the number of the bits of the variable in the verification.
+        stats: the number of the rows, the waiting time of every stage and the throughput.
+    """
+    def __init__(self, kind, argDict, pool, generators=1, queuesize=64, seed=None, bitnumber=2):
+        if kind not in PIPELINE_KIND:
+            print("the kind of the dataset is wrong!")
+            traceback.print_stack()
+            sys.exit(0)
+        self.kind = kind
+        self.argDict = argDict
+        self.pool = pool
+        self.generators = max(generators, 1)
+        self.queuesize = queuesize
+        self.seed = seed
+        self.bitnumber = bitnumber
+        self.stats = {"generated": 0, "written": 0, "unknown": 0, "error": 0, "generatorWait": 0.0, "verifierWait": 0.0, "writerTime": 0.0, "blocked": 0, "blockedTime": 0.0, "elapsed": 0.0, "throughput": 0.0}
+        self.context = multiprocessing.get_context("spawn")
+
+        return None
+
+
+    def rows(self, number=None):
+        """the rows from the generator processes in the order of the generation.
+        Args:
+            number: the number of the rows, None for all the lines of the file of nonpoly.
+        Yields:
+            row: one row of the dataset without the z3flag.
+        """
+        queueList = [self.context.Queue(self.queuesize) for shard in range(self.generators)]
+        processList = []
+        for shard in range(self.generators):
+            process = self.context.Process(target=generator_worker, args=(self.kind, self.argDict, shard, self.generators, number, self.seed, queueList[shard]), daemon=True)
+            process.start()
+            processList.append(process)
+        finished = [False] * self.generators
+        try:
+            idx = 0
+            while not all(finished):
+                shard = idx % self.generators
+                if finished[shard]:
+                    #one shard has been finished, the rows of the others have been finished as well
+                    idx += 1
+                    continue
+                start = time.time()
+                item = self.get_item(queueList[shard], processList[shard])
+                self.stats["generatorWait"] += time.time() - start
+                if isinstance(item, dict):
+                    if "error" in item:
+                        print("error in the generator:", item["error"])
+                        traceback.print_stack()
+                        sys.exit(0)
+                    self.stats["blocked"] += item["blocked"]
+                    self.stats["blockedTime"] += item["blockedTime"]
+                    finished[shard] = True
+                    continue
+                self.stats["generated"] += 1
+                idx += 1
+                yield item
+        finally:
+            for process in processList:
+                if process.is_alive():
+                    process.terminate()
+                process.join()
+
+        return None
+
+
+    def get_item(self, rowQueue, process):
+        """wait for the next item of one generator, the generator died without its last dictionary is one error.
+        Args:
+            rowQueue: the queue of the generator.
+            process: the process of the generator.
+        Returns:
+            item: one row or the last dictionary of the generator.
+        """
+        while True:
+            try:
+                return rowQueue.get(timeout=GENERATOR_POLL)
+            except queue.Empty:
+                if process.is_alive():
+                    continue
+            #the items put before the exit may be still in the pipe
+            try:
+                return rowQueue.get(timeout=GENERATOR_POLL)
+            except queue.Empty:
+                return {"error": "the generator process exited with the code {code}.".format(code=process.exitcode)}
+
+
+    def run(self, filewrite, number=None):
+        """generate, verify and output the dataset.
+        Args:
+            filewrite: the output file.
+            number: the number of the rows, None for all the lines of the file of nonpoly.
+        Returns:
+            stats: the statistics of the pipeline.
+        """
+        (leftColumn, rightColumn, flagColumn) = PIPELINE_KIND[self.kind]["column"]
+        start = time.time()
+        poolElapsed = self.pool.stats["elapsed"]
+        #the failed row keeps its place in the stream by the trivial equation of the right expression
+        itemIter = ((row[leftColumn] if row[leftColumn] is not None else row[rightColumn], row[rightColumn], row) for row in self.rows(number))
+        with open(filewrite, "w") as fw:
+            print(PIPELINE_KIND[self.kind]["header"], file=fw)
+            for (row, result) in self.pool.verify_iter(itemIter, self.bitnumber):
+                writeStart = time.time()
+                flag = Z3_FLAG[result] if row[leftColumn] is not None else NONPOLY_ERROR
+                fieldList = list(row[:flagColumn]) + [flag] + list(row[flagColumn:])
+                print(*fieldList, sep=",", file=fw, flush=True)
+                self.stats["writerTime"] += time.time() - writeStart
+                self.stats["written"] += 1
+                if flag == NONPOLY_ERROR:
+                    self.stats["error"] += 1
+                elif result == "unknown":
+                    self.stats["unknown"] += 1
+        self.stats["verifierWait"] += self.pool.stats["elapsed"] - poolElapsed
+        self.stats["elapsed"] += time.time() - start
+        self.stats["throughput"] = self.stats["written"] / self.stats["elapsed"] if self.stats["elapsed"] else 0.0
+
+        return self.stats
+
+
+
+def pipeline_filename(kind, argDict):
+    """the output file of the dataset, the same as the one of the dataset function.
+    """
+    if kind == "lmba":
+        return "../dataset/lMBA_{vnumber}variable.dataset.txt".format(vnumber=argDict["vnumber"])
+    elif kind in ["pmba", "pmba_transformation"]:
+        return PolyMBAGenerator(**argDict).MBAdesfile
+    else:
+        return "{file}.nonpoly.dataset.txt".format(file=argDict["fileread"])
+
+
+def main(kind, argDict, number, workers, generators, timeout, seed):
+    filewrite = pipeline_filename(kind, argDict)
+    with Z3VerifyPool(workers, timeout) as pool:
+        pipelineObj = MBAPipeline(kind, argDict, pool, generators, seed=seed)
+        stats = pipelineObj.run(filewrite, number)
+        print(filewrite)
+        print(stats)
+        print(pool.info())
+
+    return None
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="generate and verify one MBA dataset in the pipeline.")
+    parser.add_argument("kind", choices=list(PIPELINE_KIND))
+    parser.add_argument("--vnumber", type=int, nargs="+", default=[2], help="the number of the variables, two numbers for pmba.")
+    parser.add_argument("--fileread", help="the poly dataset of nonpoly.")
+    parser.add_argument("--number", type=int, default=None, help="the number of the rows.")
+    parser.add_argument("--workers", type=int, default=None, help="the number of the verifier processes.")
+    parser.add_argument("--generators", type=int, default=1, help="the number of the generator processes.")
+    parser.add_argument("--timeout", type=int, default=60000, help="the timeout of one query in milliseconds.")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    if args.kind == "lmba":
+        argDict = {"vnumber": args.vnumber[0]}
+        number = args.number if args.number else 100
+    elif args.kind in ["pmba", "pmba_transformation"]:
+        argDict = {"vnumber1": args.vnumber[0], "vnumber2": args.vnumber[-1]}
+        number = args.number if args.number else 100
+    else:
+        argDict = {"fileread": args.fileread}
+        number = args.number
+    main(args.kind, argDict, number, args.workers, args.generators, args.timeout, args.seed)
@@ -11,15 +11,24 @@ import re
 import sys
 sys.setrecursionlimit(30000)
 sys.path.append("../tools")
+import traceback
 from lMBA_generate import complex_groundtruth_handle, complex_groundtruth
 from pMBA_generate import PolyMBAGenerator
-from mba_string_operation import variable_list, verify_mba_unsat, expression_2_term
+from mba_string_operation import variable_list, verify_mba_unsat, expression_2_term, DEFAULT_POLICY
+from mba_verify_pool import Z3VerifyPool, Z3_FLAG
+from mba_dag import ExpressionDAG, verify_dag
 
 
-def replace_one_variable(groundtruth):
+#the z3flag column of the row failing in the generation or the verification.
+NONPOLY_ERROR = "error"
+
+
+def replace_one_variable(groundtruth, policy=None, rng=None):
     """in the mba expression, replace one variable with one linear mba expression. 
     Args:
         groundtruth: mba expressoin.
+        policy: the VerifyPolicy object, None for DEFAULT_POLICY.
+        rng: the random.Random object, None for the global random module.
     Returns:
         # mbaExpre: original mba expression.
         # order: the transformation method.
@@ -27,41 +36,58 @@ def replace_one_variable(groundtruth):
         # lmbaExpre: mba expression equaling to eh oneVar.
         newmbaExpre: the output mba expression.
     """
+    dag = ExpressionDAG()
+    newId = replace_one_variable_dag(groundtruth, dag, policy, rng)
+
+    return dag.render(newId)
+    #return [mbaExpre, 1, oneVar, lmbaExpre, newmbaExpre]
+
+
+def replace_one_variable_dag(groundtruth, dag, policy=None, rng=None):
+    """replace_one_variable on the DAG, the mba expression of the variable is stored once for all its uses.
+    Args:
+        groundtruth: mba expressoin.
+        dag: the ExpressionDAG object.
+        policy: the VerifyPolicy object, None for DEFAULT_POLICY.
+        rng: the random.Random object, None for the global random module.
+    Returns:
+        newId: the id of the output mba expression in the DAG.
+    """
+    if not policy:
+        policy = DEFAULT_POLICY
     #for more complex MBA expression, firstly complex the groundtruth
-    mbaExpre = complex_groundtruth(groundtruth)
+    mbaExpre = complex_groundtruth(groundtruth, policy=policy, rng=rng)
     #get one variable
     varList = variable_list(mbaExpre)
     oneVar = varList[0]
     #replace the one variable with complex mba expression
-    pmbaObj = PolyMBAGenerator(2, 2)
-    pmbaExpre = pmbaObj.generate_pMBA_from_zeroequality(oneVar)
-    pmbaExpre = "({mba})".format(mba=pmbaExpre)
+    pmbaObj = PolyMBAGenerator(2, 2, policy=policy)
+    pmbaId = dag.parse(pmbaObj.generate_pMBA_from_zeroequality(oneVar, rng))
     #lmbaExpre = complex_groundtruth_handle(oneVar, len(varList))
-    #lmbaExpre = "({mba})".format(mba=lmbaExpre)
 
-    termList = expression_2_term(mbaExpre)
-    #replace the first term
-    termList[0] = termList[0].replace(oneVar, pmbaExpre)
-    #replace the last term
-    termList[-1] = termList[-1].replace(oneVar, pmbaExpre)
+    termIdList = [dag.parse(term) for term in expression_2_term(mbaExpre)]
+    #replace the first term and the last term
+    for idx in sorted(set([0, len(termIdList) - 1])):
+        termIdList[idx] = dag.substitute(termIdList[idx], {oneVar: pmbaId})
     #construct the new mba expression
-    newmbaExpre = "".join(termList)
+    newId = dag.sum(termIdList)
 
     #verification
-    z3res = verify_mba_unsat(mbaExpre, newmbaExpre)
+    z3res = verify_dag(dag, dag.parse(mbaExpre), newId, policy=policy)
     if not z3res:
         print("error in replace one variable.")
         sys.exit(0)
 
-    return newmbaExpre
-    #return [mbaExpre, 1, oneVar, lmbaExpre, newmbaExpre]
+    return newId
 
 
 
-def recursively_apply(mbaExpre):
+def recursively_apply(mbaExpre, policy=None, rng=None):
     """in the mba expression, replace the first two terms with linear_mba(x + y).
     Args:
         mbaExpre: the simple mba expressoin. 
+        policy: the VerifyPolicy object, None for DEFAULT_POLICY.
+        rng: the random.Random object, None for the global random module.
     Returns:
         # mbaExpre: original mba expression.
         # order: the transformation method.
@@ -70,50 +96,63 @@ def recursively_apply(mbaExpre):
         # newmbaExpre: new mba expression.
         newmbaExpre: the output complex mba expression.
     """
-    mbaExpre = complex_groundtruth(mbaExpre)
+    dag = ExpressionDAG()
+    newId = recursively_apply_dag(mbaExpre, dag, policy, rng)
+
+    return dag.render(newId)
+    #return [mbaExpre, 2, "".join(termList1), lmbaExpre, newmbaExpre]
+
+
+def recursively_apply_dag(mbaExpre, dag, policy=None, rng=None):
+    """recursively_apply on the DAG, every use of the first two terms in linear_mba(x + y) shares one node.
+    Args:
+        mbaExpre: the simple mba expressoin. 
+        dag: the ExpressionDAG object.
+        policy: the VerifyPolicy object, None for DEFAULT_POLICY.
+        rng: the random.Random object, None for the global random module.
+    Returns:
+        newId: the id of the output mba expression in the DAG.
+    """
+    if not policy:
+        policy = DEFAULT_POLICY
+    mbaExpre = complex_groundtruth(mbaExpre, policy=policy, rng=rng)
     #preprocess on the mba expression
-    varList = variable_list(mbaExpre)
-    termList = expression_2_term(mbaExpre)
-    #transform the termList1, remain termList2
-    termList1 = termList[:2]
-    termList2 = termList[2:]
-    remainExpre = "".join(termList2)
+    termIdList = [dag.parse(term) for term in expression_2_term(mbaExpre)]
+    #transform the first two terms, remain the others
 
     #complex groundtruth: "x + y"
     groundExpre = "x+y"
-    lmbaExpre = complex_groundtruth_handle(groundExpre, 2)
-    #x + y = f(x,y) ==> term1 + term2 = f(term1, term2)
-    expre1 = "({expre})".format(expre=termList1[0].replace("x", "a").replace("y", "b"))
-    expre2 = "({expre})".format(expre=termList1[1].replace("x", "a").replace("y", "b"))
-    lmbaExpre = lmbaExpre.replace("x", expre1).replace("y", expre2)
-    lmbaExpre = lmbaExpre.replace("a", "x").replace("b", "y")
+    lmbaId = dag.parse(complex_groundtruth_handle(groundExpre, 2, policy=policy, rng=rng))
+    #x + y = f(x,y) ==> term1 + term2 = f(term1, term2), both variables are replaced at the same time
+    lmbaId = dag.substitute(lmbaId, {"x": termIdList[0], "y": termIdList[1]})
 
     #construct the new mba expression
-    newmbaExpre = lmbaExpre + remainExpre 
+    newId = dag.sum([lmbaId] + termIdList[2:])
 
     #verification
-    z3res = verify_mba_unsat(newmbaExpre, mbaExpre)
+    z3res = verify_dag(dag, newId, dag.parse(mbaExpre), policy=policy)
     if not z3res:
         print("error in recursively apply.")
         sys.exit(0)
 
-    return newmbaExpre
-    #return [mbaExpre, 2, "".join(termList1), lmbaExpre, newmbaExpre]
+    return newId
 
 
 
-def add_zero(groundtruth):
+def add_zero(groundtruth, policy=None, rng=None):
     """Given a groundtruth, add a MBA expression that equals to 0 to it.
     Args:
         groundtruth: the simple mba expression.
+        policy: the VerifyPolicy object, None for DEFAULT_POLICY.
+        rng: the random.Random object, None for the global random module.
     Returns:
         mbaExpre: the output mba expression.
     Raises:
         None.
     """
-    pmbaObj = PolyMBAGenerator(2, 2)
-    pmbaExpre = pmbaObj.generate_pMBA_from_zeroequality("0")
-    mbaExpre = complex_groundtruth(groundtruth)
+    pmbaObj = PolyMBAGenerator(2, 2, policy=policy)
+    pmbaExpre = pmbaObj.generate_pMBA_from_zeroequality("0", rng)
+    mbaExpre = complex_groundtruth(groundtruth, policy=policy, rng=rng)
     if pmbaExpre[0] == "-":
         mbaExpre += pmbaExpre
     else:
@@ -122,20 +161,24 @@ def add_zero(groundtruth):
     return mbaExpre
 
 
-def replace_sub_expre(groundtruth):
+def replace_sub_expre(groundtruth, policy=None, rng=None):
     """Given a groundtruth, add a MBA expression that equals to 0 to it.
     Args:
         groundtruth: the simple mba expression.
+        policy: the VerifyPolicy object, None for DEFAULT_POLICY.
+        rng: the random.Random object, None for the global random module.
     Returns:
         mbaExpre: the output mba expression.
     Raises:
         None.
     """
-    pmbaObj = PolyMBAGenerator(2, 2)
-    mbaExpre = complex_groundtruth(groundtruth)
+    pmbaObj = PolyMBAGenerator(2, 2, policy=policy)
+    mbaExpre = complex_groundtruth(groundtruth, policy=policy, rng=rng)
+    #the terms are in the order of the expression, complex_groundtruth moves the constant into the term on ~(x&~x),
+    #so the last term is one bitwise term
     mbaExpreterm = expression_2_term(mbaExpre)
     subExpre = mbaExpreterm[-1]
-    pmbaExpre = pmbaObj.generate_pMBA_from_zeroequality(subExpre)
+    pmbaExpre = pmbaObj.generate_pMBA_from_zeroequality(subExpre, rng)
     mbaExpre = "".join(mbaExpreterm[:-1])
 
     if pmbaExpre[0] == "-":
@@ -148,59 +191,131 @@ def replace_sub_expre(groundtruth):
 
 
 
-def generate_nonpoly_expression(mbaExpre):
+def generate_nonpoly_expression(mbaExpre, rng=None):
     """input must be one poly mba expression, transform it into one non-poly mba expression.
     Args:
         mbaExpre: one poly mba expression.
+        rng: the random.Random object, None for the global random module.
     Returns;
-        newmbaExpreList: the transformation list that transform the mba expression into non-poly mba expression..
+        newmbaExpre: the non-poly mba expression, the methods return the new expression instead of the transformation list.
     """
     #reandomly apple non-poly generation's method
-    a = random.randint(1, 3)
+    if not rng:
+        rng = random
+    a = rng.randint(1, 3)
     if a&1:
-        return recursively_apply(mbaExpre)[-1]
+        return recursively_apply(mbaExpre, rng=rng)
     else:
-        return replace_one_variable(mbaExpre)[-1]
+        return replace_one_variable(mbaExpre, rng=rng)
 
 
-def nonpoly_dataset_generation(fileread):
-    """based on the existing dataset storing poly mba expression, generating non-poly mba expression.
+def nonpoly_row(line, rng=None):
+    """generate one row of the non-poly dataset from one line of the poly dataset.
     Args:
-        fileread; file storing poly mba expression.
+        line: one line of the poly dataset or one row of iter_pmba, the first two columns are the poly mba expression and the ground truth.
+        rng: the random.Random object, None for the global random module.
+    Returns:
+        (originalExpre, complexExpre, groundExpre, transformationList): the poly mba expression, the non-poly one, the ground truth and the transformation.
     """
-    filewrite = "{file}.nonpoly.dataset.txt".format(file=fileread)
-    fw = open(filewrite, "w")
-    print("#original,complex,groundtruth,z3flag,transformation", file=fw)
+    if isinstance(line, str):
+        itemList = re.split(",", line.strip())
+    else:
+        itemList = line
+    originalExpre = itemList[0]
+    groundExpre = itemList[1]
+    complexExpre = generate_nonpoly_expression(originalExpre, rng)
+    transformationList = [complexExpre]
 
-    with open(fileread, "r") as fr:
-        for line in fr:
-            if "#" not in line:
-                line = line.strip()
-                itemList = re.split(",", line)
-                originalExpre = itemList[0]
-                groundExpre = itemList[1]
-                transformationList = generate_nonpoly_expression(originalExpre)
-                complexExpre = transformationList[-1]
-                z3res = verify_mba_unsat(complexExpre, groundExpre)
-                print(originalExpre, complexExpre, groundExpre, z3res, transformationList,  sep=",", file=fw)
-                print(complexExpre, groundExpre, z3res) 
+    return (originalExpre, complexExpre, groundExpre, transformationList)
 
-    fw.close()
 
+def nonpoly_row_checked(line, rng=None):
+    """generate one row of the non-poly dataset like nonpoly_row, the failure of the generation is kept in the row,
+    complex_groundtruth stops by sys.exit on the terms it can not transform.
+    Args:
+        line: one line of the poly dataset or one row of iter_pmba.
+        rng: the random.Random object, None for the global random module.
+    Returns:
+        (originalExpre, complexExpre, groundExpre, transformationList): complexExpre is None and transformationList is the error for the failure,
+        the commas of the error are replaced by ";" to keep the columns of the dataset.
+    """
+    try:
+        return nonpoly_row(line, rng)
+    except (Exception, SystemExit) as error:
+        itemList = re.split(",", line.strip()) if isinstance(line, str) else line
+        return (itemList[0], None, itemList[1], traceback.format_exception_only(type(error), error)[-1].strip().replace(",", ";"))
 
 
+def verify_nonpoly_row(complexExpre, groundExpre):
+    """verify one row of the non-poly dataset one by one.
+    Returns:
+        z3res: the result of verify_mba_unsat, NONPOLY_ERROR for the failure of the generation or the verification.
+    """
+    if complexExpre is None:
+        return NONPOLY_ERROR
+    try:
+        return verify_mba_unsat(complexExpre, groundExpre)
+    except (Exception, SystemExit):
+        return NONPOLY_ERROR
 
 
+def iter_nonpoly(sourceIter, pool=None, rng=None):
+    """the rows of the non-poly dataset in the memory, generated lazily from the poly dataset,
+    the row failing in the generation is yielded with the z3flag NONPOLY_ERROR and the error in place of the transformation.
+    Args:
+        sourceIter: the iterable of the lines of the poly dataset, such as the open file, the lines including "#" are skipped,
+                    or the rows of iter_pmba.
+        pool: the Z3VerifyPool object verifying the expressions in parallel, None for one by one.
+        rng: the random.Random object, None for the global random module.
+    Yields:
+        (originalExpre, complexExpre, groundExpre, z3res, transformationList): one row of the dataset.
+    """
+    rowIter = (nonpoly_row_checked(line, rng) for line in sourceIter if not isinstance(line, str) or "#" not in line)
+    if not pool:
+        for (originalExpre, complexExpre, groundExpre, transformationList) in rowIter:
+            yield (originalExpre, complexExpre, groundExpre, verify_nonpoly_row(complexExpre, groundExpre), transformationList)
+    else:
+        #the failed row keeps its place in the stream by the trivial equation of the ground truth
+        for ((originalExpre, complexExpre, groundExpre, transformationList), result) in pool.verify_iter((row[1] if row[1] is not None else row[2], row[2], row) for row in rowIter):
+            yield (originalExpre, complexExpre, groundExpre, Z3_FLAG[result] if complexExpre is not None else NONPOLY_ERROR, transformationList)
 
+    return None
 
-def main(fileread):
-    nonpoly_dataset_generation(fileread)
+
+def nonpoly_dataset_generation(fileread, pool=None):
+    """based on the existing dataset storing poly mba expression, generating non-poly mba expression.
+    Args:
+        fileread; file storing poly mba expression.
+        pool: the Z3VerifyPool object verifying the expressions in parallel, None for one by one.
+    """
+    filewrite = "{file}.nonpoly.dataset.txt".format(file=fileread)
+    with open(fileread, "r") as fr, open(filewrite, "w") as fw:
+        print("#original,complex,groundtruth,z3flag,transformation", file=fw)
+        for (originalExpre, complexExpre, groundExpre, z3res, transformationList) in iter_nonpoly(fr, pool):
+            print(originalExpre, complexExpre, groundExpre, z3res, transformationList,  sep=",", file=fw)
+            print(complexExpre, groundExpre, z3res) 
+
+    return None
+
+
+
+def main(fileread, workers=0):
+    if not workers:
+        nonpoly_dataset_generation(fileread)
+    else:
+        with Z3VerifyPool(workers) as pool:
+            nonpoly_dataset_generation(fileread, pool)
+            print(pool.info())
 
 
 
 if __name__ == "__main__":
     fileread = sys.argv[1]
-    main(fileread)
+    if len(sys.argv) > 2:
+        workers = int(sys.argv[2])
+        main(fileread, workers)
+    else:
+        main(fileread)
 
 
 
@@ -10,6 +10,7 @@ add 0-equality:
 """
 
 import argparse
+import itertools
 import numpy as np
 import os
 import random
@@ -17,13 +18,23 @@ import re
 import sys
 sys.setrecursionlimit(30000)
 sys.path.append("../tools")
+import threading
 import traceback
 import z3
 from lMBA_generate import complex_groundtruth
-from mba_string_operation import verify_mba_unsat, expression_2_term, generate_coe_bit, addMBA, variable_list
+from mba_ir import PolyMBA, poly_mba_parse
+from mba_shard import generate_dataset_shards, shard_seed
+from mba_string_operation import verify_mba_unsat, variable_list, DEFAULT_POLICY
+from mba_verify_pool import Z3_FLAG
 
 
 
+#the process-wide cache of the linear MBA datasets, key: absolute path of the file, value: ((modified time, size), MBAList),
+#the entry is replaced when the file is rewritten.
+MBA_DATASET = {}
+MBA_DATASET_LOCK = threading.Lock()
+
+
 class PolyMBAGenerator():
     """polynomial MBA expression generation, just for MBA * MBA.
     Attributes:
@@ -32,8 +43,12 @@ class PolyMBAGenerator():
         MBAfile1: the file storing the MBA expression.
         MBAfile2: the another file storing the MBA expression.
         MBAdesfile: the file storing the generated MBA expression.
+        MBAList1, MBAList2: the pairs of MBA expression in the two files, loaded at the first use and shared in the process,
+                            the files are checked for the rewriting only once in one generator.
+        policy: the VerifyPolicy object of the verification in the generation.
+        commutative: merge the terms a*b and b*a in the multiplication.
     """
-    def __init__(self, vnumber1, vnumber2, MBAfile1=None, MBAfile2=None, MBAdesfile=None):
+    def __init__(self, vnumber1, vnumber2, MBAfile1=None, MBAfile2=None, MBAdesfile=None, policy=None, commutative=True):
         if vnumber1 in [1, 2, 3, 4] and vnumber2 in [1, 2,3,4]:
             self.vnumber1 = vnumber1
             self.vnumber2 = vnumber2
@@ -45,31 +60,59 @@ class PolyMBAGenerator():
             self.MBAfile1 = "../dataset/lMBA_{vnumber}variable.dataset.sorted.txt".format(vnumber=vnumber1)
         else:
             self.MBAfile1 = MBAfile1
-        self.MBAList1 = self.get_MBA(self.MBAfile1)
         if not MBAfile2:
             self.MBAfile2 = "../dataset/lMBA_{vnumber}variable.dataset.sorted.txt".format(vnumber=vnumber2)
             #self.MBAfile2 = r"pMBA_{vnumber}*{vnumber}variable.dataset.sorted.txt".format(vnumber=vnumber2)
         else:
             self.MBAfile2 = MBAfile2
-        self.MBAList2 = self.get_MBA(self.MBAfile2)
         if not MBAdesfile:
             self.MBAdesfile = "../dataset/pMBA_{vnumber1}_{vnumber2}variable.dataset.txt".format(vnumber1=self.vnumber1, vnumber2=self.vnumber2)
         else:
             self.MBAdesfile = MBAdesfile
+        if not policy:
+            self.policy = DEFAULT_POLICY
+        else:
+            self.policy = policy
+        self.commutative = commutative
+        self.MBADict = {}
         
         return None
 
 
+    @property
+    def MBAList1(self):
+        """the list of pair on complex MBA and related ground truth in the first file, loaded at the first use.
+        """
+        return self.get_MBA(self.MBAfile1)
+
+
+    @property
+    def MBAList2(self):
+        """the list of pair on complex MBA and related ground truth in the second file, loaded at the first use.
+        """
+        return self.get_MBA(self.MBAfile2)
+
+
     def get_MBA(self, fileread):
-        """read the file storing linear MBA expression. 
+        """read the file storing linear MBA expression, the file is read only once in one process.
         Arg:
             fileread: the file storing linear MBA expression.
         Return:
-            MBAList: the list of pair on complex MBA and related ground truth.
+            MBAList: the list of pair on complex MBA and related ground truth, shared by all the generators.
         """
+        MBAList = self.MBADict.get(fileread)
+        if MBAList is not None:
+            return MBAList
+        abspath = os.path.realpath(fileread)
+        stat = os.stat(abspath)
+        #the rewritten file is read again
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        entry = MBA_DATASET.get(abspath)
+        if entry is not None and entry[0] == stamp:
+            self.MBADict[fileread] = entry[1]
+            return entry[1]
         MBAList = []
-        with open(fileread, "r") as fr:
-            linenum = 0
+        with open(abspath, "r") as fr:
             for line in fr:
                 if "#" not in line:
                     line = line.strip("\n")
@@ -77,41 +120,114 @@ class PolyMBAGenerator():
                     cmba = itemList[0]
                     gmba = itemList[1]
                     MBAList.append([cmba, gmba])
+        with MBA_DATASET_LOCK:
+            MBA_DATASET[abspath] = (stamp, MBAList)
+        self.MBADict[fileread] = MBAList
     
         return MBAList
 
 
-    def generate_pmba_dataset(self, mbanumber):
+    def generate_pmba_dataset(self, mbanumber, pool=None, jobs=None, seed=0, shardnumber=None, bitnumber=2):
         """generate the polynomial MBA expression dataset.
         Args:
             mbanumber: the nubmer of mba expression in the dataset.
+            pool: the Z3VerifyPool object verifying the expressions in parallel, None for one by one.
+            jobs: the number of the processes generating the shards, None for the global random module in this process.
+            seed: the master seed of the shards.
+            shardnumber: the number of the shards, None for the number of the processes.
+            bitnumber: the number of the bits of the variable in the verification.
         """
-        filewrite = self.MBAdesfile
-        fw = open(filewrite, "w")
-        print("#complex, groundtruth, z3flag, c_terms, g_terms", file=fw)
-    
-        #linenum = 0
-        for i in range(mbanumber):
-            expreList1 = random.choice(self.MBAList1)
-            expreList2 = random.choice(self.MBAList2)
-            (cmbaexpreList, gmbaexpreList) = self.generate_one_pMBA(expreList1, expreList2)
+        if pool and jobs:
+            print("the pool can not verify the shards of the jobs, choose one of them!")
+            traceback.print_stack()
+            sys.exit(0)
+        if jobs:
+            stats = generate_dataset_shards(self.generate_pmba_row, {}, self.verify_row, mbanumber, self.MBAdesfile, "#complex, groundtruth, z3flag, c_terms, g_terms", jobs, seed, shardnumber, bitnumber)
+            print(stats)
+            return None
+        self.pmba_dataset_write(self.pmba_iter(mbanumber, pool=pool, bitnumber=bitnumber), pool)
+
+        return None
+
+
+    def pmba_dataset_write(self, rowIter, pool=None):
+        """output the rows into the dataset file.
+        Args:
+            rowIter: the iterable of the rows from pmba_iter.
+            pool: the Z3VerifyPool object of the rows, None for one by one.
+        """
+        with open(self.MBAdesfile, "w") as fw:
+            print("#complex, groundtruth, z3flag, c_terms, g_terms", file=fw)
+            for row in rowIter:
+                if not pool:
+                    print("z3 result: ", row[2])
+                print(*row, sep=",", file=fw, flush=True)
+
+        return None
 
-            #complex mba expression
-            cmbaexpre = cmbaexpreList[0]
-            cmbaterm = "{item1}*{item2}".format(item1=cmbaexpreList[1], item2=cmbaexpreList[2])
-            #ground truth
-            gmbaexpre = gmbaexpreList[0]
-            gmbaterm = "{item1}*{item2}".format(item1=gmbaexpreList[1], item2=gmbaexpreList[2])
 
-            print("z3 solving...")
-            z3res = verify_mba_unsat(cmbaexpre, gmbaexpre, 2)
-            print("z3 result: ", z3res)
-            print(cmbaexpre, gmbaexpre, z3res, cmbaterm, gmbaterm, sep=",", file=fw, flush=True)
+    def pmba_iter(self, mbanumber=None, transformation=False, pool=None, rng=None, bitnumber=2):
+        """the rows of the polynomial MBA expression dataset one by one, at most one window of rows is in the pool.
+        Args:
+            mbanumber: the nubmer of mba expression, None for no end.
+            transformation: add one 0-equality to every polynomial MBA expression.
+            pool: the Z3VerifyPool object verifying the expressions in parallel, None for one by one.
+            rng: the random.Random object, None for the global random module.
+            bitnumber: the number of the bits of the variable in the verification.
+        Yields:
+            (cmbaexpre, gmbaexpre, z3res, cmbaterm, gmbaterm): one row of the dataset.
+        """
+        indexIter = range(mbanumber) if mbanumber is not None else itertools.count()
+        rowIter = (self.generate_pmba_row(transformation, rng) for i in indexIter)
+        if not pool:
+            for (cmbaexpre, gmbaexpre, cmbaterm, gmbaterm) in rowIter:
+                yield (cmbaexpre, gmbaexpre, self.verify_row(cmbaexpre, gmbaexpre, bitnumber), cmbaterm, gmbaterm)
+        else:
+            for ((cmbaexpre, gmbaexpre, cmbaterm, gmbaterm), result) in pool.verify_iter(((row[0], row[1], row) for row in rowIter), bitnumber):
+                yield (cmbaexpre, gmbaexpre, Z3_FLAG[result], cmbaterm, gmbaterm)
 
-        fw.close()
         return None
 
 
+    def verify_row(self, cmbaexpre, gmbaexpre, bitnumber=2):
+        """verify one row of the dataset by the policy of the generator, the row is one final expression.
+        Args:
+            cmbaexpre: the complex polynomial MBA expression.
+            gmbaexpre: the ground truth of the expression.
+            bitnumber: the number of the bits of the variable.
+        Returns:
+            z3res: True for the equation.
+        """
+        return self.policy.verify(cmbaexpre, gmbaexpre, bitnumber, kind="poly", final=True)
+
+
+    def generate_pmba_row(self, transformation=False, rng=None):
+        """generate one row of the polynomial MBA expression dataset.
+        Args:
+            transformation: add one 0-equality to the polynomial MBA expression.
+            rng: the random.Random object, None for the global random module.
+        Returns:
+            (cmbaexpre, gmbaexpre, cmbaterm, gmbaterm): the complex mba expression, the ground truth and their number of terms.
+        """
+        if not rng:
+            rng = random
+        expreList1 = rng.choice(self.MBAList1)
+        expreList2 = rng.choice(self.MBAList2)
+        if transformation:
+            (cmbaexpreList, gmbaexpreList) = self.generate_one_transform_pMBA(expreList1, expreList2, rng)
+        else:
+            (cmbaexpreList, gmbaexpreList) = self.generate_one_pMBA(expreList1, expreList2)
+
+        #complex mba expression
+        cmbaexpre = cmbaexpreList[0]
+        cmbaterm = "{item1}*{item2}".format(item1=cmbaexpreList[1], item2=cmbaexpreList[2])
+        #ground truth
+        gmbaexpre = gmbaexpreList[0]
+        gmbaterm = "{item1}*{item2}".format(item1=gmbaexpreList[1], item2=gmbaexpreList[2])
+
+        return (cmbaexpre, gmbaexpre, cmbaterm, gmbaterm)
+
+
     def generate_one_pMBA(self, expreList1, expreList2):
         """generate one poly MBA expression based on two linear MBA expressions.
         Args:
@@ -143,83 +259,47 @@ class PolyMBAGenerator():
             term1: the number of terms of one expression.
             term2: the number of terms of another one expression.
         """
-        #split the expression into terms
-        mbaexpre1List = expression_2_term(mbaexpre1)
-        #mbaexpre1List = [item for l in mbaexpre1List for item in l ] 
-        mbaexpre2List = expression_2_term(mbaexpre2)
-        #mbaexpre2List = [item for l in mbaexpre2List for item in l ] 
-
-        #split the mba term in the pair: coefficient, bitwise
-        coeBitList1 = generate_coe_bit(mbaexpre1List)
-        coeBitList2 = generate_coe_bit(mbaexpre2List)
-
-        #construct the terms in the new MBA expression
-        mbaexpreList = []
-        for item1 in coeBitList1:
-            for item2 in coeBitList2:
-                coe1 = item1[0]
-                bit1 = item1[1]
-                coe2 = item2[0]
-                bit2 = item2[1]
-                coe = int(coe1) * int(coe2)
-                coe = str(coe)
-                bit = "{bit1}*{bit2}".format(bit1=bit1, bit2=bit2)
-                if "-" in coe:
-                    mbaexpre = "{coe}*{bit}".format(coe=coe, bit=bit)
-                else:
-                    mbaexpre = "+{coe}*{bit}".format(coe=coe, bit=bit)
-                mbaexpreList.append(mbaexpre)
-                
-        #delete the start addition in the expression
-        if "+" in mbaexpreList[0]:
-            mbaexpreList[0] = mbaexpreList[0][1:]
-
-        #construct the MBA expression
-        mbaexpre = "".join(mbaexpreList)
+        #the like terms are combined in the multiplication
+        polyMBA1 = poly_mba_parse(mbaexpre1, self.commutative)
+        polyMBA2 = poly_mba_parse(mbaexpre2, self.commutative)
+        mbaexpre = polyMBA1.multiply(polyMBA2, self.commutative).bitwise_constant().to_string()
 
         #check resulting expression
         oriExpre = "({expre1})*({expre2})".format(expre1=mbaexpre1, expre2=mbaexpre2)
-        z3res = verify_mba_unsat(oriExpre, mbaexpre)
+        z3res = self.policy.verify(oriExpre, mbaexpre, kind="poly")
         if not z3res:
             print("error in function of MBA_multiply!")
             traceback.print_stack()
             sys.exit(0)
 
-        return mbaexpre, len(mbaexpre1List), len(mbaexpre2List)
+        return mbaexpre, len(polyMBA1), len(polyMBA2)
 
 
-    def generate_pmba_transformation_dataset(self, mbanumber):
+    def generate_pmba_transformation_dataset(self, mbanumber, pool=None, jobs=None, seed=0, shardnumber=None, bitnumber=2):
         """generate the polynomial MBA expression that has been added 0-equality.
         Args:
             mbanumber: the nubmer of mba expression in the dataset.
+            pool: the Z3VerifyPool object verifying the expressions in parallel, None for one by one.
+            jobs: the number of the processes generating the shards, None for the global random module in this process.
+            seed: the master seed of the shards.
+            shardnumber: the number of the shards, None for the number of the processes.
+            bitnumber: the number of the bits of the variable in the verification.
         """
+        if pool and jobs:
+            print("the pool can not verify the shards of the jobs, choose one of them!")
+            traceback.print_stack()
+            sys.exit(0)
+        if jobs:
+            stats = generate_dataset_shards(self.generate_pmba_row, {"transformation": True}, self.verify_row, mbanumber, self.MBAdesfile, "#complex, groundtruth, z3flag, c_terms, g_terms", jobs, seed, shardnumber, bitnumber)
+            print(stats)
+            return None
         #filewrite = self.MBAdesfile + ".transformation.txt"
-        fw = open(self.MBAdesfile, "w")
-        print("#complex, groundtruth, z3flag, c_terms, g_terms", file=fw)
-    
-        #linenum = 0
-        for i in range(mbanumber):
-            expreList1 = random.choice(self.MBAList1)
-            expreList2 = random.choice(self.MBAList2)
-            (cmbaexpreList, gmbaexpreList) = self.generate_one_transform_pMBA(expreList1, expreList2)
-
-            #complex mba expression
-            cmbaexpre = cmbaexpreList[0]
-            cmbaterm = "{item1}*{item2}".format(item1=cmbaexpreList[1], item2=cmbaexpreList[2])
-            #ground truth
-            gmbaexpre = gmbaexpreList[0]
-            gmbaterm = "{item1}*{item2}".format(item1=gmbaexpreList[1], item2=gmbaexpreList[2])
-
-            print("z3 solving...")
-            z3res = verify_mba_unsat(cmbaexpre, gmbaexpre, 2)
-            print("z3 result: ", z3res)
-            print(cmbaexpre, gmbaexpre, z3res, cmbaterm, gmbaterm, sep=",", file=fw, flush=True)
-
-        fw.close()
+        self.pmba_dataset_write(self.pmba_iter(mbanumber, transformation=True, pool=pool, bitnumber=bitnumber), pool)
+
         return None
 
 
-    def generate_one_transform_pMBA(self, expreList1, expreList2):
+    def generate_one_transform_pMBA(self, expreList1, expreList2, rng=None):
         """generate one poly MBA expression that has been added one 0-equality.
         Algorithm:
             originalPOly = expreStr1 * expreStr2
@@ -230,6 +310,7 @@ class PolyMBAGenerator():
         Args:
             expreList1: pair of one linear MBA expression, such as [complexMBA, groundtruth]
             expreList2: pair of another one linear MBA expression, like [complexMBA, groundtruth]
+            rng: the random.Random object, None for the global random module.
         Returns:
             cmbaexpreList: poly MBA expression, the terms of one complex MBA expression and the other one.
             gmbaexpreList: the related ground truth, the terms of one ground truth and the other one.
@@ -239,70 +320,67 @@ class PolyMBAGenerator():
         cmbaExpre2 = expreList2[0]
         gmbaExpre2 = expreList2[1]
 
-        #original poly MBA expression
-        originalcmbaExpreList = self.MBA_multiply(cmbaExpre1, cmbaExpre2)
-        originalcmbaExpre = originalcmbaExpreList[0]
+        #newmba = orimba + 0-equality
+        mbaExpre = self.add_zero_equality(cmbaExpre1, cmbaExpre2, rng)
 
-        cmbaExpreterm1 = expression_2_term(cmbaExpre1)
-        cmbaExpreterm2 = expression_2_term(cmbaExpre2)
+        #ground truth does not to be changed
+        gmbaExpreList = self.MBA_multiply(gmbaExpre1, gmbaExpre2)
+        #construct cmbaExpreList
+        cmbaExpreList = [mbaExpre, len(poly_mba_parse(mbaExpre)), 1]
+
+        return cmbaExpreList, gmbaExpreList
+
+
+    def add_zero_equality(self, cmbaExpre1, cmbaExpre2, rng=None):
+        """the product of two MBA expressions plus one 0-equality, computed on PolyMBA.
+        Algorithm:
+            originalPoly = cmbaExpre1 * cmbaExpre2
+            0-equality = (-1/1 * cmbaExpre1) * 0
+                       = (-1/1 * cmbaExpre1) * complex(0, sub-expression of cmbaExpre2, randomly reverse the coefficient)
+            newPoly = originalPoly + 0-equality
+        Args:
+            cmbaExpre1: one MBA expression.
+            cmbaExpre2: one linear MBA expression.
+            rng: the random.Random object, None for the global random module.
+        Returns:
+            mbaExpre: the result poly mba expression.
+        """
+        if not rng:
+            rng = random
+        polyMBA1 = poly_mba_parse(cmbaExpre1, self.commutative)
+        polyMBA2 = poly_mba_parse(cmbaExpre2, self.commutative)
+        #original poly MBA expression
+        originalMBA = polyMBA1.multiply(polyMBA2, self.commutative)
 
         #randomly reverse the sign of every term in cmbaexpre1
-        for (idx, term) in enumerate(cmbaExpreterm1):
-            r = random.randint(1,3)
-            #not reversed
-            if r % 2:
-                cmbaExpreterm1[idx] = term
-                continue
-            #reversed
-            if term[0] == "+":
-                cmbaExpreterm1[idx] = "-" + term[1:]
-            elif term[0] == "-":
-                cmbaExpreterm1[idx] = "+" + term[1:]
-            else:
-                cmbaExpreterm1[idx] = "-" + term
-        #construct the -1/1 * mbaexpre
-        cmbaExpre1 = "".join(cmbaExpreterm1)
-        if cmbaExpre1[0] == "+":
-            cmbaExpre1 = cmbaExpre1[1:]
-
-        #get part of the mbaexpre
-        partterm = cmbaExpreterm2[:len(cmbaExpreterm2) // 2 + 1]
-        #randomly reverse the sign of every term in cmbaexpre1
-        for (idx, term) in enumerate(partterm):
-            r = random.randint(1,3)
-            #not reversed
-            if r % 2:
-                partterm[idx] = term
-                continue
-            #reversed
-            if term[0] == "+":
-                partterm[idx] = "-" + term[1:]
-            elif term[0] == "-":
-                partterm[idx] = "+" + term[1:]
-            else:
-                partterm[idx] = "-" + term
-        #construct the part expression 
-        partExpre ="".join(partterm) 
-        if partExpre[0] == "+":
-            partExpre = partExpre[1:]
+        signedMBA = PolyMBA()
+        for (monomial, coe) in polyMBA1.termDict.items():
+            r = rng.randint(1,3)
+            signedMBA.termDict[monomial] = coe if r % 2 else -coe
+        #get part of the mbaexpre, randomly reverse the sign of every term
+        partMBA = PolyMBA()
+        for (monomial, coe) in list(polyMBA2.termDict.items())[:len(polyMBA2) // 2 + 1]:
+            r = rng.randint(1,3)
+            partMBA.termDict[monomial] = coe if r % 2 else -coe
         #construct a expression that equals to 0 
-        groundtruth = str(0)
-        zeroEquality = complex_groundtruth(groundtruth, partExpre)
+        zeroEquality = complex_groundtruth("0", partMBA.to_string(), self.policy, rng)
         #0-equality = 0-expression * part_mbaexpre
-        zeroEqualityList = self.MBA_multiply(cmbaExpre1, zeroEquality)
-        zeroMBAexpre = zeroEqualityList[0]
+        zeroMBA = signedMBA.multiply(poly_mba_parse(zeroEquality, self.commutative), self.commutative)
         #newmba = orimba + 0-equality
-        mbaExpre = addMBA(originalcmbaExpre, zeroMBAexpre)
+        mbaExpre = originalMBA.add(zeroMBA).bitwise_constant().to_string()
 
-        #ground truth does not to be changed
-        gmbaExpreList = self.MBA_multiply(gmbaExpre1, gmbaExpre2)
-        #construct cmbaExpreList
-        cmbaExpreList = [mbaExpre, len(expression_2_term(mbaExpre)), 1]
+        #check resulting expression
+        oriExpre = "({expre1})*({expre2})".format(expre1=cmbaExpre1, expre2=cmbaExpre2)
+        z3res = self.policy.verify(oriExpre, mbaExpre, kind="poly")
+        if not z3res:
+            print("error in function of add_zero_equality!")
+            traceback.print_stack()
+            sys.exit(0)
 
-        return cmbaExpreList, gmbaExpreList
+        return mbaExpre
 
 
-    def generate_pMBA_from_zeroequality(self, groundtruth):
+    def generate_pMBA_from_zeroequality(self, groundtruth, rng=None):
         """generate one poly MBA expression that has been added one 0-equality.
         Algorithm:
             originalPOly = complex(groundtruth) * complex(1)
@@ -312,66 +390,15 @@ class PolyMBAGenerator():
                     0-equality is suggested to be a linear MBA expression, non-linear MBA is difficulty to generate it.
         Args:
             groundtruth: a simplified expression.
+            rng: the random.Random object, None for the global random module.
         Returns:
             mbaexpre: the result poly mba expression.
         """
-        cmbaExpre1 = complex_groundtruth(groundtruth)
-        cmbaExpre2 = complex_groundtruth("1")
-
-        #original poly MBA expression
-        originalcmbaExpreList = self.MBA_multiply(cmbaExpre1, cmbaExpre2)
-        originalcmbaExpre = originalcmbaExpreList[0]
-
-        cmbaExpreterm1 = expression_2_term(cmbaExpre1)
-        cmbaExpreterm2 = expression_2_term(cmbaExpre2)
+        cmbaExpre1 = complex_groundtruth(groundtruth, policy=self.policy, rng=rng)
+        cmbaExpre2 = complex_groundtruth("1", policy=self.policy, rng=rng)
 
-        #randomly reverse the sign of every term in cmbaexpre1
-        for (idx, term) in enumerate(cmbaExpreterm1):
-            r = random.randint(1,3)
-            #not reversed
-            if r % 2:
-                cmbaExpreterm1[idx] = term
-                continue
-            #reversed
-            if term[0] == "+":
-                cmbaExpreterm1[idx] = "-" + term[1:]
-            elif term[0] == "-":
-                cmbaExpreterm1[idx] = "+" + term[1:]
-            else:
-                cmbaExpreterm1[idx] = "-" + term
-        #construct the -1/1 * mbaexpre
-        cmbaExpre1 = "".join(cmbaExpreterm1)
-        if cmbaExpre1[0] == "+":
-            cmbaExpre1 = cmbaExpre1[1:]
-
-        #get part of the mbaexpre
-        partterm = cmbaExpreterm2[:len(cmbaExpreterm2) // 2 + 1]
-        #randomly reverse the sign of every term in cmbaexpre1
-        for (idx, term) in enumerate(partterm):
-            r = random.randint(1,3)
-            #not reversed
-            if r % 2:
-                partterm[idx] = term
-                continue
-            #reversed
-            if term[0] == "+":
-                partterm[idx] = "-" + term[1:]
-            elif term[0] == "-":
-                partterm[idx] = "+" + term[1:]
-            else:
-                partterm[idx] = "-" + term
-        #construct the part expression 
-        partExpre ="".join(partterm) 
-        if partExpre[0] == "+":
-            partExpre = partExpre[1:]
-        #construct a expression that equals to 0 
-        groundtruth = str(0)
-        zeroEquality = complex_groundtruth(groundtruth, partExpre)
-        #0-equality = 0-expression * part_mbaexpre
-        zeroEqualityList = self.MBA_multiply(cmbaExpre1, zeroEquality)
-        zeroMBAexpre = zeroEqualityList[0]
         #newmba = orimba + 0-equality
-        mbaExpre = addMBA(originalcmbaExpre, zeroMBAexpre)
+        mbaExpre = self.add_zero_equality(cmbaExpre1, cmbaExpre2, rng)
 
         # #ground truth does not to be changed
         # gmbaExpreList = self.MBA_multiply(gmbaExpre1, gmbaExpre2)
@@ -382,6 +409,26 @@ class PolyMBAGenerator():
 
 
 
+def iter_pmba(vnumber1, vnumber2, mbanumber=None, transformation=False, pool=None, rng=None, MBAfile1=None, MBAfile2=None):
+    """the rows of the polynomial MBA expression dataset in the memory, generated lazily.
+    Args:
+        vnumber1: the number of variables in the first file.
+        vnumber2: the number of variables in the second file.
+        mbanumber: the nubmer of mba expression, None for no end.
+        transformation: add one 0-equality to every polynomial MBA expression.
+        pool: the Z3VerifyPool object verifying the expressions in parallel, None for one by one.
+        rng: the random.Random object, None for the global random module.
+        MBAfile1: the file storing the MBA expression, None for the sorted linear MBA dataset of vnumber1.
+        MBAfile2: the another file storing the MBA expression, None for the sorted linear MBA dataset of vnumber2.
+    Yields:
+        (cmbaexpre, gmbaexpre, z3res, cmbaterm, gmbaterm): one row of the dataset.
+    """
+    pmbaObj = PolyMBAGenerator(vnumber1, vnumber2, MBAfile1, MBAfile2)
+    yield from pmbaObj.pmba_iter(mbanumber, transformation, pool, rng)
+
+    return None
+
+
 def pMBA_sort_by_term(fileread=None, filewrite=None):
     """sort the poly MBA expression.
     Args:
@@ -431,15 +478,19 @@ def pMBA_sort_by_term(fileread=None, filewrite=None):
     return None
 
 
-def groundtruth_2_pmba(groundtruth, vnumber=2):
+def groundtruth_2_pmba(groundtruth, vnumber=2, policy=None, rng=None):
     """given one ground truth, construct one related complex polynomial mba expression
     Algorithm:
         groundtruth * 1.
     Args:
         groundtruth: one mba expression defined by the users.
+        policy: the VerifyPolicy object, None for DEFAULT_POLICY.
+        rng: the random.Random object, None for the global random module, the same seed gives the same expression.
     Returns:
         expreStr: the related complex linear mba expression.
     """
+    if not policy:
+        policy = DEFAULT_POLICY
     #get the number of variable in the expression
     vnumber1 = len(variable_list(groundtruth))
     if vnumber1 < vnumber:
@@ -448,16 +499,16 @@ def groundtruth_2_pmba(groundtruth, vnumber=2):
     #for more complexity, complex the groundtruth
     mbaStr1 = groundtruth
     #mbaStr1 = complex_groundtruth(groundtruth)
-    mbaStr2 = complex_groundtruth("1")
+    mbaStr2 = complex_groundtruth("1", policy=policy, rng=rng)
     #initialize the poly MBA generator
     cmbaList1 = [mbaStr1, mbaStr1]
     cmbaList2 = [mbaStr2, mbaStr2]
-    pmbaObj = PolyMBAGenerator(vnumber1, vnumber2)
+    pmbaObj = PolyMBAGenerator(vnumber1, vnumber2, policy=policy)
     #output one poly mba expression
     #resList = pmbaObj.generate_one_transform_pMBA(cmbaList1, cmbaList2)
     #pmbaExpre = resList[0][0]
-    pmbaExpre = pmbaObj.generate_pMBA_from_zeroequality(groundtruth)
-    z3res = verify_mba_unsat(pmbaExpre, groundtruth, 2)
+    pmbaExpre = pmbaObj.generate_pMBA_from_zeroequality(groundtruth, rng)
+    z3res = policy.verify(pmbaExpre, groundtruth, 2, kind="poly")
     if not z3res:
         print("error in groundtruth to poly mba expression")
         traceback.print_stack()
@@ -468,12 +519,16 @@ def groundtruth_2_pmba(groundtruth, vnumber=2):
 
 
 
-def high_degree_MBA_generation(vnumber1, vnumber2, degree, mbanumber=100):
+def high_degree_MBA_generation(vnumber1, vnumber2, degree, mbanumber=100, jobs=None, seed=0, shardnumber=None):
     """"one MBA expression on high degree generation by recursice method.
     Args:
         vnumber1: the number of variable of the dataset.
         vnumber2: the number of variable of the dataset.
         degree: the max degree of the generated expression.
+        mbanumber: the number of mba expression in every degree.
+        jobs: the number of the processes generating the shards, None for the global random module in this process.
+        seed: the master seed, every degree takes its own seed of the shards.
+        shardnumber: the number of the shards, None for the number of the processes.
     Returns;
         None.
         However, this function generates multiple middle file.
@@ -486,7 +541,7 @@ def high_degree_MBA_generation(vnumber1, vnumber2, degree, mbanumber=100):
         #generate i-degree mba expression
         filewrite1 = "../dataset/pMBA_{vnumber1}_{vnumber2}variable.{degree}degree.transformation.dataset.txt".format(vnumber1=vnumber1, vnumber2=vnumber2, degree=i)
         pmbaObj = PolyMBAGenerator(vnumber1, vnumber2, fileread1, fileread2, filewrite1)
-        pmbaObj.generate_pmba_transformation_dataset(mbanumber)
+        pmbaObj.generate_pmba_transformation_dataset(mbanumber, jobs=jobs, seed=shard_seed(seed, i), shardnumber=shardnumber)
         #pmbaObj.generate_pmba_transformation_dataset(mbanumber)
         # (fileread1 * fileread2) * fileread2 * fileread2 * ....
         fileread1 = filewrite1
@@ -525,8 +580,19 @@ def unittest(vnumber1, vnumber2, degree=2, mbanumber=100):
 
 
 
-def main(vnumber1, vnumber2, degree, mbanumber):
-    unittest(vnumber1, vnumber2, degree, mbanumber)
+def main(vnumber1, vnumber2, degree, mbanumber, jobs=None, seed=0, shardnumber=None, transformation=False):
+    if not jobs:
+        unittest(vnumber1, vnumber2, degree, mbanumber)
+        return None
+    if degree > 2:
+        high_degree_MBA_generation(vnumber1, vnumber2, degree, mbanumber, jobs, seed, shardnumber)
+        return None
+    pmbaObj = PolyMBAGenerator(vnumber1, vnumber2)
+    if transformation:
+        pmbaObj.generate_pmba_transformation_dataset(mbanumber, jobs=jobs, seed=seed, shardnumber=shardnumber)
+    else:
+        pmbaObj.generate_pmba_dataset(mbanumber, jobs=jobs, seed=seed, shardnumber=shardnumber)
+    sort_dataset(vnumber1, vnumber2)
 
     return None
 
@@ -534,17 +600,14 @@ def main(vnumber1, vnumber2, degree, mbanumber):
 
 
 if __name__ == "__main__":
-    vnumber1 = int(sys.argv[1])
-    vnumber2 = int(sys.argv[2])
-    if len(sys.argv) > 3:
-        degree  = int(sys.argv[3])
-    else:
-        degree = 2
-    if len(sys.argv) > 4:
-        mbanumber = int(sys.argv[4])
-    else:
-        mbanumber = 100
-    main(vnumber1, vnumber2, degree, mbanumber)
-
-
-
+    parser = argparse.ArgumentParser(description="generate the poly MBA dataset and the sorted one, the datasets of every degree above 2, the unit test runs without --jobs.")
+    parser.add_argument("vnumber1", type=int)
+    parser.add_argument("vnumber2", type=int)
+    parser.add_argument("degree", type=int, nargs="?", default=2)
+    parser.add_argument("mbanumber", type=int, nargs="?", default=100)
+    parser.add_argument("--jobs", type=int, default=None, help="the number of the processes generating the shards.")
+    parser.add_argument("--seed", type=int, default=0, help="the master seed of the shards.")
+    parser.add_argument("--shards", type=int, default=None, help="the number of the shards, the number of the jobs by default.")
+    parser.add_argument("--transformation", action="store_true", help="add one 0-equality to every poly MBA expression.")
+    args = parser.parse_args()
+    main(args.vnumber1, args.vnumber2, args.degree, args.mbanumber, args.jobs, args.seed, args.shards, args.transformation)
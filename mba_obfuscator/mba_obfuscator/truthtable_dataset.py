@@ -0,0 +1,662 @@
+#!/usr/bin/python3
+
+"""
+the entire truth table datasets shared in one process:
+    the file dataset/{n}variable_truthtable.txt is read and parsed only once,
+    all the generators get the same parsed basis from the registry.
+the binary format dataset/{n}variable_truthtable.bin, little-endian:
+    header: magic b"MBATT\\x00\\x01\\x00", the number of variables (uint32), the number of entries (uint32).
+    index: one record (truth table value uint32, offset uint32) per entry sorted by the value,
+           then one end record (0xffffffff, the length of the blob).
+    blob: the bitwise expressions concatenated in ASCII, the expression of the i-th record is
+          blob[offset_i:offset_(i+1)].
+    the file is memory-mapped, the entire table is indexed by the truth table value in O(1),
+    and a partial table is indexed by binary search.
+the 4-variable truth table is not shipped, it is synthesized on demand from the 3-variable one,
+    b_4 = (b_31 & ~t) | (b_32 & t),
+    only for the truth table values actually used, optionally persisted into a cache file.
+the minimal truth table is the alternative basis, every bitwise expression has the minimal size,
+    it is searched by the closure over &|^~ on the integer truth tables.
+"""
+
+import atexit
+import collections.abc
+import mmap
+import numpy as np
+import os
+import re
+import struct
+import sys
+sys.path.append("../tools")
+import threading
+import traceback
+from mba_string_operation import variable_bitmask
+
+
+class TruthTableBasis():
+    """the parsed entire truth table on n-variable.
+    Attributes:
+        vnumber: the number of variables.
+        truthDict: the dictionary, the MappedTruthTable or the SynthesizedTruthTable object, 
+                    key: the integer value of the truth table, value: the related bitwise expression.
+        signatureDict: key: the bitwise expression, value: the truth table on a format of tuple.
+                    For the synthesized and the mapped truth table, only the expressions handed out are contained.
+        standardBitList: bitwise expressions on standard basis vector, the index is the row of the 1 in the truth table.
+        nonstandardBitList: bitwise expressions without standard basis vector, the zero truth table is discarded.
+    The lists are shared by all the generators, so they must not be modified.
+    """
+    def __init__(self, vnumber, truthDict):
+        self.vnumber = vnumber
+        self.truthDict = truthDict
+        self.signatureDict = {}
+        self.standardBitList = [None] * 2**vnumber
+        #the synthesized expression is computed only when it is sampled
+        if isinstance(truthDict, SynthesizedTruthTable):
+            for row in range(2**vnumber):
+                self.standardBitList[row] = self.signature_entry(1 << row)
+            self.nonstandardBitList = BitwiseSequence(self)
+            return None
+        #the mapped expression is read from the file only when it is sampled
+        if isinstance(truthDict, MappedTruthTable):
+            for row in range(2**vnumber):
+                if (1 << row) in truthDict:
+                    self.standardBitList[row] = self.signature_entry(1 << row)
+            self.nonstandardBitList = MappedBitwiseSequence(self)
+            return None
+        self.nonstandardBitList = []
+        for (value, bitExpre) in sorted(truthDict.items(), key=lambda item: item[0]):
+            truthtable = tuple((value >> row) & 1 for row in range(2**vnumber))
+            self.signatureDict[bitExpre] = truthtable
+            #discard the zero value
+            if not value:
+                continue
+            #standard basis vector
+            elif not value & (value - 1):
+                self.standardBitList[truthtable.index(1)] = bitExpre
+            else:
+                self.nonstandardBitList.append(bitExpre)
+
+        return None
+
+
+    def signature_entry(self, value):
+        """get the bitwise expression of the truth table value and record its signature.
+        Args:
+            value: the integer value of the truth table.
+        Returns:
+            bitExpre: the related bitwise expression.
+        """
+        bitExpre = self.truthDict[value]
+        self.signatureDict[bitExpre] = tuple((value >> row) & 1 for row in range(2**self.vnumber))
+
+        return bitExpre
+
+
+    def signature_record(self, idx):
+        """get the bitwise expression of the idx-th record of the mapped truth table and record its signature.
+        Args:
+            idx: the index of the record.
+        Returns:
+            bitExpre: the related bitwise expression.
+        """
+        value = self.truthDict.record(idx)[0]
+        bitExpre = self.truthDict.expression(idx)
+        self.signatureDict[bitExpre] = tuple((value >> row) & 1 for row in range(2**self.vnumber))
+
+        return bitExpre
+
+
+class BitwiseSequence(collections.abc.Sequence):
+    """the bitwise expressions without standard basis vector in the ascending order of the truth table value,
+    the expression is only got from the truth table when it is indexed, such as by random.sample.
+    Attributes:
+        basis: the TruthTableBasis object.
+    """
+    def __init__(self, basis):
+        self.basis = basis
+        #all values minus the zero value and the standard basis vectors
+        self.length = 2**(2**basis.vnumber) - 1 - 2**basis.vnumber
+
+        return None
+
+
+    def __len__(self):
+        return self.length
+
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(self.length))]
+        if idx < 0:
+            idx += self.length
+        if not 0 <= idx < self.length:
+            raise IndexError(idx)
+        #the number of the non-standard values in [1, value] is value - value.bit_length(),
+        #the idx-th one is the first value that this number reaches idx + 1
+        value = idx + 1
+        while value - value.bit_length() < idx + 1:
+            value += 1
+
+        return self.basis.signature_entry(value)
+
+
+class MappedBitwiseSequence(collections.abc.Sequence):
+    """the bitwise expressions without standard basis vector of the mapped truth table in the ascending order of the truth table value,
+    the records are sorted by the value, so the idx-th expression is the idx-th record out of the zero value and the standard basis vectors,
+    it is only read from the file when it is indexed, such as by random.sample.
+    Attributes:
+        basis: the TruthTableBasis object.
+        excludeList: the sorted indices of the records of the zero value and the standard basis vectors.
+    """
+    def __init__(self, basis):
+        self.basis = basis
+        truthDict = basis.truthDict
+        valueList = [0] + [1 << row for row in range(2**basis.vnumber)]
+        self.excludeList = sorted(idx for idx in map(truthDict.find, valueList) if idx >= 0)
+        self.length = len(truthDict) - len(self.excludeList)
+
+        return None
+
+
+    def __len__(self):
+        return self.length
+
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(self.length))]
+        if idx < 0:
+            idx += self.length
+        if not 0 <= idx < self.length:
+            raise IndexError(idx)
+        #skip the excluded records before the idx-th one
+        recordIdx = idx
+        for excludeIdx in self.excludeList:
+            if excludeIdx > recordIdx:
+                break
+            recordIdx += 1
+
+        return self.basis.signature_record(recordIdx)
+
+
+def compose_bitwise_expression(truthValue, vnumber, freevariable, lastTruthDict):
+    """based on the value of truth table, compose one new bitwise expression from the (n-1)-variable truth table,
+        b_n = (b_pre & ~freevariable) | (b_post & freevariable),
+        b_pre is the half of the truth table where the free variable is 0, b_post is the other half.
+    Args:
+        truthValue: the value on the truth table.
+        vnumber: the number of variables in one bitwise expression.
+        freevariable: the new variable added into the generated bitwise expression.
+        lastTruthDict: the last one entire truth table dictionary.
+    Returns:
+        bitExpre: the bitwise expression.
+    """
+    halfLength = 2**(vnumber - 1)
+    prevalue = truthValue & (2**halfLength - 1)
+    postvalue = (truthValue >> halfLength) & (2**halfLength - 1)
+    prebitExpre = lastTruthDict[prevalue]
+    postbitExpre = lastTruthDict[postvalue]
+    bitExpre = "(({pre}&~{fv})|({post}&{fv}))".format(pre=prebitExpre, post=postbitExpre, fv=freevariable)
+
+    return bitExpre
+
+
+class SynthesizedTruthTable():
+    """the n-variable truth table synthesized on demand from the (n-1)-variable truth table, a read-only dictionary
+    from the truth table value to the bitwise expression. The new variable takes the highest bit of the row number.
+    Attributes:
+        vnumber: the number of variables, 3 or 4.
+        lastTruthDict: the (n-1)-variable truth table.
+        cachefile: the binary file persisting the synthesized entries, None for not persisting.
+        entryDict: the synthesized entries.
+    """
+    def __init__(self, vnumber, lastTruthDict=None, cachefile=None):
+        if vnumber not in [3, 4]:
+            print("only the 3/4-variable truth table can be synthesized!")
+            traceback.print_stack()
+            sys.exit(0)
+        self.vnumber = vnumber
+        self.freevariable = {3: "z", 4: "t"}[vnumber]
+        if lastTruthDict is None:
+            lastTruthDict = load_truthtable(vnumber - 1)
+        self.lastTruthDict = lastTruthDict
+        self.cachefile = cachefile
+        self.entryDict = {}
+        self.savedNumber = 0
+        if cachefile and os.path.exists(cachefile):
+            with MappedTruthTable(cachefile) as cacheTable:
+                self.entryDict.update(cacheTable.items())
+            self.savedNumber = len(self.entryDict)
+        if cachefile:
+            atexit.register(self.save)
+
+        return None
+
+
+    def __getitem__(self, value):
+        bitExpre = self.entryDict.get(value)
+        if bitExpre is None:
+            if not 0 <= value < 2**(2**self.vnumber):
+                raise KeyError(value)
+            bitExpre = compose_bitwise_expression(value, self.vnumber, self.freevariable, self.lastTruthDict)
+            self.entryDict[value] = bitExpre
+
+        return bitExpre
+
+
+    def get(self, value, default=None):
+        if not 0 <= value < 2**(2**self.vnumber):
+            return default
+
+        return self[value]
+
+
+    def __contains__(self, value):
+        return 0 <= value < 2**(2**self.vnumber)
+
+
+    def __len__(self):
+        return 2**(2**self.vnumber)
+
+
+    def items(self):
+        for value in range(2**(2**self.vnumber)):
+            yield (value, self[value])
+
+
+    def save(self, cachefile=None):
+        """persist the synthesized entries into the binary cache file, merged with the entries already in the file.
+        Args:
+            cachefile: the binary file, the default one is self.cachefile.
+        """
+        if not cachefile:
+            cachefile = self.cachefile
+        if not cachefile or len(self.entryDict) == self.savedNumber:
+            return None
+        entryDict = {}
+        if os.path.exists(cachefile):
+            with MappedTruthTable(cachefile) as cacheTable:
+                entryDict.update(cacheTable.items())
+        entryDict.update(self.entryDict)
+        write_truthtable_binary(entryDict, self.vnumber, cachefile)
+        self.savedNumber = len(self.entryDict)
+
+        return None
+
+
+def truthtable_filename(vnumber, suffix="txt", basis="default"):
+    """the path of the file storing the entire truth table.
+    Args:
+        vnumber: the number of variables.
+        suffix: "txt" for the text file, "bin" for the binary file.
+        basis: "default" for the truth table of the dataset, "minimal" for the minimal truth table.
+    Returns:
+        filename: the absolute path of the file.
+    """
+    abspath = os.path.realpath(__file__)
+    (dirpath, filename) = os.path.split(abspath)
+    if basis == "minimal":
+        filename = "{dirpath}/../dataset/{vnumber}variable_minimal_truthtable.{suffix}".format(dirpath=dirpath, vnumber=vnumber, suffix=suffix)
+    else:
+        filename = "{dirpath}/../dataset/{vnumber}variable_truthtable.{suffix}".format(dirpath=dirpath, vnumber=vnumber, suffix=suffix)
+
+    return filename
+
+
+def read_truthtable(filename):
+    """read the entire truth table from the file.
+    Args:
+        filename: the file storing the truth table, one line is like "[0 1 1 0],(x^y)".
+    Returns:
+        truthDict: key: the integer value of the truth table, value: the related bitwise expression.
+    """
+    truthDict = {}
+    with open(filename, "r") as fr:
+        for line in fr:
+            if "#" not in line:
+                line = line.strip()
+                itemList = re.split(",", line)
+                truthtable = itemList[0].strip("[]").split()
+                bitExpre = itemList[1]
+                key = 0
+                for (idx, char) in enumerate(truthtable):
+                    key += int(char) << idx
+                truthDict[key] = bitExpre
+
+    return truthDict
+
+
+BINARY_MAGIC = b"MBATT\x00\x01\x00"
+BINARY_HEADER = struct.Struct("<8sII")
+BINARY_RECORD = struct.Struct("<II")
+BINARY_END = 0xffffffff
+
+
+def write_truthtable_binary(truthDict, vnumber, filename):
+    """write the truth table into the binary file.
+    Args:
+        truthDict: key: the integer value of the truth table, value: the related bitwise expression.
+        vnumber: the number of variables.
+        filename: the binary file.
+    """
+    recordList = []
+    blobList = []
+    offset = 0
+    for (value, bitExpre) in sorted(truthDict.items()):
+        item = bitExpre.encode("ascii")
+        recordList.append(BINARY_RECORD.pack(value, offset))
+        blobList.append(item)
+        offset += len(item)
+    recordList.append(BINARY_RECORD.pack(BINARY_END, offset))
+    #write into a temporary file firstly, the mapped file of other process is not broken
+    tmpfile = "{filename}.{pid}.tmp".format(filename=filename, pid=os.getpid())
+    with open(tmpfile, "wb") as fw:
+        fw.write(BINARY_HEADER.pack(BINARY_MAGIC, vnumber, len(truthDict)))
+        fw.write(b"".join(recordList))
+        fw.write(b"".join(blobList))
+    os.replace(tmpfile, filename)
+
+    return None
+
+
+class MappedTruthTable():
+    """the memory-mapped binary truth table, a read-only dictionary from the truth table value to the bitwise expression.
+    Attributes:
+        filename: the binary file.
+        vnumber: the number of variables.
+        count: the number of entries.
+        dense: whether the entries are exactly the values 0 ... count - 1.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, "rb") as fr:
+            self.buffer = mmap.mmap(fr.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.vnumber, self.count) = BINARY_HEADER.unpack_from(self.buffer, 0)
+        if magic != BINARY_MAGIC:
+            print("{filename} is not a binary truth table!".format(filename=filename))
+            traceback.print_stack()
+            sys.exit(0)
+        self.indexStart = BINARY_HEADER.size
+        self.blobStart = self.indexStart + (self.count + 1) * BINARY_RECORD.size
+        #the last entry of the entire table is the value count - 1
+        if self.count:
+            lastValue = self.record(self.count - 1)[0]
+        else:
+            lastValue = -1
+        self.dense = lastValue == self.count - 1
+
+        return None
+
+
+    def record(self, idx):
+        """the idx-th record of the index.
+        Returns:
+            (value, offset): the truth table value and the offset of the expression in the blob.
+        """
+        return BINARY_RECORD.unpack_from(self.buffer, self.indexStart + idx * BINARY_RECORD.size)
+
+
+    def expression(self, idx):
+        """the bitwise expression of the idx-th record.
+        """
+        start = self.record(idx)[1]
+        end = self.record(idx + 1)[1]
+
+        return self.buffer[self.blobStart + start:self.blobStart + end].decode("ascii")
+
+
+    def find(self, value):
+        """the index of the record with the value.
+        Returns:
+            idx: the index of the record, -1 if the value is not found.
+        """
+        if self.dense:
+            if 0 <= value < self.count:
+                return value
+            return -1
+        low = 0
+        high = self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.record(middle)[0] < value:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count and self.record(low)[0] == value:
+            return low
+        return -1
+
+
+    def __getitem__(self, value):
+        idx = self.find(value)
+        if idx < 0:
+            raise KeyError(value)
+
+        return self.expression(idx)
+
+
+    def get(self, value, default=None):
+        idx = self.find(value)
+        if idx < 0:
+            return default
+
+        return self.expression(idx)
+
+
+    def __contains__(self, value):
+        return self.find(value) >= 0
+
+
+    def __len__(self):
+        return self.count
+
+
+    def keys(self):
+        for idx in range(self.count):
+            yield self.record(idx)[0]
+
+
+    def items(self):
+        for idx in range(self.count):
+            yield (self.record(idx)[0], self.expression(idx))
+
+
+    def close(self):
+        self.buffer.close()
+
+        return None
+
+
+    def __reduce__(self):
+        #the mapping is not pickled, the process of the shard maps the same file again
+        return (MappedTruthTable, (self.filename,))
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, excType, excValue, tb):
+        self.close()
+
+        return False
+
+
+def convert_truthtable(vnumber):
+    """convert the text file of the truth table into the binary file.
+    Args:
+        vnumber: the number of variables.
+    Returns:
+        filename: the binary file.
+    """
+    truthDict = read_truthtable(truthtable_filename(vnumber))
+    filename = truthtable_filename(vnumber, "bin")
+    write_truthtable_binary(truthDict, vnumber, filename)
+
+    return filename
+
+
+def closure_truthtable(vnumber):
+    """search the entire truth table by the closure over &|^~ on the integer truth tables, 
+    level by level on the size of the expression, so every value gets one expression of the minimal size.
+    Algorithm:
+        size 1: the variables.
+        size s: ~a for a of size s-1, a&b, a|b, a^b for a of size i, b of size s-1-i.
+        the new values of one level are vectorized by numpy, the first pair producing one value is kept.
+    Args:
+        vnumber: the number of variables.
+    Returns:
+        truthDict: key: the integer value of the truth table, value: the bitwise expression of the minimal size.
+    """
+    (variableDict, mask) = variable_bitmask(vnumber)
+    total = mask + 1
+    found = np.zeros(total, dtype=bool)
+    #the operator(0: variable, 1: &, 2: |, 3: ^, 4: ~) and the operands of every value
+    operatorArray = np.zeros(total, dtype=np.int8)
+    leftArray = np.zeros(total, dtype=np.int64)
+    rightArray = np.zeros(total, dtype=np.int64)
+    variableName = {}
+    levelList = [None, []]
+    for var in ["x", "y", "z", "t"]:
+        if var in variableDict:
+            value = variableDict[var]
+            found[value] = True
+            variableName[value] = var
+            levelList[1].append(value)
+    levelList[1] = np.array(levelList[1], dtype=np.int64)
+    foundNumber = len(levelList[1])
+    chunkSize = 2**22
+
+    while foundNumber < total:
+        size = len(levelList)
+        newList = []
+
+        def add_value(valueArray, operator, leftValue, rightValue):
+            """record the values not found before."""
+            newMask = ~found[valueArray]
+            if not newMask.any():
+                return 0
+            (uniqueArray, firstIndex) = np.unique(valueArray[newMask], return_index=True)
+            found[uniqueArray] = True
+            operatorArray[uniqueArray] = operator
+            leftArray[uniqueArray] = leftValue[newMask][firstIndex]
+            rightArray[uniqueArray] = rightValue[newMask][firstIndex]
+            newList.append(uniqueArray)
+            return len(uniqueArray)
+
+        #unary operator
+        lastLevel = levelList[size - 1]
+        if len(lastLevel):
+            foundNumber += add_value(lastLevel ^ mask, 4, lastLevel, lastLevel)
+        #binary operators are commutative, so only size(a) <= size(b)
+        for leftSize in range(1, size - 1):
+            rightSize = size - 1 - leftSize
+            if leftSize > rightSize:
+                break
+            leftLevel = levelList[leftSize]
+            rightLevel = levelList[rightSize]
+            if not len(leftLevel) or not len(rightLevel):
+                continue
+            step = max(1, chunkSize // len(rightLevel))
+            for start in range(0, len(leftLevel), step):
+                leftChunk = leftLevel[start:start + step, None]
+                shape = (len(leftChunk), len(rightLevel))
+                leftValue = np.broadcast_to(leftChunk, shape).ravel()
+                rightValue = np.broadcast_to(rightLevel[None, :], shape).ravel()
+                foundNumber += add_value((leftChunk & rightLevel).ravel(), 1, leftValue, rightValue)
+                foundNumber += add_value((leftChunk | rightLevel).ravel(), 2, leftValue, rightValue)
+                foundNumber += add_value((leftChunk ^ rightLevel).ravel(), 3, leftValue, rightValue)
+        if newList:
+            levelList.append(np.concatenate(newList))
+        else:
+            levelList.append(np.zeros(0, dtype=np.int64))
+
+    #render the expressions from the smaller values to the larger ones
+    truthDict = dict(variableName)
+    operatorChar = {1: "&", 2: "|", 3: "^"}
+    for level in levelList[2:]:
+        for value in level.tolist():
+            operator = int(operatorArray[value])
+            left = truthDict[int(leftArray[value])]
+            if operator == 4:
+                truthDict[value] = "~" + left
+            else:
+                right = truthDict[int(rightArray[value])]
+                truthDict[value] = "(" + left + operatorChar[operator] + right + ")"
+    truthDict = dict(sorted(truthDict.items()))
+
+    return truthDict
+
+
+def load_truthtable(vnumber, cachefile=None, basis="default"):
+    """load the entire truth table, the binary file is preferred, the text file is the fallback,
+    the 4-variable truth table is synthesized on demand if it is not in the dataset,
+    the minimal truth table is searched in memory if it is not in the dataset.
+    Args:
+        vnumber: the number of variables.
+        cachefile: the binary file persisting the synthesized entries, None for not persisting.
+        basis: "default" for the truth table of the dataset, "minimal" for the minimal truth table.
+    Returns:
+        truthDict: the dictionary, the MappedTruthTable or the SynthesizedTruthTable object, 
+                    key: the integer value of the truth table, value: the related bitwise expression.
+    """
+    filename = truthtable_filename(vnumber, "bin", basis)
+    if os.path.exists(filename):
+        return MappedTruthTable(filename)
+    filename = truthtable_filename(vnumber, "txt", basis)
+    if os.path.exists(filename):
+        return read_truthtable(filename)
+    if basis == "minimal":
+        return closure_truthtable(vnumber)
+    if vnumber == 4:
+        return SynthesizedTruthTable(vnumber, cachefile=cachefile)
+
+    return read_truthtable(filename)
+
+
+#the process-wide registry of the parsed truth tables, key: (the number of variables, basis).
+TRUTHTABLE_REGISTRY = {}
+REGISTRY_LOCK = threading.Lock()
+
+
+def get_truthtable_basis(vnumber, cachefile=None, basis="default"):
+    """get the parsed entire truth table, the file is read only at the first call in one process.
+    Args:
+        vnumber: the number of variables.
+        cachefile: the binary file persisting the synthesized 4-variable entries, only used at the first call.
+        basis: "default" for the truth table of the dataset, "minimal" for the minimal truth table.
+    Returns:
+        basis: the TruthTableBasis object.
+    Raises:
+        through out SystemExit exception.
+    """
+    key = (vnumber, basis)
+    truthBasis = TRUTHTABLE_REGISTRY.get(key)
+    if truthBasis:
+        return truthBasis
+    if vnumber not in [1, 2, 3, 4] or basis not in ["default", "minimal"]:
+        print("the value of vnumber or basis is wrong!")
+        traceback.print_stack()
+        sys.exit(0)
+    with REGISTRY_LOCK:
+        if key not in TRUTHTABLE_REGISTRY:
+            truthDict = load_truthtable(vnumber, cachefile, basis)
+            TRUTHTABLE_REGISTRY[key] = TruthTableBasis(vnumber, truthDict)
+
+    return TRUTHTABLE_REGISTRY[key]
+
+
+
+def main(vnumberList):
+    for vnumber in vnumberList:
+        filename = convert_truthtable(vnumber)
+        print("convert {vnumber}-variable truth table into {filename}".format(vnumber=vnumber, filename=filename))
+
+    return None
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        main([int(item) for item in sys.argv[1:]])
+    else:
+        main([1, 2, 3])
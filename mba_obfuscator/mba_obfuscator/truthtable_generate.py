@@ -10,6 +10,11 @@ truth table generation methods:
         step2: construct one bitwise expression on (n+1)-variable, let (n+1)_th variable is x,
                 b_(n+1) = (b_n1 & ~x) | (b_n2 & x)
         step3: construct the entire truth table on (n+1)-variable.
+    the last method: closure search on the integer truth table
+        step1: the variables are the bitwise expressions of size 1.
+        step2: combine the bitwise expressions of smaller size by &|^~ level by level,
+                only the first expression of every new truth table is kept.
+        step3: stop when the entire truth table is found, every expression has the minimal size.
 
 Given the complexity of computation and storage,
 the computation complexity is O(2**(2**n)),
@@ -31,6 +36,7 @@ import time
 import traceback
 import z3
 from mba_string_operation import truthtable_bitwise
+from truthtable_dataset import closure_truthtable, compose_bitwise_expression, load_truthtable, truthtable_filename, write_truthtable_binary
 
 
 def gen_1variable_truthtable(vnumber=1):
@@ -113,28 +119,33 @@ def gen_2variable_truthtable(vnumber=2):
     return None
 
 
-def output_truthtable(truthtableList, vnumber):
+def output_truthtable(truthtableList, vnumber, basis="default"):
     """output the entire truth table into file.
     Args:
         truthtableList: the list of truthtable and related bitwise expression.
         vnumver: the number of variables in one bitwise expression.
+        basis: "default" for the truth table of the dataset, "minimal" for the minimal truth table.
     """
-    filename = "../dataset/{vnumber}variable_truthtable.txt".format(vnumber=vnumber)
+    filename = truthtable_filename(vnumber, "txt", basis)
+    truthDict = {}
     with open(filename, "wt") as fw:
         truthtable = None
         bitwiseExpre = None
         print("#truth_table, bitwiseExpression", file=fw)
-        for item in truthtableList:
+        for (idx, item) in enumerate(truthtableList):
             if item:
                 truthtable = item[1]
                 truthtable = np.array(truthtable)
                 bitwiseExpre = item[0]
                 print(truthtable, bitwiseExpre, sep=",", file=fw)
+                truthDict[idx] = bitwiseExpre
             else:
                 print("empth entry in truth table, unable to output to file")
                 traceback.print_stack()
                 sys.exit(0)
-
+    #the binary file for the memory-mapped loading
+    filename = truthtable_filename(vnumber, "bin", basis)
+    write_truthtable_binary(truthDict, vnumber, filename)
 
     return None
 
@@ -362,6 +373,23 @@ def gen_4variable_truthtable(vnumber=4):
     return None
 
 
+def gen_minimal_truthtable(vnumber):
+    """entire truth table generation by the closure search, every bitwise expression has the minimal size.
+    Args:
+        vnumber: the number of variables in one bitwise expression.
+    Returns:
+        truthtableList: the list of bitwise expression and related truth table.
+    """
+    start = time.time()
+    truthDict = closure_truthtable(vnumber)
+    truthtableList = [[bitExpre, truthtable_bitwise(bitExpre, vnumber=vnumber)] for (truthValue, bitExpre) in sorted(truthDict.items())]
+    print("{vnumber}-variable minimal truth table: {number} entries, {elapsed:.3f}s".format(vnumber=vnumber, number=len(truthtableList), elapsed=time.time() - start))
+
+    output_truthtable(truthtableList, vnumber, "minimal")
+
+    return truthtableList
+
+
         
 def generate_one_new_bitwise_expression(truthValue, vnumber, freevariable, lastTruthDict=None):
     """based on the value of truth table, generate one new bitwise expression.
@@ -376,22 +404,8 @@ def generate_one_new_bitwise_expression(truthValue, vnumber, freevariable, lastT
     if not lastTruthDict:
         lastTruthDict = truthtable2dict(vnumber - 1)
 
-    #construct the truth table
-    truthtableStr = "0" * 2**vnumber + bin(truthValue)[2:]
-    truthtableStr = truthtableStr[::-1][:2**vnumber]
-    #split the truth table in the middle
-    truthtablepreStr = truthtableStr[:2**(vnumber - 1)]
-    truthtablepostStr = truthtableStr[2**(vnumber - 1):]
-    prevalue = 0
-    postvalue = 0
-    for (ix, char) in enumerate(truthtablepreStr):
-        prevalue += 2**ix * int(char)
-    for (ix, char) in enumerate(truthtablepostStr):
-        postvalue += 2**ix * int(char)
     #concatenate the new bitwise expression
-    prebitExpre = lastTruthDict[prevalue]
-    postbitExpre = lastTruthDict[postvalue]
-    bitExpre = "(({pre}&~{fv})|({post}&{fv}))".format(pre=prebitExpre, post=postbitExpre, fv=freevariable)
+    bitExpre = compose_bitwise_expression(truthValue, vnumber, freevariable, lastTruthDict)
     #construct the truth table
     truthList = truthtable_bitwise(bitExpre, vnumber=vnumber)
     item = [bitExpre, truthList]
@@ -402,27 +416,15 @@ def generate_one_new_bitwise_expression(truthValue, vnumber, freevariable, lastT
 
 
 def truthtable2dict(vnumber):
-    """read the truth table from a file, build one related dictionary.
+    """load the truth table from the binary file or the text file, build one related dictionary.
     Args:
         vnumber: the number of variables on the last truth table.
     Returns:
-        truthDict: one dictionary on the truth table,
+        truthDict: one dictionary on the truth table, the binary file is memory-mapped and indexed in O(1),
                     key: the integer value of the truth table,
                     value: the related bitwise expression of a truth table.
     """
-    filename = "{vnumber}variable_truthtable.txt".format(vnumber=vnumber)
-    truthDict = {}
-    with open(filename, "r") as fr:
-        for line in fr:
-            if "#" not in line:
-                line = line.strip()
-                itemList = re.split(",", line)
-                truthtable = itemList[0][1:-1].replace(" ", "")
-                bitExpre= itemList[1]
-                key = 0
-                for (idx, char) in enumerate(truthtable):
-                    key += 2**idx * int(char)
-                truthDict[key] = bitExpre
+    truthDict = load_truthtable(vnumber)
 
     #assert len(truthDict) == 2**(2**vnumber), "read the last one containing truth table occurs error!"
 
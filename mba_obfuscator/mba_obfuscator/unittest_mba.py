@@ -5,14 +5,21 @@ unit test for MBA expression generation,
 including linear, polynomial, non-polynomial.
 """
 
+import os
+import random
 import sys
 sys.path.append("../tools")
+import tempfile
 import z3
 
-from lMBA_generate import complex_groundtruth
-from mba_string_operation import verify_mba_unsat
-from pMBA_generate import groundtruth_2_pmba
-from nonpMBA_generate import add_zero,recursively_apply,replace_sub_expre,replace_one_variable
+from lMBA_generate import complex_groundtruth, LinearMBAGenerator
+from mba_string_operation import verify_mba_unsat, verify_linear_mba, verify_poly_mba, verify_stats_info, truthtable_bitmask
+from pMBA_generate import groundtruth_2_pmba, iter_pmba
+from nonpMBA_generate import add_zero,recursively_apply,replace_sub_expre,replace_one_variable, iter_nonpoly, NONPOLY_ERROR
+from mba_pipeline import MBAPipeline
+from mba_shard import generate_dataset_shards
+from truthtable_dataset import MappedTruthTable, SynthesizedTruthTable, TruthTableBasis, truthtable_filename
+from mba_verify_pool import Z3VerifyPool
 
 
 
@@ -109,6 +116,255 @@ def unittest_groundtruth_2_complex(groundtruth=None):
     else:
         print("the test, nonpoly MBA expression generatation from the ground truth(replace_sub_expre), unpass!")
 
+    print("verification:", verify_stats_info())
+
+    return None
+
+
+
+def unittest_bitwise_truthtable(vnumber=4):
+    """unit test of the truth table of the bitwise expression against the semantics of python eval,
+    including the binary operators without parentheses.
+    Args:
+        vnumber: the number of variables.
+    Returns:
+        None.
+    """
+    bitwiseList = ["x&y|z", "~x&y|z", "x|y&z", "x^y&z", "x|y^z", "x&y^z|t", "~x|~y&z^t", "~(x&~y)|z&t", "x^y^z^t", "(x|y)&~(z^t)"]
+    #the bit of the row number related to every variable, the same rows as variable_bitmask
+    nameList = ["y", "x", "z", "t"]
+    testall = True
+    for bitExpre in bitwiseList:
+        expected = 0
+        for row in range(2**vnumber):
+            variableDict = {name: (row >> bit) & 1 for (bit, name) in enumerate(nameList)}
+            if eval(bitExpre, {}, variableDict) & 1:
+                expected |= 1 << row
+        bitmask = truthtable_bitmask(bitExpre, vnumber)
+        print(bitExpre, bitmask, expected)
+        if bitmask != expected:
+            testall = False
+    if testall:
+        print("the test, truth table of the bitwise expression against python eval, pass!")
+    else:
+        print("the test, truth table of the bitwise expression against python eval, unpass!")
+
+    return None
+
+
+
+def unittest_truthtable_basis(seed=0):
+    """unit test of the basis on the mapped truth table, the lazy lists are the same as the ones of the parsed dictionary,
+    and the synthesized entries persisted in the cache file are read back.
+    Args:
+        seed: the seed of the random.Random objects.
+    Returns:
+        None.
+    """
+    testall = True
+    for vnumber in [1, 2, 3]:
+        with MappedTruthTable(truthtable_filename(vnumber, "bin")) as truthTable:
+            lazyBasis = TruthTableBasis(vnumber, truthTable)
+            eagerBasis = TruthTableBasis(vnumber, dict(truthTable.items()))
+            number = min(5, len(eagerBasis.nonstandardBitList))
+            if lazyBasis.standardBitList != eagerBasis.standardBitList or list(lazyBasis.nonstandardBitList) != eagerBasis.nonstandardBitList:
+                testall = False
+            if random.Random(seed).sample(lazyBasis.nonstandardBitList, number) != random.Random(seed).sample(eagerBasis.nonstandardBitList, number):
+                testall = False
+    with tempfile.TemporaryDirectory() as tempdir:
+        cachefile = os.path.join(tempdir, "4variable_truthtable.cache.bin")
+        synthTable = SynthesizedTruthTable(4, cachefile=cachefile)
+        bitList = [synthTable[value] for value in [3, 0x8001, 0xfff0]]
+        synthTable.save()
+        if [SynthesizedTruthTable(4, cachefile=cachefile).entryDict.get(value) for value in [3, 0x8001, 0xfff0]] != bitList:
+            testall = False
+    if testall:
+        print("the test, the lazy basis on the mapped truth table, pass!")
+    else:
+        print("the test, the lazy basis on the mapped truth table, unpass!")
+
+    return None
+
+
+
+def unittest_verify_linear():
+    """unit test of verify_linear_mba against verify_mba_unsat on the known equal and unequal pairs,
+    including the constants and the expressions out of linear mba that go to z3.
+    Args:
+        None.
+    Returns:
+        None.
+    """
+    #(left expression, right expression, bit number, expected result)
+    pairList = [("x+y", "(x|y)+(x&y)", 2, True),
+                ("x-y", "(x^y)-2*(~x&y)", 2, True),
+                ("x+1", "-~x", 2, True),
+                ("-1", "x+~x", 2, True),
+                ("x-y-1", "x+~y", 8, True),
+                ("4*(x&y)", "0", 2, True),
+                ("x+y", "(x|y)", 2, False),
+                ("x+~y", "x-y", 2, False),
+                ("x+2", "x-~x", 8, False),
+                ("4*(x&y)", "0", 3, False),
+                #out of linear mba
+                ("x*y", "(x&y)*(x|y)+(x&~y)*(~x&y)", 2, True),
+                ("x*y", "(x|y)*(x&y)", 2, False)]
+    mismatchList = []
+    for (leftExpre, rightExpre, bitnumber, expected) in pairList:
+        resList = [verify_linear_mba(leftExpre, rightExpre, bitnumber), verify_mba_unsat(leftExpre, rightExpre, bitnumber)]
+        if resList != [expected, expected]:
+            mismatchList.append((leftExpre, rightExpre, bitnumber, resList))
+    print("pairs:", len(pairList), "mismatch:", mismatchList)
+    if not mismatchList:
+        print("the test, verify_linear_mba consistent with z3, pass!")
+    else:
+        print("the test, verify_linear_mba consistent with z3, unpass!")
+
+    return None
+
+
+
+def unittest_verify_poly():
+    """unit test of verify_poly_mba against verify_mba_unsat on the known equal and unequal pairs,
+    including the constants, the pairs whose homogeneous difference is not 0 but the functions are equal,
+    and the expressions out of the sum of products that go to z3.
+    Args:
+        None.
+    Returns:
+        None.
+    """
+    #(left expression, right expression, bit number, expected result)
+    pairList = [("x*y", "(x&y)*(x|y)+(x&~y)*(~x&y)", 2, True),
+                ("x*(x+y)", "x*x+x*y", 8, True),
+                ("2*x*y+1", "2*((x&y)*(x|y)+(x&~y)*(~x&y))+1", 8, True),
+                ("1", "x*0+1", 2, True),
+                ("4*x*y", "0", 2, True),
+                #the homogeneous difference is not 0, the fallback to z3 proves the equation
+                ("2*x*x", "2*x", 2, True),
+                ("x*x", "x", 1, True),
+                ("x*y", "(x|y)*(x&y)", 2, False),
+                ("x*y", "(x^y)*y", 2, False),
+                ("x*y", "y*x+1", 2, False),
+                ("x*x", "x", 2, False),
+                ("4*x*y", "0", 3, False),
+                #out of the sum of products
+                ("x+y", "(x|y)+(x&y)", 2, True),
+                ("x**2", "x*x", 2, True)]
+    mismatchList = []
+    for (leftExpre, rightExpre, bitnumber, expected) in pairList:
+        resList = [verify_poly_mba(leftExpre, rightExpre, bitnumber), verify_mba_unsat(leftExpre, rightExpre, bitnumber)]
+        if resList != [expected, expected]:
+            mismatchList.append((leftExpre, rightExpre, bitnumber, resList))
+    print("pairs:", len(pairList), "mismatch:", mismatchList)
+    if not mismatchList:
+        print("the test, verify_poly_mba consistent with z3, pass!")
+    else:
+        print("the test, verify_poly_mba consistent with z3, unpass!")
+
+    return None
+
+
+
+def unittest_long_expression(termnumber=3000):
+    """unit test of the verification of the sum too long for python eval, it goes to the parser and z3.
+    Args:
+        termnumber: the number of the terms of the sum.
+    Returns:
+        None.
+    """
+    sumStr = "+".join("{coe}*(x&~y)".format(coe=idx % 7 + 1) for idx in range(termnumber))
+    total = sum(idx % 7 + 1 for idx in range(termnumber))
+    resList = [verify_mba_unsat(sumStr, "{coe}*(x&~y)".format(coe=total), 8), verify_mba_unsat(sumStr, "{coe}*(x&~y)".format(coe=total + 1), 8)]
+    print(termnumber, "terms:", resList)
+    if resList == [True, False]:
+        print("the test, verification of the expression too long for eval, pass!")
+    else:
+        print("the test, verification of the expression too long for eval, unpass!")
+
+    return None
+
+
+
+def unittest_chained_iter(mbanumber=24, seed=0):
+    """unit test of the non-poly rows generated from the rows of iter_pmba,
+    every row comes out, the failed generation is flagged instead of stopping the iterator,
+    at least one row is verified and the flagged row keeps the 5 columns of the dataset.
+    Args:
+        mbanumber: the number of the poly rows.
+        seed: the seed of the random.Random object.
+    Returns:
+        None.
+    """
+    rng = random.Random(seed)
+    rowList = list(iter_nonpoly(iter_pmba(2, 2, mbanumber, rng=rng), rng=rng))
+    errorList = [row for row in rowList if row[3] == NONPOLY_ERROR]
+    for row in rowList:
+        if row[3] != NONPOLY_ERROR:
+            print(row[2], row[1], row[3])
+    verifiedList = [row for row in rowList if row[3] is True]
+    print("rows:", len(rowList), "verified:", len(verifiedList), "flagged:", len(errorList), "flagged ratio: {ratio:.2f}".format(ratio=len(errorList) / max(len(rowList), 1)))
+    if len(rowList) == mbanumber and verifiedList and len(verifiedList) + len(errorList) == len(rowList) and all(len(",".join(str(item) for item in row).split(",")) == 5 for row in errorList):
+        print("the test, nonpoly MBA expression generatation from the rows of iter_pmba, pass!")
+    else:
+        print("the test, nonpoly MBA expression generatation from the rows of iter_pmba, unpass!")
+
+    return None
+
+
+
+def unittest_shard_reproducible(mbanumber=12, seed=5, shardnumber=3):
+    """unit test of the sharded generation, the same master seed and the same number of the shards give the same dataset
+    byte for byte, whatever the number of the processes.
+    Args:
+        mbanumber: the number of the rows.
+        seed: the master seed.
+        shardnumber: the number of the shards.
+    Returns:
+        None.
+    """
+    lmbaObj = LinearMBAGenerator(2)
+    contentList = []
+    with tempfile.TemporaryDirectory() as tempdir:
+        for jobs in [1, 2, 3]:
+            filewrite = os.path.join(tempdir, "lMBA.jobs{jobs}.dataset.txt".format(jobs=jobs))
+            generate_dataset_shards(lmbaObj.generate_lmba_row, {}, lmbaObj.verify_row, mbanumber, filewrite, "#complex, groundtruth, z3flag", jobs, seed, shardnumber)
+            with open(filewrite, "rb") as fr:
+                contentList.append(fr.read())
+    print("jobs 1, 2, 3:", [len(content) for content in contentList], "bytes")
+    if contentList[0].count(b"\n") == mbanumber + 1 and all(content == contentList[0] for content in contentList):
+        print("the test, the same dataset of the shards on the different numbers of the processes, pass!")
+    else:
+        print("the test, the same dataset of the shards on the different numbers of the processes, unpass!")
+
+    return None
+
+
+
+def unittest_pipeline_error(mbanumber=12, seed=1):
+    """unit test of the nonpoly pipeline on the poly rows, the failed rows are flagged and the pipeline does not stop.
+    Args:
+        mbanumber: the number of the poly rows.
+        seed: the seed of the rows and the master seed of the pipeline.
+    Returns:
+        None.
+    """
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as tempdir:
+        fileread = os.path.join(tempdir, "pMBA.dataset.txt")
+        filewrite = fileread + ".nonpoly.dataset.txt"
+        with open(fileread, "w") as fw:
+            print("#complex, groundtruth, z3flag, c_terms, g_terms", file=fw)
+            for row in iter_pmba(2, 2, mbanumber, rng=rng):
+                print(*row, sep=",", file=fw)
+        with Z3VerifyPool(1) as pool:
+            stats = MBAPipeline("nonpoly", {"fileread": fileread}, pool, generators=2, seed=seed).run(filewrite)
+        with open(filewrite, "r") as fr:
+            flagList = [line.strip().split(",")[3] for line in fr if "#" not in line]
+    print("rows:", len(flagList), "flagged:", flagList.count(NONPOLY_ERROR))
+    if len(flagList) == mbanumber and flagList.count(NONPOLY_ERROR) == stats["error"] and stats["error"] and all(flag in ["True", NONPOLY_ERROR] for flag in flagList):
+        print("the test, nonpoly MBA pipeline with the failed rows, pass!")
+    else:
+        print("the test, nonpoly MBA pipeline with the failed rows, unpass!")
 
     return None
 
@@ -116,6 +372,14 @@ def unittest_groundtruth_2_complex(groundtruth=None):
 
 def main( ):
     unittest_groundtruth_2_complex()
+    unittest_bitwise_truthtable()
+    unittest_truthtable_basis()
+    unittest_verify_linear()
+    unittest_verify_poly()
+    unittest_long_expression()
+    unittest_chained_iter()
+    unittest_shard_reproducible()
+    unittest_pipeline_error()
 
     return None
 
@@ -0,0 +1,622 @@
+#!/usr/bin/python3
+
+"""
+This file including the operation of MBA expression by the abstract syntax tree.
+The tree is made of tuples:
+    ("var", name), ("const", value),
+    ("~", child), ("neg", child),
+    (op, left, right) for op in +, -, *, &, |, ^.
+The precedence of the operators is the same as python, so the tree is what eval() computes.
+"""
+
+import re
+import sys
+import threading
+import time
+import traceback
+import z3
+
+
+#the tokens of the mba expression, the spaces are skipped, any other character is one unknown token,
+#the run of the word characters is classified by the token table, such as "3x" is one unknown token.
+SCAN_PATTERN = re.compile("[-+&|^~()]|\\*\\*?|\\w+|\\S")
+#the binary operators from the lowest precedence to the highest one.
+BINARY_PRECEDENCE = {"|": 1, "^": 2, "&": 3, "+": 4, "-": 4, "*": 5}
+
+
+class TokenTable(dict):
+    """the token of every item of the scan, the item is classified at the first use.
+    """
+    def __missing__(self, item):
+        if item.isdigit():
+            token = ("const", int(item))
+        elif item[0].isalpha() or item[0] == "_":
+            token = ("var", item)
+        elif item == "**":
+            raise ValueError("the power operator is not supported.")
+        else:
+            raise ValueError("unknown character in the expression: {expre}".format(expre=item))
+        #the constants do not grow the table without bound
+        if len(self) < 65536:
+            self[item] = token
+
+        return token
+
+
+#the token of every scanned item, every item is classified once.
+TOKEN_TABLE = TokenTable({op: ("op", op) for op in ["+", "-", "*", "&", "|", "^", "~", "(", ")"]})
+
+
+def expression_tokenize(expreStr):
+    """split the mba expression into tokens.
+    Args:
+        expreStr: the mba expression string.
+    Returns:
+        tokenList: the list of (kind, value), kind is "const", "var" or "op".
+    Raises:
+        ValueError: unknown character in the expression.
+    """
+    return list(map(TOKEN_TABLE.__getitem__, SCAN_PATTERN.findall(expreStr)))
+
+
+def expression_parse(expreStr):
+    """parse the mba expression into the tree by precedence climbing.
+    Args:
+        expreStr: the mba expression string.
+    Returns:
+        node: the root of the tree.
+    Raises:
+        ValueError: the syntax error of the expression.
+    """
+    tokenList = expression_tokenize(expreStr)
+    (node, idx) = parse_binary(tokenList, 0, 1)
+    if idx != len(tokenList):
+        raise ValueError("unexpected token in the expression: {expre}".format(expre=expreStr))
+
+    return node
+
+
+def parse_binary(tokenList, idx, precedence):
+    """parse the binary operators whose precedence is not lower than precedence.
+    Args:
+        tokenList: the list of tokens.
+        idx: the position of the first token.
+        precedence: the minimal precedence.
+    Returns:
+        (node, idx): the tree and the position after it.
+    """
+    (node, idx) = parse_unary(tokenList, idx)
+    while idx < len(tokenList):
+        (kind, value) = tokenList[idx]
+        if kind != "op" or value not in BINARY_PRECEDENCE or BINARY_PRECEDENCE[value] < precedence:
+            break
+        #all the binary operators are left associative
+        (right, idx) = parse_binary(tokenList, idx + 1, BINARY_PRECEDENCE[value] + 1)
+        node = (value, node, right)
+
+    return (node, idx)
+
+
+def parse_unary(tokenList, idx):
+    """parse the unary operators, the constant, the variable and the parenthesized expression.
+    Args:
+        tokenList: the list of tokens.
+        idx: the position of the first token.
+    Returns:
+        (node, idx): the tree and the position after it.
+    """
+    if idx >= len(tokenList):
+        raise ValueError("unexpected end of the expression.")
+    (kind, value) = tokenList[idx]
+    if kind == "const":
+        return (("const", value), idx + 1)
+    elif kind == "var":
+        return (("var", value), idx + 1)
+    elif value == "(":
+        (node, idx) = parse_binary(tokenList, idx + 1, 1)
+        if idx >= len(tokenList) or tokenList[idx] != ("op", ")"):
+            raise ValueError("unbalanced parentheses in the expression.")
+        return (node, idx + 1)
+    elif value in "~-+":
+        (child, idx) = parse_unary(tokenList, idx + 1)
+        if value == "+":
+            return (child, idx)
+        elif value == "-":
+            #fold the negative constant
+            if child[0] == "const":
+                return (("const", -child[1]), idx)
+            return (("neg", child), idx)
+        return (("~", child), idx)
+    raise ValueError("unexpected token {value} in the expression.".format(value=value))
+
+
+#the sign of one term.
+SIGN_PATTERN = re.compile("[-+]")
+
+
+def expression_terms(expreStr):
+    """split the mba expression into the terms of the "+" and "-" out of the parentheses,
+    they are the operands of the top sum of the tree of expression_parse, found in one pass over the tokens,
+    the expression whose top operator is not "+" or "-", such as "(x+y)|z", is one term.
+    The sign is binary after one operand, the variable, the constant or ")", otherwise it is unary and stays in the term.
+    Args:
+        expreStr: the mba expression string.
+    Returns:
+        termList: the list of the terms with their signs, such as ["3*(x&y)", "-2*~x", "+5"], in the order of the expression.
+    Raises:
+        ValueError: the unbalanced parentheses, unknown character in the expression.
+    """
+    if not expreStr.strip():
+        return []
+    itemList = SCAN_PATTERN.findall(expreStr)
+    #every distinct token is classified once, the token table rejects the unknown character
+    for item in dict.fromkeys(itemList):
+        TOKEN_TABLE[item]
+    #the order of the binary signs among all the signs, every "+" or "-" of the string is one token
+    cutList = []
+    signIdx = -1
+    depth = 0
+    operand = False
+    bitwise = False
+    for item in itemList:
+        if item == "+" or item == "-":
+            signIdx += 1
+            if operand and not depth:
+                cutList.append(signIdx)
+            operand = False
+        elif depth:
+            #in the parentheses only the depth is tracked
+            if item == "(":
+                depth += 1
+            elif item == ")":
+                depth -= 1
+                operand = True
+        elif item == "(":
+            depth += 1
+        elif item == ")":
+            raise ValueError("unbalanced parentheses in the expression.")
+        elif item == "&" or item == "|" or item == "^":
+            #the bitwise operator is below "+" and "-", the whole expression is one term
+            bitwise = True
+            operand = False
+        else:
+            #the constant and the variable are the operands
+            operand = item != "*" and item != "~"
+    if depth:
+        raise ValueError("unbalanced parentheses in the expression.")
+    if bitwise or not cutList:
+        return [expreStr.strip()]
+    signList = [matchObj.start() for matchObj in SIGN_PATTERN.finditer(expreStr)]
+    startList = [0] + [signList[idx] for idx in cutList]
+    endList = startList[1:] + [len(expreStr)]
+
+    return [expreStr[start:end].strip() for (start, end) in zip(startList, endList)]
+
+
+def term_coefficient_split(termStr):
+    """split the term into the sign, the coefficient and the body by the leading tokens,
+    the coefficient is the constant before "*" or the constant alone.
+    Args:
+        termStr: one term, such as "-3*(x&y)", "+~x", "5".
+    Returns:
+        (sign, coefficient, body): sign is 1 or -1, coefficient is None without the number before "*",
+                                   body is "" for the constant.
+    Raises:
+        ValueError: unknown character in the term.
+    """
+    sign = 1
+    coefficient = None
+    for matchObj in SCAN_PATTERN.finditer(termStr):
+        item = matchObj.group()
+        if coefficient is None:
+            if item == "-":
+                sign = -sign
+                continue
+            elif item == "+":
+                continue
+            elif TOKEN_TABLE[item][0] == "const":
+                coefficient = TOKEN_TABLE[item][1]
+                bodyStart = matchObj.start()
+                continue
+            return (sign, None, termStr[matchObj.start():].strip())
+        #the constant is followed by "*" and the body
+        if item == "*":
+            body = termStr[matchObj.end():].strip()
+            if body:
+                return (sign, coefficient, body)
+        return (sign, None, termStr[bodyStart:].strip())
+    if coefficient is None:
+        return (sign, None, "")
+
+    return (sign, coefficient, "")
+
+
+def expression_names(expreStr):
+    """the variable names of the tokens in the order of their first appearance, every distinct token is classified once.
+    Raises:
+        ValueError: unknown character in the expression.
+    """
+    return [item for item in dict.fromkeys(SCAN_PATTERN.findall(expreStr)) if TOKEN_TABLE[item][0] == "var"]
+
+
+def expression_postfix(node):
+    """the postfix string of the tree, the operands go before the operator.
+    Args:
+        node: the root of the tree.
+    Returns:
+        postfixStr: the postfix string, such as "xy~&" for "x&~y".
+    """
+    op = node[0]
+    if op == "var":
+        return node[1]
+    elif op == "const":
+        return str(node[1])
+    elif op == "~":
+        return expression_postfix(node[1]) + "~"
+    elif op == "neg":
+        return expression_postfix(node[1]) + "-"
+
+    return expression_postfix(node[1]) + expression_postfix(node[2]) + op
+
+
+def expression_variable(node, varSet=None):
+    """the variable names in the tree.
+    Args:
+        node: the root of the tree.
+        varSet: the set collecting the names.
+    Returns:
+        varSet: the set of the variable names.
+    """
+    if varSet is None:
+        varSet = set()
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if node[0] == "var":
+            varSet.add(node[1])
+        elif node[0] != "const":
+            stack.extend(node[1:])
+
+    return varSet
+
+
+#the associative and commutative operators.
+COMMUTATIVE_OPERATOR = ["+", "*", "&", "|", "^"]
+
+
+def expression_canonical(node):
+    """the canonical string of the tree, the operands of the associative and commutative operators are flattened and sorted,
+    a - b is taken as a + -b, so the expressions only different on the order of the operands have the same canonical string.
+    Args:
+        node: the root of the tree.
+    Returns:
+        canonStr: the canonical string.
+    """
+    op = node[0]
+    if op == "const":
+        return str(node[1])
+    elif op == "var":
+        return node[1]
+    elif op in ["~", "neg"]:
+        childStr = expression_canonical(node[1])
+        #-(-a) = a
+        if op == "neg" and childStr.startswith("-("):
+            return childStr[2:-1]
+        return "{op}({child})".format(op="~" if op == "~" else "-", child=childStr)
+    #flatten the operands of the same operator
+    kind = "+" if op == "-" else op
+    operandList = []
+    stack = [(node, False)]
+    while stack:
+        (item, negative) = stack.pop()
+        itemOp = item[0]
+        if kind == "+" and itemOp in ["+", "-"]:
+            stack.append((item[1], negative))
+            stack.append((item[2], negative if itemOp == "+" else not negative))
+        elif kind != "+" and itemOp == kind:
+            stack.append((item[1], negative))
+            stack.append((item[2], negative))
+        elif negative:
+            operandList.append(expression_canonical(("neg", item)))
+        else:
+            operandList.append(expression_canonical(item))
+    canonStr = "{op}({operand})".format(op=kind, operand=",".join(sorted(operandList)))
+
+    return canonStr
+
+
+def expression_evaluate(node, variableDict):
+    """evaluate the tree on python integers, or any values supporting the operators.
+    Args:
+        node: the root of the tree.
+        variableDict: the value of every variable name.
+    Returns:
+        value: the value of the tree.
+    """
+    op = node[0]
+    if op == "const":
+        return node[1]
+    elif op == "var":
+        return variableDict[node[1]]
+    elif op == "~":
+        return ~expression_evaluate(node[1], variableDict)
+    elif op == "neg":
+        return -expression_evaluate(node[1], variableDict)
+    left = expression_evaluate(node[1], variableDict)
+    right = expression_evaluate(node[2], variableDict)
+    if op == "+":
+        return left + right
+    elif op == "-":
+        return left - right
+    elif op == "*":
+        return left * right
+    elif op == "&":
+        return left & right
+    elif op == "|":
+        return left | right
+
+    return left ^ right
+
+
+class Z3Verifier():
+    """the long-lived z3 context and solver on one bit width,
+    the z3 term of every distinct sub-tree is built only once and shared by all the queries,
+    every query is solved between push() and pop() of the same solver.
+    Attributes:
+        bitnumber: the number of the bits of the variable.
+        timeout: the timeout of one query in milliseconds, None for no timeout.
+        context: the z3 context.
+        solver: the z3 solver of the qfbv tactic.
+        variableDict: the z3 bit-vector of every variable name.
+        nodeDict: the interned id of every sub-tree, key: ("var", name), ("const", value) or (op, child ids).
+        termList: the z3 term of every interned id.
+        maxterm: the cache is dropped when the number of terms exceeds it.
+        calls: the number of queries.
+        elapsed: the total time of the queries in seconds.
+        lastElapsed: the time of the last query in seconds.
+    """
+    def __init__(self, bitnumber=2, timeout=None, maxterm=200000):
+        self.bitnumber = bitnumber
+        self.timeout = timeout
+        self.context = z3.Context()
+        #the bit-blasting solver keeps the speed of one fresh solver under push/pop
+        self.solver = z3.Tactic("qfbv", ctx=self.context).solver()
+        if timeout:
+            self.solver.set("timeout", timeout)
+        self.variableDict = {}
+        self.nodeDict = {}
+        self.termList = []
+        self.maxterm = maxterm
+        self.calls = 0
+        self.elapsed = 0.0
+        self.lastElapsed = 0.0
+        self.lock = threading.Lock()
+
+        return None
+
+
+    def z3_term(self, node):
+        """build the z3 term of the tree, the post-order walk without recursion,
+        every sub-tree is interned to one integer id by the ids of its children, so the lookup does not hash the sub-tree.
+        Args:
+            node: the root of the tree.
+        Returns:
+            term: the z3 bit-vector term.
+        """
+        nodeDict = self.nodeDict
+        termList = self.termList
+        #the interned id of every visited sub-tree of this call, key: id() of the tuple
+        idDict = {}
+        stack = [node]
+        while stack:
+            item = stack[-1]
+            if id(item) in idDict:
+                stack.pop()
+                continue
+            op = item[0]
+            if op in ["var", "const"]:
+                key = item
+            else:
+                childList = [child for child in item[1:] if id(child) not in idDict]
+                if childList:
+                    stack.extend(childList)
+                    continue
+                key = (op,) + tuple(idDict[id(child)] for child in item[1:])
+            stack.pop()
+            termId = nodeDict.get(key)
+            if termId is None:
+                termId = len(termList)
+                termList.append(self.build_term(op, item, key))
+                nodeDict[key] = termId
+            idDict[id(item)] = termId
+
+        return termList[idDict[id(node)]]
+
+
+    def build_term(self, op, item, key):
+        """the z3 term of one node whose children have been built.
+        Args:
+            op: the operator of the node.
+            item: the node of the tree.
+            key: the interned key of the node, the ids of the children for the operator.
+        Returns:
+            term: the z3 bit-vector term.
+        """
+        if op == "const":
+            return z3.BitVecVal(item[1], self.bitnumber, ctx=self.context)
+        elif op == "var":
+            return self.variable(item[1])
+        elif op == "~":
+            return ~self.termList[key[1]]
+        elif op == "neg":
+            return -self.termList[key[1]]
+        left = self.termList[key[1]]
+        right = self.termList[key[2]]
+        if op == "+":
+            return left + right
+        elif op == "-":
+            return left - right
+        elif op == "*":
+            return left * right
+        elif op == "&":
+            return left & right
+        elif op == "|":
+            return left | right
+
+        return left ^ right
+
+
+    def variable(self, name):
+        """the z3 bit-vector of the variable name, created at the first use.
+        """
+        if name not in self.variableDict:
+            self.variableDict[name] = z3.BitVec(name, self.bitnumber, ctx=self.context)
+
+        return self.variableDict[name]
+
+
+    def check(self, leftNode, rightNode):
+        """check the relation whether the left tree is equal to the right tree.
+        Args:
+            leftNode: the left tree.
+            rightNode: the right tree.
+        Returns:
+            result: "unsat" for equation, "sat" for unequal, "unknown" for the timeout.
+        """
+        with self.lock:
+            if len(self.termList) > self.maxterm:
+                self.nodeDict.clear()
+                self.termList.clear()
+            leftTerm = self.z3_term(leftNode)
+            rightTerm = self.z3_term(rightNode)
+
+        return self.check_term(leftTerm, rightTerm)
+
+
+    def check_term(self, leftTerm, rightTerm):
+        """check the relation whether two z3 terms in the context of the verifier are equal.
+        Args:
+            leftTerm: the left z3 term.
+            rightTerm: the right z3 term.
+        Returns:
+            result: "unsat" for equation, "sat" for unequal, "unknown" for the timeout.
+        """
+        with self.lock:
+            start = time.time()
+            self.solver.push()
+            self.solver.add(leftTerm != rightTerm)
+            result = str(self.solver.check())
+            self.solver.pop()
+            self.lastElapsed = time.time() - start
+            self.elapsed += self.lastElapsed
+            self.calls += 1
+
+        return result
+
+
+    def verify(self, leftExpre, rightExpre):
+        """check the relation whether the left expression is euqal to the right expression.
+        Args:
+            leftExpre: left expression.
+            rightExpre: right expression.
+        Returns:
+            True: equation.
+            False: unequal or unknown.
+        """
+        result = self.check(expression_parse(leftExpre), expression_parse(rightExpre))
+
+        return result == "unsat"
+
+
+    def info(self):
+        """the statistics of the verifier.
+        Returns:
+            infoDict: the bit width, the number of queries, the total/last/average time and the number of cached terms.
+        """
+        infoDict = {"bitnumber": self.bitnumber, "calls": self.calls, "elapsed": self.elapsed, "lastElapsed": self.lastElapsed, "average": self.elapsed / self.calls if self.calls else 0.0, "terms": len(self.termList)}
+
+        return infoDict
+
+
+#the process-wide verifiers, key: (the number of the bits, timeout).
+Z3_VERIFIER = {}
+Z3_VERIFIER_LOCK = threading.Lock()
+
+
+def get_z3_verifier(bitnumber=2, timeout=None):
+    """get the long-lived verifier on the bit width, created at the first call in one process.
+    Args:
+        bitnumber: the number of the bits of the variable.
+        timeout: the timeout of one query in milliseconds.
+    Returns:
+        verifier: the Z3Verifier object.
+    """
+    key = (bitnumber, timeout)
+    verifier = Z3_VERIFIER.get(key)
+    if verifier:
+        return verifier
+    with Z3_VERIFIER_LOCK:
+        if key not in Z3_VERIFIER:
+            Z3_VERIFIER[key] = Z3Verifier(bitnumber, timeout)
+
+    return Z3_VERIFIER[key]
+
+
+def verify_mba_z3(leftExpre, rightExpre, bitnumber=2):
+    """check the relation whether the left expression is euqal to the right expression by the long-lived verifier.
+    Args:
+        leftExpre: left expression.
+        rightExpre: right expression.
+        bitnumber: the number of the bits of the variable.
+    Returns:
+        (result, elapsed): result is True for equation, False for unequal, elapsed is the time in seconds.
+    """
+    verifier = get_z3_verifier(bitnumber)
+    result = verifier.verify(leftExpre, rightExpre)
+
+    return (result, verifier.lastElapsed)
+
+
+
+def unittest():
+    """unit test of the parser and the verifier.
+    """
+    for expreStr in ["x+y*2", "-x&~y|3", "(x^y)-~x*-2", "x-y-1", "++7*~(x|y)-3*x*y"]:
+        node = expression_parse(expreStr)
+        for (x, y) in [(5, 1), (-3, 12), (0, -1)]:
+            assert expression_evaluate(node, {"x": x, "y": y}) == eval(expreStr, {}, {"x": x, "y": y}), print("error in the parser", expreStr)
+        print(expreStr, node)
+    termDict = {"-1*y+1*~(x|y)+3": ["-1*y", "+1*~(x|y)", "+3"], "4*((3*x)&(+1*~x))-2*~(x-y)": ["4*((3*x)&(+1*~x))", "-2*~(x-y)"],
+                "x*-y+ 2 * z": ["x*-y", "+ 2 * z"], "(x+y)|z-1": ["(x+y)|z-1"], "-" + "(" * 20 + "x-y" + ")" * 20 + "+y": ["-" + "(" * 20 + "x-y" + ")" * 20, "+y"]}
+    for (expreStr, termList) in termDict.items():
+        assert expression_terms(expreStr) == termList, print("error in the term split", expreStr, expression_terms(expreStr))
+        #the terms add up to the tree of the whole expression
+        variableDict = {"x": 7, "y": -3, "z": 12}
+        assert sum(expression_evaluate(expression_parse(term), variableDict) for term in termList) == expression_evaluate(expression_parse(expreStr), variableDict), print("error in the term split", expreStr)
+    for (termStr, res) in [("-3*(x&y)", (-1, 3, "(x&y)")), ("+~x", (1, None, "~x")), ("- -5", (1, 5, "")), ("2*3*x", (1, 2, "3*x")), ("5&x", (1, None, "5&x"))]:
+        assert term_coefficient_split(termStr) == res, print("error in the coefficient", termStr)
+    assert expression_names("x1*(y&~x1)+_a-3") == ["x1", "y", "_a"], print("error in the names")
+    testList = [("x+y", "(x|y)+(x&y)", 8, True), ("x+y", "(x^y)+2*(x&y)", 8, True), ("x*y", "(x&y)*(x|y)+(x&~y)*(~x&y)", 4, True), ("x^y", "x|y", 8, False)]
+    for (leftExpre, rightExpre, bitnumber, res) in testList:
+        (result, elapsed) = verify_mba_z3(leftExpre, rightExpre, bitnumber)
+        print(leftExpre, rightExpre, result, "{elapsed:.4f}s".format(elapsed=elapsed))
+        if result != res:
+            print("error in the verifier!")
+            traceback.print_stack()
+            sys.exit(0)
+    #the equal sub-trees of different parses share one term, the rebuilt tree adds no term
+    verifier = Z3Verifier(8)
+    sumStr = "+".join("{coe}*(x&~y)".format(coe=coe) for coe in range(1, 2001))
+    term = verifier.z3_term(expression_parse(sumStr))
+    number = len(verifier.termList)
+    assert verifier.z3_term(expression_parse(sumStr)).eq(term) and len(verifier.termList) == number, print("error in the interning of the terms")
+    for verifier in Z3_VERIFIER.values():
+        print(verifier.info())
+
+    return None
+
+
+
+if __name__ == "__main__":
+    unittest()
+
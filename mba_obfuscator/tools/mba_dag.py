@@ -0,0 +1,471 @@
+#!/usr/bin/python3
+
+"""
+This file including the hash-consed DAG of the MBA expressions:
+    every distinct sub-expression is stored once as one integer id, the same operator on the same operands gives the same id,
+    so the substitution of one large expression into many places only costs one node,
+    the size, the evaluation and the z3 term of the expression are computed on the unique nodes,
+    the flat string is only rendered on request.
+"""
+
+import hashlib
+import numpy as np
+import sys
+import threading
+import traceback
+import z3
+from mba_ast_operation import expression_parse, get_z3_verifier, BINARY_PRECEDENCE, COMMUTATIVE_OPERATOR
+from mba_string_operation import sample_inputs, DEFAULT_POLICY, MBAEquation, SAMPLE_NUMBER, VERIFY_STATS, VERIFY_VARIABLE
+
+
+#the precedence of the unary operators and the leaves in the rendering.
+UNARY_PRECEDENCE = 6
+LEAF_PRECEDENCE = 7
+
+
+class ExpressionDAG():
+    """the hash-consed DAG of the mba expressions.
+    Attributes:
+        nodeList: the node of every id, ("var", name), ("const", value), (op, child id) or (op, left id, right id).
+        nodeDict: the id of every node.
+        digestDict: the structural digest of every node, filled on request.
+        lock: the lock of the interning.
+    """
+    def __init__(self):
+        self.nodeList = []
+        self.nodeDict = {}
+        self.digestDict = {}
+        self.lock = threading.Lock()
+
+        return None
+
+
+    def __len__(self):
+        return len(self.nodeList)
+
+
+    def node(self, op, *operands):
+        """the id of the node, the node is created at the first use.
+        Args:
+            op: "var", "const", "~", "neg" or the binary operator.
+            operands: the name, the value or the ids of the children.
+        Returns:
+            nodeId: the id of the node.
+        """
+        node = (op,) + operands
+        nodeId = self.nodeDict.get(node)
+        if nodeId is None:
+            with self.lock:
+                nodeId = self.nodeDict.get(node)
+                if nodeId is None:
+                    nodeId = len(self.nodeList)
+                    self.nodeList.append(node)
+                    self.nodeDict[node] = nodeId
+
+        return nodeId
+
+
+    def var(self, name):
+        return self.node("var", name)
+
+
+    def const(self, value):
+        return self.node("const", value)
+
+
+    def from_tree(self, treeNode):
+        """intern the tree of expression_parse, the post-order walk without recursion.
+        Args:
+            treeNode: the root of the tree.
+        Returns:
+            nodeId: the id of the root.
+        """
+        idDict = {}
+        stack = [treeNode]
+        while stack:
+            item = stack[-1]
+            if id(item) in idDict:
+                stack.pop()
+                continue
+            op = item[0]
+            if op in ["var", "const"]:
+                idDict[id(item)] = self.node(op, item[1])
+                stack.pop()
+                continue
+            childList = [child for child in item[1:] if id(child) not in idDict]
+            if childList:
+                stack.extend(childList)
+                continue
+            stack.pop()
+            idDict[id(item)] = self.node(op, *[idDict[id(child)] for child in item[1:]])
+
+        return idDict[id(treeNode)]
+
+
+    def parse(self, expreStr):
+        """intern the mba expression string.
+        Raises:
+            ValueError: the syntax error of the expression.
+        """
+        return self.from_tree(expression_parse(expreStr))
+
+
+    def sum(self, idList):
+        """the id of the sum of the nodes, the terms are added from left to right.
+        """
+        if not idList:
+            return self.const(0)
+        nodeId = idList[0]
+        for otherId in idList[1:]:
+            nodeId = self.node("+", nodeId, otherId)
+
+        return nodeId
+
+
+    def postorder(self, rootId):
+        """the ids of the unique nodes under the root, every child goes before its parents.
+        """
+        orderList = []
+        visited = set()
+        stack = [(rootId, False)]
+        while stack:
+            (nodeId, expanded) = stack.pop()
+            if expanded:
+                orderList.append(nodeId)
+                continue
+            if nodeId in visited:
+                continue
+            visited.add(nodeId)
+            stack.append((nodeId, True))
+            node = self.nodeList[nodeId]
+            if node[0] not in ["var", "const"]:
+                stack.extend((child, False) for child in reversed(node[1:]) if child not in visited)
+
+        return orderList
+
+
+    def substitute(self, rootId, replaceDict):
+        """replace the variables at the same time, the shared sub-expressions are rebuilt once.
+        Args:
+            rootId: the id of the root.
+            replaceDict: the id replacing every variable name.
+        Returns:
+            nodeId: the id of the new root.
+        """
+        newDict = {}
+        for nodeId in self.postorder(rootId):
+            node = self.nodeList[nodeId]
+            if node[0] == "var":
+                newDict[nodeId] = replaceDict.get(node[1], nodeId)
+            elif node[0] == "const":
+                newDict[nodeId] = nodeId
+            else:
+                newDict[nodeId] = self.node(node[0], *[newDict[child] for child in node[1:]])
+
+        return newDict[rootId]
+
+
+    def variables(self, rootId):
+        """the variable names under the root.
+        """
+        return set(self.nodeList[nodeId][1] for nodeId in self.postorder(rootId) if self.nodeList[nodeId][0] == "var")
+
+
+    def dag_size(self, rootId):
+        """the number of the unique nodes under the root.
+        """
+        return len(self.postorder(rootId))
+
+
+    def tree_size(self, rootId):
+        """the number of the nodes of the flat tree under the root, the shared nodes are counted at every use.
+        """
+        sizeDict = {}
+        for nodeId in self.postorder(rootId):
+            node = self.nodeList[nodeId]
+            if node[0] in ["var", "const"]:
+                sizeDict[nodeId] = 1
+            else:
+                sizeDict[nodeId] = 1 + sum(sizeDict[child] for child in node[1:])
+
+        return sizeDict[rootId]
+
+
+    def info(self, rootId):
+        """the sizes of the expression.
+        """
+        dagSize = self.dag_size(rootId)
+        treeSize = self.tree_size(rootId)
+
+        return {"dagSize": dagSize, "treeSize": treeSize, "sharing": treeSize / dagSize, "nodes": len(self.nodeList)}
+
+
+    def digest(self, rootId):
+        """the structural digest of the expression, the same in every DAG and every process,
+        the operands of the commutative operators are ordered by their digests.
+        """
+        for nodeId in self.postorder(rootId):
+            if nodeId in self.digestDict:
+                continue
+            node = self.nodeList[nodeId]
+            if node[0] in ["var", "const"]:
+                itemList = [node[0], str(node[1])]
+            else:
+                childList = [self.digestDict[child] for child in node[1:]]
+                if node[0] in COMMUTATIVE_OPERATOR:
+                    childList.sort()
+                itemList = [node[0]] + childList
+            self.digestDict[nodeId] = hashlib.sha1("|".join(itemList).encode()).hexdigest()
+
+        return self.digestDict[rootId]
+
+
+    def render(self, rootId):
+        """the flat string of the expression with the minimal parentheses.
+        Args:
+            rootId: the id of the root.
+        Returns:
+            expreStr: the mba expression string.
+        """
+        #every item: (string, precedence)
+        renderDict = {}
+        for nodeId in self.postorder(rootId):
+            node = self.nodeList[nodeId]
+            op = node[0]
+            if op == "var":
+                renderDict[nodeId] = (node[1], LEAF_PRECEDENCE)
+            elif op == "const":
+                renderDict[nodeId] = (str(node[1]), UNARY_PRECEDENCE if node[1] < 0 else LEAF_PRECEDENCE)
+            elif op in ["~", "neg"]:
+                (childStr, childPrec) = renderDict[node[1]]
+                if childPrec < UNARY_PRECEDENCE or childStr[0] == "-":
+                    childStr = "(" + childStr + ")"
+                renderDict[nodeId] = (("~" if op == "~" else "-") + childStr, UNARY_PRECEDENCE)
+            else:
+                prec = BINARY_PRECEDENCE[op]
+                (leftStr, leftPrec) = renderDict[node[1]]
+                (rightStr, rightPrec) = renderDict[node[2]]
+                if leftPrec < prec:
+                    leftStr = "(" + leftStr + ")"
+                rightOp = self.nodeList[node[2]][0]
+                if rightPrec < prec or (rightPrec == prec and not (op == rightOp and op in COMMUTATIVE_OPERATOR)):
+                    rightStr = "(" + rightStr + ")"
+                elif rightStr[0] == "-":
+                    if op == "+":
+                        renderDict[nodeId] = (leftStr + rightStr, prec)
+                        continue
+                    rightStr = "(" + rightStr + ")"
+                renderDict[nodeId] = (leftStr + op + rightStr, prec)
+
+        return renderDict[rootId][0]
+
+
+    def evaluate(self, rootId, variableDict):
+        """evaluate the expression on every unique node once.
+        Args:
+            rootId: the id of the root.
+            variableDict: the value of every variable name, the numpy arrays or python integers.
+        Returns:
+            value: the value of the expression.
+        """
+        valueDict = {}
+        for nodeId in self.postorder(rootId):
+            node = self.nodeList[nodeId]
+            op = node[0]
+            if op == "const":
+                valueDict[nodeId] = node[1]
+            elif op == "var":
+                valueDict[nodeId] = variableDict[node[1]]
+            elif op == "~":
+                valueDict[nodeId] = ~valueDict[node[1]]
+            elif op == "neg":
+                valueDict[nodeId] = -valueDict[node[1]]
+            else:
+                left = valueDict[node[1]]
+                right = valueDict[node[2]]
+                if op == "+":
+                    valueDict[nodeId] = left + right
+                elif op == "-":
+                    valueDict[nodeId] = left - right
+                elif op == "*":
+                    valueDict[nodeId] = left * right
+                elif op == "&":
+                    valueDict[nodeId] = left & right
+                elif op == "|":
+                    valueDict[nodeId] = left | right
+                else:
+                    valueDict[nodeId] = left ^ right
+
+        return valueDict[rootId]
+
+
+    def z3_term(self, rootId, verifier):
+        """build the z3 term of the expression in the context of the verifier, one term for every unique node.
+        Args:
+            rootId: the id of the root.
+            verifier: the Z3Verifier object.
+        Returns:
+            term: the z3 bit-vector term.
+        """
+        termDict = {}
+        for nodeId in self.postorder(rootId):
+            node = self.nodeList[nodeId]
+            op = node[0]
+            if op == "const":
+                termDict[nodeId] = z3.BitVecVal(node[1], verifier.bitnumber, ctx=verifier.context)
+            elif op == "var":
+                termDict[nodeId] = verifier.variable(node[1])
+            elif op == "~":
+                termDict[nodeId] = ~termDict[node[1]]
+            elif op == "neg":
+                termDict[nodeId] = -termDict[node[1]]
+            else:
+                left = termDict[node[1]]
+                right = termDict[node[2]]
+                if op == "+":
+                    termDict[nodeId] = left + right
+                elif op == "-":
+                    termDict[nodeId] = left - right
+                elif op == "*":
+                    termDict[nodeId] = left * right
+                elif op == "&":
+                    termDict[nodeId] = left & right
+                elif op == "|":
+                    termDict[nodeId] = left | right
+                else:
+                    termDict[nodeId] = left ^ right
+
+        return termDict[rootId]
+
+
+
+def verify_dag_sample(dag, leftId, rightId, bitnumber=2, samplenumber=SAMPLE_NUMBER):
+    """the numpy check of verify_mba_sample on the unique nodes of the DAG.
+    Returns:
+        (result, exhaustive): result is False on one counterexample,
+                              exhaustive is True when all the inputs are checked.
+    """
+    varSet = dag.variables(leftId) | dag.variables(rightId)
+    nameList = [name for name in VERIFY_VARIABLE if name in varSet] + sorted(varSet - set(VERIFY_VARIABLE))
+    (variableDict, exhaustive) = sample_inputs(nameList, bitnumber, samplenumber, leftId * 1000003 + rightId)
+    with np.errstate(over="ignore"):
+        leftValue = dag.evaluate(leftId, variableDict) + np.zeros(1, dtype=np.int64)
+        rightValue = dag.evaluate(rightId, variableDict) + np.zeros(1, dtype=np.int64)
+    difValue = leftValue ^ rightValue
+    if bitnumber < 64:
+        difValue &= 2**bitnumber - 1
+
+    return (not difValue.any(), exhaustive)
+
+
+class DAGEquation(MBAEquation):
+    """the equation of two expressions of the DAG, the checks of VerifyPolicy only cost the unique nodes.
+    Attributes:
+        dag: the ExpressionDAG object.
+        leftId: the id of the left expression.
+        rightId: the id of the right expression.
+    """
+    def __init__(self, dag, leftId, rightId):
+        MBAEquation.__init__(self, None, None)
+        self.dag = dag
+        self.leftId = leftId
+        self.rightId = rightId
+
+        return None
+
+
+    def key(self, bitnumber):
+        """the key of the verification cache by the structural digests.
+        """
+        leftStr = self.dag.digest(self.leftId)
+        rightStr = self.dag.digest(self.rightId)
+        if leftStr > rightStr:
+            (leftStr, rightStr) = (rightStr, leftStr)
+        keyStr = "dag|{bitnumber}|{left}|{right}".format(bitnumber=bitnumber, left=leftStr, right=rightStr)
+
+        return hashlib.sha1(keyStr.encode()).hexdigest()
+
+
+    def sample(self, bitnumber):
+        return verify_dag_sample(self.dag, self.leftId, self.rightId, bitnumber)
+
+
+    def signature(self, bitnumber):
+        return None
+
+
+    def prove(self, bitnumber):
+        verifier = get_z3_verifier(bitnumber)
+        with verifier.lock:
+            leftTerm = self.dag.z3_term(self.leftId, verifier)
+            rightTerm = self.dag.z3_term(self.rightId, verifier)
+
+        return verifier.check_term(leftTerm, rightTerm) == "unsat"
+
+
+def verify_dag(dag, leftId, rightId, bitnumber=2, policy=None, final=False):
+    """check the relation whether two expressions of the DAG are equal by the policy,
+    the numpy check and the z3 proof only cost the unique nodes.
+    Args:
+        dag: the ExpressionDAG object.
+        leftId: the id of the left expression.
+        rightId: the id of the right expression.
+        bitnumber: the default number of the bits of the stage.
+        policy: the VerifyPolicy object, None for DEFAULT_POLICY.
+        final: the check of the final expression.
+    Returns:
+        True: equation or skipped.
+        False: unequal.
+    """
+    if not policy:
+        policy = DEFAULT_POLICY
+
+    return policy.verify_equation(DAGEquation(dag, leftId, rightId), bitnumber, final)
+
+
+
+def unittest():
+    """unit test of the DAG.
+    """
+    dag = ExpressionDAG()
+    #the same sub-expression gets the same id
+    leftId = dag.parse("(x&y)+(x&y)*3")
+    if dag.parse("x&y") != dag.nodeList[leftId][1] or dag.dag_size(leftId) != 6 or dag.tree_size(leftId) != 9:
+        print("error in the interning!")
+        traceback.print_stack()
+        sys.exit(0)
+    testList = ["x+y", "x-(y-z)", "-x*y+3*(x|~y)", "x+-3*y", "~(x&y)-(-2)*x", "x*(y*z)", "(x-y)*(x+y)", "x^(y|z)&t"]
+    for expreStr in testList:
+        nodeId = dag.parse(expreStr)
+        renderStr = dag.render(nodeId)
+        if not verify_dag(dag, nodeId, dag.parse(renderStr), 8):
+            print("error in the rendering:", expreStr, renderStr)
+            traceback.print_stack()
+            sys.exit(0)
+    #x -> x*y-(x&y)*(x|y)-(x&~y)*(~x&y)+x, the growth of the flat tree is exponential in the depth
+    rootId = dag.parse("x")
+    zeroId = dag.parse("x*y-(x&y)*(x|y)-(x&~y)*(~x&y)")
+    for idx in range(30):
+        rootId = dag.substitute(dag.node("+", dag.var("x"), zeroId), {"x": rootId})
+    print(dag.info(rootId))
+    if not verify_dag(dag, rootId, dag.var("x"), 8) or verify_dag(dag, rootId, dag.parse("x+1"), 8):
+        print("error in the verification of the DAG!")
+        traceback.print_stack()
+        sys.exit(0)
+    #the same structure in another DAG hits the cache of the proof
+    otherDag = ExpressionDAG()
+    otherId = otherDag.parse("x*y-(x&y)*(x|y)-(~x&y)*(x&~y)")
+    verify_dag(dag, zeroId, dag.const(0), 8)
+    cached = VERIFY_STATS["cached"]
+    if otherDag.digest(otherId) != dag.digest(zeroId) or not verify_dag(otherDag, otherId, otherDag.const(0), 8) or VERIFY_STATS["cached"] != cached + 1:
+        print("error in the cache of the DAG!")
+        traceback.print_stack()
+        sys.exit(0)
+    print("the hash-consed DAG, pass!")
+
+    return None
+
+
+
+if __name__ == "__main__":
+    unittest()
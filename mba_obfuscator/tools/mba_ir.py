@@ -0,0 +1,435 @@
+#!/usr/bin/python3
+
+"""
+This file including the intermediate representation of the MBA expression:
+    the bitwise expressions are interned, one bitwise expression has one integer id in the process,
+    LinearMBA: the mapping from the id of the bitwise expression to the integer coefficient, and one constant.
+    PolyMBA: the mapping from the monomial to the integer coefficient, the monomial is the tuple of the ids
+             of its bitwise factors, sorted by their strings when the multiplication is commutative, so the order
+             does not depend on the ids of the process, () for the constant.
+The string format is the one of the generators: every term is "coefficient*bitwise", the first term has no "+",
+the constant goes last, such as "3*(x&y)-1*~x+2".
+"""
+
+import re
+import sys
+import threading
+import traceback
+
+
+#the interned bitwise expressions, BITWISE_ID: bitwise expression -> id, BITWISE_LIST: id -> bitwise expression.
+BITWISE_ID = {}
+BITWISE_LIST = []
+BITWISE_LOCK = threading.Lock()
+
+
+def bitwise_intern(bitwiseExpre):
+    """the id of the bitwise expression, created at the first call.
+    Args:
+        bitwiseExpre: the bitwise expression.
+    Returns:
+        bitId: the integer id.
+    """
+    bitId = BITWISE_ID.get(bitwiseExpre)
+    if bitId is not None:
+        return bitId
+    with BITWISE_LOCK:
+        if bitwiseExpre not in BITWISE_ID:
+            BITWISE_ID[bitwiseExpre] = len(BITWISE_LIST)
+            BITWISE_LIST.append(bitwiseExpre)
+
+    return BITWISE_ID[bitwiseExpre]
+
+
+def bitwise_string(bitId):
+    """the bitwise expression of the id.
+    """
+    return BITWISE_LIST[bitId]
+
+
+def term_split(expreStr):
+    """split the expression into the terms by the "+" and "-" out of the parentheses.
+    Args:
+        expreStr: the mba expression.
+    Returns:
+        termList: the list of (sign, body), sign is 1 or -1.
+    """
+    termList = []
+    sign = 1
+    start = None
+    depth = 0
+    for (idx, char) in enumerate(expreStr):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char in "+-" and not depth:
+            #the multiplier before the sign, such as "3*-x", belongs to the term
+            if start is not None and expreStr[idx - 1] != "*":
+                termList.append((sign, expreStr[start:idx]))
+                sign = 1
+                start = None
+            if start is None:
+                if char == "-":
+                    sign = -sign
+                continue
+        if start is None and not char.isspace():
+            start = idx
+    if start is not None:
+        termList.append((sign, expreStr[start:]))
+
+    return termList
+
+
+class LinearMBA():
+    """the linear MBA expression, the order of the terms is the order of the insertion.
+    Attributes:
+        termDict: the dictionary, key: the id of the bitwise expression, value: the integer coefficient.
+        constant: the constant term.
+    """
+    def __init__(self, termDict=None, constant=0):
+        self.termDict = dict(termDict) if termDict else {}
+        self.constant = constant
+
+        return None
+
+
+    def add_term(self, coe, bitwiseExpre):
+        """add one term, the like term is combined.
+        Args:
+            coe: the integer coefficient.
+            bitwiseExpre: the bitwise expression, None for the constant.
+        """
+        if bitwiseExpre is None:
+            self.constant += coe
+        else:
+            bitId = bitwise_intern(bitwiseExpre)
+            self.termDict[bitId] = self.termDict.get(bitId, 0) + coe
+
+        return None
+
+
+    def terms(self):
+        """the list of (coefficient, bitwise expression) in order, the constant is not included.
+        """
+        return [(coe, BITWISE_LIST[bitId]) for (bitId, coe) in self.termDict.items()]
+
+
+    def add(self, other):
+        """the sum of two expressions, the zero terms are removed.
+        """
+        termDict = dict(self.termDict)
+        for (bitId, coe) in other.termDict.items():
+            termDict[bitId] = termDict.get(bitId, 0) + coe
+        termDict = {bitId: coe for (bitId, coe) in termDict.items() if coe}
+
+        return LinearMBA(termDict, self.constant + other.constant)
+
+
+    def negate(self):
+        """the negative expression.
+        """
+        return self.scale(-1)
+
+
+    def scale(self, k):
+        """the expression multiplied by the integer.
+        """
+        if not k:
+            return LinearMBA()
+        termDict = {bitId: coe * k for (bitId, coe) in self.termDict.items()}
+
+        return LinearMBA(termDict, self.constant * k)
+
+
+    def combine(self):
+        """combine like terms: the terms are combined at the insertion, the zero terms are removed.
+        """
+        termDict = {bitId: coe for (bitId, coe) in self.termDict.items() if coe}
+
+        return LinearMBA(termDict, self.constant)
+
+
+    def sort(self):
+        """the expression whose terms are sorted by the bitwise expression.
+        """
+        termDict = dict(sorted(self.termDict.items(), key=lambda item: BITWISE_LIST[item[0]]))
+
+        return LinearMBA(termDict, self.constant)
+
+
+    def bitwise_constant(self):
+        """the expression whose constant c is moved into the term -c*~(x&~x), as generate_coe_bit does.
+        """
+        termDict = dict(self.termDict)
+        if self.constant:
+            bitId = bitwise_intern("~(x&~x)")
+            termDict[bitId] = termDict.get(bitId, 0) - self.constant
+
+        return LinearMBA(termDict)
+
+
+    def to_string(self):
+        """the string of the expression, "0" for the empty expression.
+        """
+        termList = []
+        for (bitId, coe) in self.termDict.items():
+            termList.append("{sign}{coe}*{bit}".format(sign="+" if coe >= 0 else "", coe=coe, bit=BITWISE_LIST[bitId]))
+        if self.constant or not termList:
+            termList.append("{sign}{coe}".format(sign="+" if self.constant >= 0 else "", coe=self.constant))
+        expreStr = "".join(termList)
+        if expreStr[0] == "+":
+            expreStr = expreStr[1:]
+
+        return expreStr
+
+
+    def __str__(self):
+        return self.to_string()
+
+
+    def __len__(self):
+        return len(self.termDict) + bool(self.constant)
+
+
+    def __eq__(self, other):
+        return isinstance(other, LinearMBA) and self.combine().termDict == other.combine().termDict and self.constant == other.constant
+
+
+def linear_mba_parse(expreStr):
+    """parse the linear mba expression into LinearMBA in one pass.
+    Args:
+        expreStr: the mba expression, such as "3*(x&y)-~x+2".
+    Returns:
+        linearMBA: the LinearMBA object.
+    """
+    linearMBA = LinearMBA()
+    for (sign, body) in term_split(expreStr):
+        body = body.strip()
+        if body.isdigit():
+            linearMBA.add_term(sign * int(body), None)
+            continue
+        res = re.match("(\d+)\s*\*\s*(.+)$", body)
+        if res:
+            linearMBA.add_term(sign * int(res.group(1)), res.group(2))
+        elif body:
+            linearMBA.add_term(sign, body)
+        else:
+            print("error in linear_mba_parse:", expreStr)
+            traceback.print_stack()
+            sys.exit(0)
+
+    return linearMBA
+
+
+
+def factor_split(body):
+    """split the term into the factors by the "*" out of the parentheses.
+    """
+    factorList = []
+    start = 0
+    depth = 0
+    for (idx, char) in enumerate(body):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "*" and not depth:
+            factorList.append(body[start:idx].strip())
+            start = idx + 1
+    factorList.append(body[start:].strip())
+
+    return factorList
+
+
+class PolyMBA():
+    """the polynomial MBA expression, the order of the terms is the order of the insertion.
+    Attributes:
+        termDict: the dictionary, key: the monomial, value: the integer coefficient.
+    """
+    def __init__(self, termDict=None):
+        self.termDict = dict(termDict) if termDict else {}
+
+        return None
+
+
+    def add_term(self, coe, factorList, commutative=True):
+        """add one term, the like term is combined.
+        Args:
+            coe: the integer coefficient.
+            factorList: the list of the bitwise factors, [] for the constant.
+            commutative: sort the factors, so x*y and y*x are like terms.
+        """
+        monomial = tuple(bitwise_intern(factor) for factor in factorList)
+        if commutative:
+            monomial = tuple(sorted(monomial, key=BITWISE_LIST.__getitem__))
+        self.termDict[monomial] = self.termDict.get(monomial, 0) + coe
+
+        return None
+
+
+    def terms(self):
+        """the list of (coefficient, the list of the bitwise factors) in order.
+        """
+        return [(coe, [BITWISE_LIST[bitId] for bitId in monomial]) for (monomial, coe) in self.termDict.items()]
+
+
+    def add(self, other):
+        """the sum of two expressions, the zero terms are removed.
+        """
+        termDict = dict(self.termDict)
+        for (monomial, coe) in other.termDict.items():
+            termDict[monomial] = termDict.get(monomial, 0) + coe
+
+        return PolyMBA({monomial: coe for (monomial, coe) in termDict.items() if coe})
+
+
+    def negate(self):
+        """the negative expression.
+        """
+        return self.scale(-1)
+
+
+    def scale(self, k):
+        """the expression multiplied by the integer.
+        """
+        if not k:
+            return PolyMBA()
+
+        return PolyMBA({monomial: coe * k for (monomial, coe) in self.termDict.items()})
+
+
+    def combine(self):
+        """combine like terms: the terms are combined at the insertion, the zero terms are removed.
+        """
+        return PolyMBA({monomial: coe for (monomial, coe) in self.termDict.items() if coe})
+
+
+    def multiply(self, other, commutative=True):
+        """the product of two expressions, the like terms are combined as they are generated.
+        Args:
+            other: the other PolyMBA object.
+            commutative: sort the factors of every monomial, so a*b and b*a are merged.
+        Returns:
+            polyMBA: the PolyMBA object of the product.
+        """
+        termDict = {}
+        for (monomial1, coe1) in self.termDict.items():
+            for (monomial2, coe2) in other.termDict.items():
+                monomial = monomial1 + monomial2
+                if commutative:
+                    monomial = tuple(sorted(monomial, key=BITWISE_LIST.__getitem__))
+                termDict[monomial] = termDict.get(monomial, 0) + coe1 * coe2
+
+        return PolyMBA({monomial: coe for (monomial, coe) in termDict.items() if coe})
+
+
+    def bitwise_constant(self):
+        """the expression whose constant c is moved into the term -c*~(x&~x), as generate_coe_bit does.
+        """
+        termDict = dict(self.termDict)
+        constant = termDict.pop((), 0)
+        if constant:
+            monomial = (bitwise_intern("~(x&~x)"),)
+            termDict[monomial] = termDict.get(monomial, 0) - constant
+
+        return PolyMBA(termDict)
+
+
+    def degree(self):
+        """the maximum number of the factors in one term.
+        """
+        return max([len(monomial) for monomial in self.termDict] + [0])
+
+
+    def to_string(self):
+        """the string of the expression, "0" for the empty expression.
+        """
+        termList = []
+        for (monomial, coe) in self.termDict.items():
+            factorStr = "*".join(BITWISE_LIST[bitId] for bitId in monomial)
+            if factorStr:
+                termList.append("{sign}{coe}*{factor}".format(sign="+" if coe >= 0 else "", coe=coe, factor=factorStr))
+            else:
+                termList.append("{sign}{coe}".format(sign="+" if coe >= 0 else "", coe=coe))
+        if not termList:
+            return "0"
+        expreStr = "".join(termList)
+        if expreStr[0] == "+":
+            expreStr = expreStr[1:]
+
+        return expreStr
+
+
+    def __str__(self):
+        return self.to_string()
+
+
+    def __len__(self):
+        return len(self.termDict)
+
+
+    def __eq__(self, other):
+        return isinstance(other, PolyMBA) and self.combine().termDict == other.combine().termDict
+
+
+def poly_mba_parse(expreStr, commutative=True):
+    """parse the polynomial mba expression into PolyMBA in one pass.
+    Args:
+        expreStr: the mba expression, such as "3*(x&y)*~x-x*y+2".
+        commutative: sort the factors of every monomial.
+    Returns:
+        polyMBA: the PolyMBA object.
+    """
+    polyMBA = PolyMBA()
+    for (sign, body) in term_split(expreStr):
+        factorList = factor_split(body)
+        coe = sign
+        #the coefficients in the factors
+        bitList = []
+        for factor in factorList:
+            if factor.isdigit():
+                coe *= int(factor)
+            elif factor:
+                bitList.append(factor)
+            else:
+                print("error in poly_mba_parse:", expreStr)
+                traceback.print_stack()
+                sys.exit(0)
+        polyMBA.add_term(coe, bitList, commutative)
+
+    return polyMBA
+
+def unittest():
+    """unit test of the linear MBA IR.
+    """
+    #the format of the generators is kept
+    for expreStr in ["3*(x&y)-1*~x+2", "-2*x+1*(x|~y)", "5*~(x&~x)", "-7", "1*x-1*y-3"]:
+        linearMBA = linear_mba_parse(expreStr)
+        assert linearMBA.to_string() == expreStr, print("error in the conversion", expreStr, linearMBA)
+        assert linear_mba_parse(linearMBA.to_string()) == linearMBA
+    linearMBA1 = linear_mba_parse("x+2*(x&y)-~y+3")
+    linearMBA2 = linear_mba_parse("-1*x+++1*~y-2")
+    print(linearMBA1, "|", linearMBA2, "|", linearMBA1.add(linearMBA2), "|", linearMBA1.negate(), "|", linearMBA1.scale(3))
+    assert linearMBA1.add(linearMBA2).to_string() == "2*(x&y)+1"
+    assert linearMBA1.add(linearMBA1.negate()).to_string() == "0"
+    assert linear_mba_parse("2*x-1*y+3*x+1*y").combine().to_string() == "5*x"
+    assert linear_mba_parse("3-1*y").bitwise_constant().to_string() == "-1*y-3*~(x&~x)"
+    print("the linear MBA IR, pass!")
+    for expreStr in ["3*(x&y)*~x-1*x*y+2", "-2*x", "1*(x|~y)*(x&y)*y"]:
+        assert poly_mba_parse(expreStr, commutative=False).to_string() == expreStr, print("error in the conversion", expreStr)
+    polyMBA1 = poly_mba_parse("x+2*y-1")
+    polyMBA2 = poly_mba_parse("y-x")
+    product = polyMBA1.multiply(polyMBA2)
+    print(product, "|", product.bitwise_constant(), "|", poly_mba_parse("2*x*y-3*y*x"))
+    assert product == poly_mba_parse("-1*x*x-1*x*y+2*y*y-1*y+1*x")
+    assert poly_mba_parse("2*x*y-3*y*x").to_string() == "-1*x*y"
+    assert poly_mba_parse("2*x*y-3*y*x", commutative=False).to_string() == "2*x*y-3*y*x"
+    print("the polynomial MBA IR, pass!")
+
+    return None
+
+
+
+if __name__ == "__main__":
+    unittest()
@@ -0,0 +1,120 @@
+#!/usr/bin/python3
+
+"""
+This file including the parallel generation of the MBA datasets in deterministic shards:
+    step1: the number of the rows is split into the contiguous shards, the shard i gets its own random.Random seeded by
+           the master seed and i, so one shard does not depend on the others or on the number of the processes.
+    step2: every process generates and verifies the rows of one shard into its own file.
+    step3: the files are merged in the order of the shards into the dataset file.
+The same master seed and the same number of the shards reproduce the same dataset byte for byte.
+"""
+
+import multiprocessing
+import os
+import random
+import sys
+import time
+import traceback
+
+
+def shard_seed(seed, shard):
+    """the seed of the random generator of one shard.
+    Args:
+        seed: the master seed.
+        shard: the index of the shard.
+    Returns:
+        seed: the seed of the shard.
+    """
+    return seed * 1000003 + shard
+
+
+def shard_layout(number, shardnumber):
+    """split the rows into the contiguous shards of nearly the same size.
+    Args:
+        number: the number of the rows.
+        shardnumber: the number of the shards.
+    Returns:
+        countList: the number of the rows of every shard.
+    """
+    shardnumber = max(min(shardnumber, number), 1)
+    (quotient, remainder) = divmod(number, shardnumber)
+
+    return [quotient + 1 if shard < remainder else quotient for shard in range(shardnumber)]
+
+
+def shard_filename(filewrite, shard):
+    """the temporary file of one shard.
+    """
+    return "{file}.shard{shard}".format(file=filewrite, shard=shard)
+
+
+def generate_shard(rowFunction, rowArgs, verifyFunction, number, seed, shard, filewrite, bitnumber=2):
+    """generate and verify the rows of one shard.
+    Args:
+        rowFunction: the function generating one row by the keyword argument rng, the first two items of the row are the sides of the equation.
+        rowArgs: the keyword arguments of rowFunction.
+        verifyFunction: the function verifying one equation by (leftExpre, rightExpre, bitnumber), such as the verify_row method of the generator.
+        number: the number of the rows of the shard.
+        seed: the master seed.
+        shard: the index of the shard.
+        filewrite: the dataset file, the shard goes into its temporary file.
+        bitnumber: the number of the bits of the variable in the verification.
+    Returns:
+        (filename, elapsed): the temporary file of the shard, the time in seconds.
+    """
+    start = time.time()
+    rng = random.Random(shard_seed(seed, shard))
+    filename = shard_filename(filewrite, shard)
+    with open(filename, "w") as fw:
+        for i in range(number):
+            row = rowFunction(rng=rng, **rowArgs)
+            z3res = verifyFunction(row[0], row[1], bitnumber)
+            print(row[0], row[1], z3res, *row[2:], sep=",", file=fw)
+
+    return (filename, time.time() - start)
+
+
+def generate_dataset_shards(rowFunction, rowArgs, verifyFunction, number, filewrite, header, jobs=1, seed=0, shardnumber=None, bitnumber=2):
+    """generate the dataset in the shards by multiple processes, then merge them into the dataset file.
+    Args:
+        rowFunction: the function generating one row, it must be picklable, such as the method of the generator.
+        rowArgs: the keyword arguments of rowFunction.
+        verifyFunction: the function verifying one equation, it must be picklable, such as the verify_row method of the generator honoring its policy.
+        number: the number of the rows in the dataset.
+        filewrite: the dataset file.
+        header: the first line of the dataset file.
+        jobs: the number of the processes.
+        seed: the master seed.
+        shardnumber: the number of the shards, None for the number of the processes.
+        bitnumber: the number of the bits of the variable in the verification.
+    Returns:
+        stats: the number of the rows and the shards, the time of every shard and the elapsed time.
+    """
+    if jobs < 1:
+        print("the number of the jobs is wrong!")
+        traceback.print_stack()
+        sys.exit(0)
+    if not shardnumber:
+        shardnumber = jobs
+    start = time.time()
+    countList = shard_layout(number, shardnumber)
+    argsList = [(rowFunction, rowArgs, verifyFunction, count, seed, shard, filewrite, bitnumber) for (shard, count) in enumerate(countList)]
+    if jobs == 1 or len(countList) == 1:
+        resList = [generate_shard(*args) for args in argsList]
+    else:
+        #spawn keeps the z3 context of the parent out of the workers
+        with multiprocessing.get_context("spawn").Pool(min(jobs, len(countList))) as pool:
+            resList = pool.starmap(generate_shard, argsList)
+
+    #merge the shards in order
+    with open(filewrite, "w") as fw:
+        print(header, file=fw)
+        for (filename, elapsed) in resList:
+            with open(filename, "r") as fr:
+                for line in fr:
+                    fw.write(line)
+            os.remove(filename)
+
+    stats = {"rows": number, "shards": len(countList), "jobs": jobs, "seed": seed, "shardTime": [round(elapsed, 3) for (filename, elapsed) in resList], "elapsed": time.time() - start}
+
+    return stats
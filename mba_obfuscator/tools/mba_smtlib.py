@@ -0,0 +1,254 @@
+#!/usr/bin/python3
+
+"""
+This file including the batch verification of the MBA datasets in SMT-LIB2:
+    step1: every line of the dataset is converted into one query in the scope of push/pop,
+           the queries are written into one file, or one file for every shard.
+    step2: one long-lived z3 process reads the file, the result of every query follows the echo of its line number.
+    step3: the results are output into the result file, one line for every line of the dataset.
+"""
+
+import argparse
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from mba_ast_operation import expression_parse, expression_variable
+
+
+#the SMT-LIB2 functions of the operators.
+SMTLIB_OPERATOR = {"+": "bvadd", "-": "bvsub", "*": "bvmul", "&": "bvand", "|": "bvor", "^": "bvxor", "~": "bvnot", "neg": "bvneg"}
+
+
+def smtlib_term(node, bitnumber):
+    """the SMT-LIB2 term of the tree, the tree is walked without recursion.
+    Args:
+        node: the tree of the expression.
+        bitnumber: the number of the bits of the variable.
+    Returns:
+        term: the string of the term.
+    """
+    termDict = {}
+    stack = [node]
+    while stack:
+        node = stack[-1]
+        if node in termDict:
+            stack.pop()
+            continue
+        if node[0] == "var":
+            termDict[node] = node[1]
+        elif node[0] == "const":
+            termDict[node] = "(_ bv{value} {bitnumber})".format(value=node[1] % 2**bitnumber, bitnumber=bitnumber)
+        else:
+            childList = [child for child in node[1:] if child not in termDict]
+            if childList:
+                stack.extend(childList)
+                continue
+            termDict[node] = "({operator} {children})".format(operator=SMTLIB_OPERATOR[node[0]], children=" ".join(termDict[child] for child in node[1:]))
+        stack.pop()
+
+    return termDict[node]
+
+
+def smtlib_query(leftExpre, rightExpre, bitnumber, label):
+    """the query whether the left expression is unequal to the right expression in one scope.
+    Args:
+        leftExpre: left expression.
+        rightExpre: right expression.
+        bitnumber: the number of the bits of the variable.
+        label: the label echoed before the result.
+    Returns:
+        query: the string of the query, "unsat" means the equation.
+    Raises:
+        ValueError: the expression can not be parsed.
+    """
+    leftNode = expression_parse(leftExpre)
+    rightNode = expression_parse(rightExpre)
+    varSet = expression_variable(rightNode, expression_variable(leftNode))
+    lineList = ["(push 1)"]
+    for name in sorted(varSet):
+        lineList.append("(declare-const {name} (_ BitVec {bitnumber}))".format(name=name, bitnumber=bitnumber))
+    lineList.append("(assert (not (= {left} {right})))".format(left=smtlib_term(leftNode, bitnumber), right=smtlib_term(rightNode, bitnumber)))
+    lineList.append("(echo \"{label}\")".format(label=label))
+    lineList.append("(check-sat-using qfbv)")
+    lineList.append("(pop 1)")
+
+    return "\n".join(lineList) + "\n"
+
+
+def export_smtlib(fileread, filewrite, bitnumber=64, column=(0, 1), shardnumber=1, timeout=None):
+    """convert the dataset into the SMT-LIB2 files.
+    Args:
+        fileread: the dataset, one equation in every line.
+        filewrite: the prefix of the SMT-LIB2 files, the shard i is "{filewrite}.{i}.smt2".
+        bitnumber: the number of the bits of the variable.
+        column: the columns of the left and right expressions.
+        shardnumber: the number of the files, the line i goes into the shard i % shardnumber.
+        timeout: the timeout of one query in milliseconds, None for no timeout.
+    Returns:
+        (fileList, labelList, errorList): the SMT-LIB2 files, the line numbers of the queries, the line numbers that can not be converted.
+    """
+    fileList = ["{file}.{shard}.smt2".format(file=filewrite, shard=shard) for shard in range(shardnumber)]
+    fwList = [open(filename, "w") for filename in fileList]
+    for fw in fwList:
+        print("(set-option :print-success false)", file=fw)
+        print("(set-logic QF_BV)", file=fw)
+        if timeout:
+            print("(set-option :timeout {timeout})".format(timeout=timeout), file=fw)
+    labelList = []
+    errorList = []
+    with open(fileread, "r") as fr:
+        for (linenum, line) in enumerate(fr, 1):
+            if "#" in line or not line.strip():
+                continue
+            itemList = re.split(",", line.strip())
+            try:
+                query = smtlib_query(itemList[column[0]], itemList[column[1]], bitnumber, linenum)
+            except (ValueError, IndexError):
+                errorList.append(linenum)
+                continue
+            fwList[linenum % shardnumber].write(query)
+            labelList.append(linenum)
+    for fw in fwList:
+        print("(exit)", file=fw)
+        fw.close()
+
+    return (fileList, labelList, errorList)
+
+
+def solve_smtlib(filename, resultDict, z3path=None):
+    """check the queries of one SMT-LIB2 file in one z3 process.
+    Args:
+        filename: the SMT-LIB2 file.
+        resultDict: the dictionary the results are put into, key: the line number,
+                    the queries after the death of the z3 process get no result.
+        z3path: the z3 executable, None for the one in PATH.
+    """
+    if not z3path:
+        z3path = shutil.which("z3")
+    if not z3path:
+        print("the z3 executable is not found!")
+        traceback.print_stack()
+        sys.exit(0)
+    with open(filename, "r") as fr:
+        process = subprocess.Popen([z3path, "-smt2", "-in"], stdin=fr, stdout=subprocess.PIPE, text=True)
+        label = None
+        for line in process.stdout:
+            line = line.strip()
+            if line in ["sat", "unsat", "unknown"] and label is not None:
+                resultDict[label] = line
+                label = None
+            elif line.isdigit():
+                label = int(line)
+            elif line:
+                #the error of z3 on the last query
+                print("z3:", line)
+                if label is not None:
+                    resultDict[label] = "error"
+                    label = None
+        process.wait()
+    if process.returncode:
+        print("the z3 process on {file} exited with the code {code}.".format(file=filename, code=process.returncode))
+
+    return None
+
+
+def batch_verify(fileread, bitnumber=64, column=(0, 1), shardnumber=1, timeout=None, z3path=None):
+    """verify the dataset in SMT-LIB2, the shards are checked in parallel.
+    Args:
+        fileread: the dataset, one equation in every line.
+        bitnumber: the number of the bits of the variable.
+        column: the columns of the left and right expressions.
+        shardnumber: the number of the z3 processes.
+        timeout: the timeout of one query in milliseconds, None for no timeout.
+        z3path: the z3 executable, None for the one in PATH.
+    Returns:
+        resultFile: the result file, one line for every line of the dataset: line number, result.
+    """
+    filewrite = "{file}.{bitnumber}bit".format(file=fileread, bitnumber=bitnumber)
+    start = time.time()
+    (fileList, labelList, errorList) = export_smtlib(fileread, filewrite, bitnumber, column, shardnumber, timeout)
+    exportElapsed = time.time() - start
+    resultDict = {linenum: "error" for linenum in errorList}
+    threadList = [threading.Thread(target=solve_smtlib, args=(filename, resultDict, z3path)) for filename in fileList]
+    for thread in threadList:
+        thread.start()
+    for thread in threadList:
+        thread.join()
+    #the queries without result for the death of the z3 process
+    for linenum in labelList:
+        resultDict.setdefault(linenum, "error")
+    solveElapsed = time.time() - start - exportElapsed
+
+    resultFile = "{file}.result.txt".format(file=filewrite)
+    countDict = {}
+    with open(resultFile, "w") as fw:
+        print("#line,result", file=fw)
+        for linenum in sorted(resultDict):
+            print(linenum, resultDict[linenum], sep=",", file=fw)
+            countDict[resultDict[linenum]] = countDict.get(resultDict[linenum], 0) + 1
+    print("{number} queries in {bitnumber} bits: export {export:.3f}s, solve {solve:.3f}s,".format(number=len(resultDict), bitnumber=bitnumber, export=exportElapsed, solve=solveElapsed), countDict)
+
+    return resultFile
+
+
+
+def unittest():
+    """unit test of the SMT-LIB2 conversion, and the result file of the batch verification keeps every line
+    when the z3 process dies.
+    """
+    z3path = shutil.which("z3")
+    if not z3path:
+        print("the z3 executable is not found, the unit test is skipped!")
+        return None
+    testList = [("x+y", "(x|y)+(x&y)", "unsat"), ("x^y", "x|y", "sat"), ("-x-~x", "1", "unsat"), ("2*x*y-3", "~(x&y)", "sat")]
+    for (leftExpre, rightExpre, res) in testList:
+        query = smtlib_query(leftExpre, rightExpre, 8, 1)
+        process = subprocess.run([z3path, "-smt2", "-in"], input=query, stdout=subprocess.PIPE, text=True)
+        result = process.stdout.split()[-1]
+        print(leftExpre, rightExpre, result)
+        if result != res:
+            print("error in the SMT-LIB2 conversion!")
+            traceback.print_stack()
+            sys.exit(0)
+
+    #the process exiting without any result stands for the z3 process dying mid-shard
+    with tempfile.TemporaryDirectory() as tempdir:
+        fileread = os.path.join(tempdir, "test.dataset.txt")
+        with open(fileread, "w") as fw:
+            print("#complex,groundtruth", file=fw)
+            for (leftExpre, rightExpre, res) in testList:
+                print(leftExpre, rightExpre, sep=",", file=fw)
+            print("x+", "y", sep=",", file=fw)
+        for (path, expected) in [(z3path, ["unsat", "sat", "unsat", "sat", "error"]), (shutil.which("false"), ["error"] * 5)]:
+            if not path:
+                continue
+            with open(batch_verify(fileread, 8, shardnumber=2, z3path=path), "r") as fr:
+                resultList = [line.strip().split(",")[1] for line in fr if "#" not in line]
+            print(path, resultList)
+            if resultList != expected:
+                print("error in the result file of the batch verification!")
+                traceback.print_stack()
+                sys.exit(0)
+
+    return None
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="verify one MBA dataset in SMT-LIB2 by long-lived z3 processes.")
+    parser.add_argument("fileread", nargs="?", help="the dataset, the unit test runs without it.")
+    parser.add_argument("--bitnumber", type=int, default=64)
+    parser.add_argument("--column", type=int, nargs=2, default=[0, 1], help="the columns of the left and right expressions.")
+    parser.add_argument("--shards", type=int, default=1, help="the number of the SMT-LIB2 files and z3 processes.")
+    parser.add_argument("--timeout", type=int, default=None, help="the timeout of one query in milliseconds.")
+    args = parser.parse_args()
+    if not args.fileread:
+        unittest()
+    else:
+        batch_verify(args.fileread, args.bitnumber, tuple(args.column), args.shards, args.timeout)
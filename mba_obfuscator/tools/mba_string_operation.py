@@ -4,69 +4,53 @@
 This file including the operation of MBA expression by the string-related operation.
 """
 
+import atexit
+import collections
+import hashlib
 import numpy as np
 import re
+import sqlite3
 import sys
+import threading
 import traceback
 import z3
+from mba_ast_operation import expression_canonical, expression_names, expression_parse, expression_postfix, expression_terms, term_coefficient_split, verify_mba_z3
+from mba_ir import linear_mba_parse
+
+
+class PostfixTable(dict):
+    """the postfix string of every bitwise expression, the expression is parsed at the first use.
+    """
+    def __missing__(self, itemString):
+        itemStr = expression_postfix(expression_parse(itemString))
+        #the bitwise expressions come from the finite basis, the table is bounded anyway
+        if len(self) < 65536:
+            self[itemString] = itemStr
+
+        return itemStr
+
+
+#the postfix string of every converted bitwise expression.
+POSTFIX_TABLE = PostfixTable()
 
 
 def postfix(itemString):
     """transform infixExpre into postfixExpre
     Algorithm:
-        step1: if operator, stack in;
-        step2: if "(", stack in.
-        step3: if variable, pop out the all continued unary operator until other operator or "("
-        step4: if ")", pop out all operators until "(", then pop all continued unary operator.
-        step5: goto step1.
+        step1: parse the expression into the tree by the shared tokenizer and parser.
+        step2: output the tree in post-order, the operands go before the operator.
+        the result is kept in POSTFIX_TABLE, so every bitwise expression is parsed once.
     Arg:
         itemString: bitwise expression string persented in infix.
     Return:
         itemStr: expression string persented in postfix.
     """
-    itemStr = ""
-    boperatorList = ["&", "|", "^"]
-    uoperator = "~"
-    opeList = []
-
-    for (idx, char) in enumerate(itemString):
-         #open parenthesis, stack it
-        if char == "(":
-            opeList.append(char)
-        #binary operatork, stack it
-        elif char in boperatorList:
-            opeList.append(char)
-        #unary operator
-        elif uoperator in char:
-            opeList.append(char)
-        #closed parenthesis, pop out the operator to string
-        elif char == ")":
-            while(opeList and opeList[-1] != "("):
-                itemStr += opeList[-1]
-                opeList.pop()
-            if opeList and opeList[-1] != "(":
-                print("error!")
-                sys.exit(0)
-            #open parenthesis found
-            opeList.pop()
-            #unary operator found before open parenthesis
-            while(opeList and opeList[-1] == "~"):
-                itemStr += opeList[-1]
-                opeList.pop()
-        #variable name found
-        else:
-            itemStr += char
-            #top of stack is unary operator
-            while(opeList and opeList[-1] in uoperator):
-                itemStr += opeList[-1]
-                opeList.pop()
-
-    if len(opeList) > 1:
+    try:
+        itemStr = POSTFIX_TABLE[itemString]
+    except ValueError:
         print("error in function postfix!")
+        traceback.print_stack()
         sys.exit(0)
-    #have one operator without parenthesis
-    elif len(opeList):
-        itemStr += opeList[0]
 
     return itemStr
 
@@ -138,31 +122,426 @@ def postfix_cal(itemString, vnumber=0):
 
 
 
-def verify_mba_unsat(leftExpre, rightExpre, bitnumber=2):
+#the variable names of the mba expression for verification.
+VERIFY_VARIABLE = ["x", "y", "z", "t", "a", "b", "c", "d", "e", "f"]
+#the number of the inputs of the random check.
+SAMPLE_NUMBER = 4096
+#the random check is exhaustive if the number of all the inputs is not more than the limit.
+EXHAUSTIVE_LIMIT = 2**16
+#the count of verify_mba_unsat calls, the rejected/proved ones by the numpy check and the z3 calls.
+VERIFY_STATS = {"calls": 0, "cached": 0, "rejected": 0, "exhaustive": 0, "sampled": 0, "z3": 0}
+
+
+class VerifyCache():
+    """bounded LRU cache of the verification results, optionally persisted into one SQLite file,
+    key: the digest of the bit number and the canonical strings of both sides, so the order of 
+    the operands of +, *, &, |, ^ and the order of the sides do not matter.
+    Attributes:
+        maxsize: the maximum number of entries in memory.
+        hits: the number of lookups found in memory or in the file.
+        misses: the number of lookups not found.
+        entryDict: the ordered dictionary, value: the result of the verification.
+        filename: the SQLite file, None for the memory only.
+        connection: the SQLite connection.
+    """
+    def __init__(self, maxsize=65536, filename=None):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.entryDict = collections.OrderedDict()
+        self.filename = None
+        self.connection = None
+        self.pending = 0
+        self.lock = threading.Lock()
+        if filename:
+            self.open(filename)
+
+        return None
+
+
+    def open(self, filename):
+        """persist the results into the SQLite file, the results in the file are reused.
+        Args:
+            filename: the SQLite file.
+        """
+        with self.lock:
+            if self.connection:
+                self.connection.commit()
+                self.connection.close()
+            self.filename = filename
+            self.connection = sqlite3.connect(filename, check_same_thread=False)
+            self.connection.execute("CREATE TABLE IF NOT EXISTS verification (key TEXT PRIMARY KEY, result INTEGER)")
+            self.connection.commit()
+        atexit.register(self.close)
+
+        return None
+
+
+    def key(self, leftExpre, rightExpre, bitnumber):
+        """the key of one verification.
+        Args:
+            leftExpre: left expression.
+            rightExpre: right expression.
+            bitnumber: the number of the bits of the variable.
+        Returns:
+            key: the hex digest, None if the expressions can not be parsed.
+        """
+        try:
+            leftStr = expression_canonical(expression_parse(leftExpre))
+            rightStr = expression_canonical(expression_parse(rightExpre))
+        except ValueError:
+            return None
+        if leftStr > rightStr:
+            (leftStr, rightStr) = (rightStr, leftStr)
+        keyStr = "{bitnumber}|{left}|{right}".format(bitnumber=bitnumber, left=leftStr, right=rightStr)
+
+        return hashlib.sha1(keyStr.encode()).hexdigest()
+
+
+    def get(self, key):
+        """get the result of the verification.
+        Args:
+            key: the key of the verification.
+        Returns:
+            result: True, False, None for not found.
+        """
+        with self.lock:
+            result = self.entryDict.get(key)
+            if result is not None:
+                self.hits += 1
+                self.entryDict.move_to_end(key)
+                return result
+            if self.connection:
+                row = self.connection.execute("SELECT result FROM verification WHERE key = ?", (key,)).fetchone()
+                if row:
+                    self.hits += 1
+                    result = bool(row[0])
+                    self.memory_put(key, result)
+                    return result
+            self.misses += 1
+
+        return None
+
+
+    def memory_put(self, key, result):
+        """put the result into memory, evict the least recently used entry.
+        """
+        self.entryDict[key] = result
+        self.entryDict.move_to_end(key)
+        if len(self.entryDict) > self.maxsize:
+            self.entryDict.popitem(last=False)
+
+        return None
+
+
+    def put(self, key, result):
+        """put the result of the verification into memory and the file.
+        Args:
+            key: the key of the verification.
+            result: the result of the verification.
+        """
+        with self.lock:
+            self.memory_put(key, result)
+            if self.connection:
+                self.connection.execute("INSERT OR REPLACE INTO verification VALUES (?, ?)", (key, int(result)))
+                self.pending += 1
+                #commit in batch
+                if self.pending >= 100:
+                    self.connection.commit()
+                    self.pending = 0
+
+        return None
+
+
+    def info(self):
+        """the statistics of the cache.
+        Returns:
+            infoDict: hits, misses, size, maxsize, hit rate and the SQLite file of the cache.
+        """
+        total = self.hits + self.misses
+        infoDict = {"hits": self.hits, "misses": self.misses, "size": len(self.entryDict), "maxsize": self.maxsize, "hitrate": self.hits / total if total else 0.0, "filename": self.filename}
+
+        return infoDict
+
+
+    def clear(self):
+        """drop all entries in memory and reset the counters, the file is kept.
+        """
+        with self.lock:
+            self.hits = 0
+            self.misses = 0
+            self.entryDict.clear()
+
+        return None
+
+
+    def close(self):
+        """commit and close the SQLite file.
+        """
+        with self.lock:
+            if self.connection:
+                self.connection.commit()
+                self.connection.close()
+                self.connection = None
+                self.pending = 0
+
+        return None
+
+
+VERIFY_CACHE = VerifyCache()
+
+
+def verify_cache_open(filename):
+    """persist the verification results into the SQLite file.
+    """
+    VERIFY_CACHE.open(filename)
+
+    return None
+
+
+def verify_cache_info():
+    """the statistics of the verification cache.
+    """
+    return VERIFY_CACHE.info()
+
+
+def verify_cache_clear():
+    """drop the verification results in memory.
+    """
+    VERIFY_CACHE.clear()
+
+    return None
+
+
+def sample_inputs(nameList, bitnumber=2, samplenumber=SAMPLE_NUMBER, seed=0):
+    """the numpy arrays of the inputs of the variables, all the inputs are enumerated when the number is small,
+    otherwise the inputs are random 64-bit numbers.
+    Args:
+        nameList: the list of the variable names.
+        bitnumber: the number of the bits of the variable.
+        samplenumber: the number of the random inputs.
+        seed: the seed of the random inputs.
+    Returns:
+        (variableDict, exhaustive): the array of every variable, exhaustive is True when all the inputs are enumerated.
+    """
+    total = 2**(bitnumber * len(nameList))
+    variableDict = {}
+    if total <= EXHAUSTIVE_LIMIT:
+        exhaustive = True
+        indexArray = np.arange(total, dtype=np.int64)
+        for (idx, name) in enumerate(nameList):
+            variableDict[name] = (indexArray >> (idx * bitnumber)) & (2**bitnumber - 1)
+    else:
+        exhaustive = False
+        rng = np.random.default_rng(seed)
+        for name in nameList:
+            valueArray = rng.integers(np.iinfo(np.int64).min, np.iinfo(np.int64).max, size=samplenumber, dtype=np.int64, endpoint=True)
+            #the corner values 0 and -1 go first
+            valueArray[:2] = [0, -1]
+            variableDict[name] = valueArray
+
+    return (variableDict, exhaustive)
+
+
+def verify_mba_sample(leftExpre, rightExpre, bitnumber=2, samplenumber=SAMPLE_NUMBER):
+    """check the relation whether the left expression is equal to the right expression on the numpy arrays of inputs,
+    all the inputs are enumerated when the number is small, otherwise the inputs are random 64-bit numbers,
+    the int64 arithmetic wraps around like the 64-bit bit-vector, and the low bits only depend on the low bits.
+    Args:
+        leftExpre: left expression.
+        rightExpre: right expression.
+        bitnumber: the number of the bits of the variable.
+        samplenumber: the number of the random inputs.
+    Returns:
+        (result, exhaustive): result is False on one counterexample, None for failing to evaluate, such as the expression too long for eval,
+                              exhaustive is True when all the inputs are checked.
+    """
+    nameList = [name for name in VERIFY_VARIABLE if re.search("\\b" + name + "\\b", leftExpre + "," + rightExpre)]
+    #one fixed seed, the random module of the generation is not disturbed
+    (variableDict, exhaustive) = sample_inputs(nameList, bitnumber, samplenumber, len(leftExpre) * 1000003 + len(rightExpre))
+    try:
+        with np.errstate(over="ignore"):
+            leftValue = eval(leftExpre, {}, dict(variableDict)) + np.zeros(1, dtype=np.int64)
+            rightValue = eval(rightExpre, {}, dict(variableDict)) + np.zeros(1, dtype=np.int64)
+    except (TypeError, ValueError, OverflowError, NameError, SyntaxError, RecursionError, MemoryError):
+        #the long expression overflows the compiler of python, it is left to the iterative parser and z3
+        return (None, False)
+    difValue = leftValue ^ rightValue
+    if bitnumber < 64:
+        difValue &= 2**bitnumber - 1
+    result = not difValue.any()
+
+    return (result, exhaustive)
+
+
+def verify_mba_unsat(leftExpre, rightExpre, bitnumber=2, prove=True):
     """check the relaion whether the left expression is euqal to the right expression.
+    the numpy check rejects the unequal expressions and proves the equation on all the small inputs,
+    z3 is only called when the random check passes and the proof is requested.
     Args:
         leftExpre: left expression.
         rightExpre: right expression.
         bitnumber: the number of the bits of the variable.
+        prove: prove the equation by z3 after the random check passes, otherwise trust the random check.
     Returns:
         True: equation.
         False: unequal.
     Raises:
         None.
     """
-    x,y,z,t,a,b,c,d,e,f = z3.BitVecs("x y z t a b c d e f", bitnumber)
+    return verify_mba_equation(MBAEquation(leftExpre, rightExpre), bitnumber, prove)
+
 
-    leftEval = eval(leftExpre)
-    rightEval = eval(rightExpre)
+def verify_mba_check(leftExpre, rightExpre, bitnumber=2, prove=True):
+    """check the relaion whether the left expression is euqal to the right expression without the cache.
+    Args:
+        leftExpre: left expression.
+        rightExpre: right expression.
+        bitnumber: the number of the bits of the variable.
+        prove: prove the equation by z3 after the random check passes, otherwise trust the random check.
+    Returns:
+        True: equation.
+        False: unequal.
+    """
+    return verify_mba_equation_check(MBAEquation(leftExpre, rightExpre), bitnumber, prove)
+
+
+def verify_mba_equation(equation, bitnumber=2, prove=True):
+    """verify_mba_unsat on one MBAEquation object, the proved results are cached.
+    Args:
+        equation: the MBAEquation object.
+        bitnumber: the number of the bits of the variable.
+        prove: prove the equation by z3 after the random check passes, otherwise trust the random check.
+    Returns:
+        True: equation.
+        False: unequal.
+    """
+    VERIFY_STATS["calls"] += 1
+    #only the proved results are cached
+    key = None
+    if prove:
+        key = equation.key(bitnumber)
+    if key:
+        result = VERIFY_CACHE.get(key)
+        if result is not None:
+            VERIFY_STATS["cached"] += 1
+            return result
+    result = verify_mba_equation_check(equation, bitnumber, prove)
+    if key:
+        VERIFY_CACHE.put(key, result)
 
-    solver = z3.Solver()
-    solver.add(leftEval != rightEval)
-    result = solver.check()
+    return result
 
-    if str(result) != "unsat":
+
+def verify_mba_equation_check(equation, bitnumber=2, prove=True):
+    """verify_mba_check on one MBAEquation object: the numpy check first, then the z3 proof.
+    """
+    (sampleres, exhaustive) = equation.sample(bitnumber)
+    if sampleres == False:
+        VERIFY_STATS["rejected"] += 1
         return False
-    else:
+    elif sampleres and exhaustive:
+        VERIFY_STATS["exhaustive"] += 1
         return True
+    elif sampleres and not prove:
+        VERIFY_STATS["sampled"] += 1
+        return True
+    VERIFY_STATS["z3"] += 1
+
+    return equation.prove(bitnumber)
+
+
+class MBAEquation():
+    """one equation of two mba expression strings in the verification,
+    the other representations of the expressions, such as the DAG of mba_dag, override the methods.
+    Attributes:
+        leftExpre: left expression.
+        rightExpre: right expression.
+        kind: "linear", "poly" or "mba", the class of the expressions.
+    """
+    def __init__(self, leftExpre, rightExpre, kind="mba"):
+        self.leftExpre = leftExpre
+        self.rightExpre = rightExpre
+        self.kind = kind
+
+        return None
+
+
+    def key(self, bitnumber):
+        """the key of the verification cache, None for no caching.
+        """
+        return VERIFY_CACHE.key(self.leftExpre, self.rightExpre, bitnumber)
+
+
+    def sample(self, bitnumber):
+        """the numpy check.
+        Returns:
+            (result, exhaustive): the same as verify_mba_sample.
+        """
+        return verify_mba_sample(self.leftExpre, self.rightExpre, bitnumber)
+
+
+    def signature(self, bitnumber):
+        """the check by the signature of the linear/poly mba expression.
+        Returns:
+            result: True, False, None when the signature does not apply to the kind.
+        """
+        if self.kind == "linear":
+            return verify_linear_mba(self.leftExpre, self.rightExpre, bitnumber)
+        elif self.kind == "poly":
+            return verify_poly_mba(self.leftExpre, self.rightExpre, bitnumber)
+
+        return None
+
+
+    def prove(self, bitnumber):
+        """the z3 proof.
+        Returns:
+            True: equation.
+            False: unequal.
+        """
+        leftExpre = self.leftExpre
+        rightExpre = self.rightExpre
+        #the long-lived z3 context, the terms are built from the parsed trees
+        try:
+            (result, elapsed) = verify_mba_z3(leftExpre, rightExpre, bitnumber)
+            return result
+        except ValueError:
+            pass
+
+        x,y,z,t,a,b,c,d,e,f = z3.BitVecs("x y z t a b c d e f", bitnumber)
+
+        leftEval = eval(leftExpre)
+        rightEval = eval(rightExpre)
+
+        solver = z3.Solver()
+        solver.add(leftEval != rightEval)
+        result = solver.check()
+
+        if str(result) != "unsat":
+            return False
+        else:
+            return True
+
+
+def verify_stats_info():
+    """the count of the verification.
+    Returns:
+        infoDict: the number of calls, the cached ones, the rejected/proved ones by the numpy check, the z3 calls and the avoided z3 calls.
+    """
+    infoDict = dict(VERIFY_STATS)
+    infoDict["avoided"] = infoDict["calls"] - infoDict["z3"]
+
+    return infoDict
+
+
+def verify_stats_clear():
+    """reset the count of the verification.
+    """
+    for key in VERIFY_STATS:
+        VERIFY_STATS[key] = 0
+
+    return None
 
 
 
@@ -172,7 +551,7 @@ def truthtable_term_list(termList, vnumber=0):
         termList: mba expression string splited by the + or - operator.
         vnumber: the number of variable.
     Returns:
-        result: the result vector presenting by np.array format of the mba expression.
+        result: the result vector presenting by list format of the mba expression.
     Raises:
         through out SystemExit exception.
     """
@@ -184,30 +563,272 @@ def truthtable_term_list(termList, vnumber=0):
     #empty expression
     if not termList:
         return [0] * 2**vnumber
-    result = np.zeros((2**vnumber,), dtype=np.int)
+    result = [0] * 2**vnumber
     for item in termList:
-        itemList = re.split("\*", item)
-        #only bitwise expression or constant
-        if len(itemList) == 1:
-            bitwiseExpre = itemList[0]
-            if bool(re.search("\d", bitwiseExpre)):
-                #constant
-                result += np.array([int(bitwiseExpre) * -1] * 2**vnumber)
-            else:
-                #only bitwise expression
-                if bitwiseExpre[0] == "+":
-                    result += np.array(truthtable_bitwise(bitwiseExpre[1:], vnumber))
-                elif bitwiseExpre[0] == "-":
-                    result -= np.array(truthtable_bitwise(bitwiseExpre[1:], vnumber))
-                else:
-                    result += np.array(truthtable_bitwise(bitwiseExpre, vnumber))
-        #coefficient and bitwise
-        elif len(itemList) == 2:
-            coefficient = int(itemList[0])
-            bitwiseExpre = itemList[1]
-            result += coefficient * np.array(truthtable_bitwise(bitwiseExpre, vnumber))
-
-    return result.tolist()
+        (coefficient, bitwiseExpre) = term_coefficient_bitwise(item)
+        if not coefficient:
+            continue
+        #constant
+        if not bitwiseExpre:
+            result = [value + coefficient for value in result]
+            continue
+        #add the coefficient on the rows where the bitwise expression is true
+        bitmask = truthtable_bitmask(bitwiseExpre, vnumber)
+        row = 0
+        while bitmask:
+            if bitmask & 1:
+                result[row] += coefficient
+            bitmask >>= 1
+            row += 1
+
+    return result
+
+
+def term_coefficient_bitwise(item):
+    """split one term of the linear mba expression into the coefficient and the bitwise expression,
+    the constant c is taken as the term -c on the truth table of the expression equaling to 0.
+    Args:
+        item: one term, such as "-3*(x&y)", "+~x", "5".
+    Returns:
+        (coefficient, bitwiseExpre): bitwiseExpre is None for the constant, coefficient is 0 for the unknown term.
+    """
+    (sign, coe, bitwiseExpre) = term_coefficient_split(item)
+    #constant
+    if not bitwiseExpre:
+        return (-sign * coe, None) if coe is not None else (0, None)
+    #the product of more than one factor is out of the linear mba expression
+    if "*" in bitwiseExpre:
+        return (0, None)
+
+    return (sign * coe if coe is not None else sign, bitwiseExpre)
+
+
+#the packed truth tables of the variables, key: the number of variables.
+BITMASK_VARIABLE = {}
+
+
+def variable_bitmask(vnumber):
+    """the packed truth table of every variable, the i-th bit is the value of the variable on the i-th row.
+    For 2 variables, x = 0b1100, y = 0b1010, the same rows as the function postfix_cal.
+    Args:
+        vnumber: the number of variables.
+    Returns:
+        variableDict: the packed truth table of every variable name.
+        mask: the integer with all 2**vnumber bits set.
+    Raises:
+        through out SystemExit exception.
+    """
+    if vnumber in BITMASK_VARIABLE:
+        return BITMASK_VARIABLE[vnumber]
+    if vnumber == 1:
+        #the only variable takes the lowest bit of the row number
+        nameList = ["x"]
+    elif vnumber in [2, 3, 4]:
+        #the bit of the row number related to every variable
+        nameList = ["y", "x", "z", "t"][:vnumber]
+    else:
+        print("please passing correct argument of the number of variable:1, 2, 3, 4")
+        traceback.print_stack()
+        sys.exit(0)
+    variableDict = {}
+    for (bit, name) in enumerate(nameList):
+        value = 0
+        for row in range(2**vnumber):
+            if (row >> bit) & 1:
+                value |= 1 << row
+        variableDict[name] = value
+    mask = 2**(2**vnumber) - 1
+    BITMASK_VARIABLE[vnumber] = (variableDict, mask)
+
+    return BITMASK_VARIABLE[vnumber]
+
+
+#the operators of the bitwise expression in the tree.
+BITWISE_NODE = ["~", "&", "|", "^"]
+
+
+def bitwise_compile(bitExpre):
+    """compile a bitwise expression into the postfix program by the shared tokenizer and parser,
+    the operators without parentheses follow the precedence of python, "x&y|z" is "(x&y)|z".
+    Args:
+        bitExpre: a bitwise expression, only &, |, ^, ~, parentheses and variables.
+    Returns:
+        program: the tuple of variable names and operators persented in postfix.
+    Raises:
+        through out SystemExit exception.
+    """
+    try:
+        node = expression_parse(bitExpre)
+    except ValueError:
+        print("error in function bitwise_compile, unbalanced parenthesis or unknown character:", bitExpre)
+        traceback.print_stack()
+        sys.exit(0)
+    #the root, the right child and the left child in turn, the reverse is the post-order
+    program = []
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if node[0] == "var":
+            program.append(node[1])
+        elif node[0] in BITWISE_NODE:
+            program.append(node[0])
+            stack.extend(node[1:])
+        else:
+            print("error in function bitwise_compile, it is not a bitwise expression:", bitExpre)
+            traceback.print_stack()
+            sys.exit(0)
+    program.reverse()
+
+    return tuple(program)
+
+
+def bitmask_eval(program, vnumber):
+    """evaluate the postfix program on the packed truth tables of the variables.
+    Python integers are infinite two's complement numbers, so &|^~ are native integer operations,
+    and the mask on the result drops the bits out of the truth table.
+    Args:
+        program: the postfix program from the function bitwise_compile.
+        vnumber: the number of variables.
+    Returns:
+        bitmask: the truth table on a format of integer.
+    Raises:
+        through out SystemExit exception.
+    """
+    (variableDict, mask) = variable_bitmask(vnumber)
+    stack = []
+    for char in program:
+        if char == "~":
+            stack.append(~stack.pop())
+        elif char == "&":
+            operand = stack.pop()
+            stack.append(stack.pop() & operand)
+        elif char == "|":
+            operand = stack.pop()
+            stack.append(stack.pop() | operand)
+        elif char == "^":
+            operand = stack.pop()
+            stack.append(stack.pop() ^ operand)
+        elif char in variableDict:
+            stack.append(variableDict[char])
+        else:
+            print("the variable {var} is out of {vnumber} variables".format(var=char, vnumber=vnumber))
+            traceback.print_stack()
+            sys.exit(0)
+    if len(stack) != 1:
+        print("error in function of bitmask_eval!")
+        traceback.print_stack()
+        sys.exit(0)
+
+    return stack[0] & mask
+
+
+class BitwiseCache():
+    """bounded LRU cache of the bitwise expressions, key: (bitwise expression, the number of variables).
+    Attributes:
+        maxsize: the maximum number of entries in the cache.
+        hits: the number of lookups found in the cache.
+        misses: the number of lookups compiled and evaluated.
+        entryDict: the ordered dictionary, value: (postfix program, packed truth table, truth table tuple).
+    """
+    def __init__(self, maxsize=65536):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.entryDict = collections.OrderedDict()
+
+        return None
+
+
+    def get(self, bitExpre, vnumber):
+        """get the compiled form and the signature of the bitwise expression.
+        Args:
+            bitExpre: a bitwise expression.
+            vnumber: the number of variables in a expression.
+        Returns:
+            entry: (postfix program, packed truth table, truth table tuple).
+        """
+        key = (bitExpre, vnumber)
+        entry = self.entryDict.get(key)
+        if entry:
+            self.hits += 1
+            self.entryDict.move_to_end(key)
+            return entry
+        self.misses += 1
+        program = bitwise_compile(bitExpre)
+        bitmask = bitmask_eval(program, vnumber)
+        entry = (program, bitmask, tuple(bitmask_2_truthtable(bitmask, vnumber)))
+        self.entryDict[key] = entry
+        #evict the least recently used entry
+        if len(self.entryDict) > self.maxsize:
+            self.entryDict.popitem(last=False)
+
+        return entry
+
+
+    def info(self):
+        """the statistics of the cache.
+        Returns:
+            infoDict: hits, misses, size, maxsize and hit rate of the cache.
+        """
+        total = self.hits + self.misses
+        infoDict = {"hits": self.hits, "misses": self.misses, "size": len(self.entryDict), "maxsize": self.maxsize, "hitrate": self.hits / total if total else 0.0}
+
+        return infoDict
+
+
+    def clear(self):
+        """drop all entries and reset the counters.
+        """
+        self.hits = 0
+        self.misses = 0
+        self.entryDict.clear()
+
+        return None
+
+#the process-wide cache used by truthtable_bitmask and truthtable_bitwise.
+BITWISE_CACHE = BitwiseCache()
+
+
+def truthtable_cache_info():
+    """the hit/miss statistics of the bitwise expression cache.
+    Returns:
+        infoDict: hits, misses, size, maxsize and hit rate of the cache.
+    """
+    return BITWISE_CACHE.info()
+
+
+def truthtable_cache_clear():
+    """clear the bitwise expression cache.
+    """
+    BITWISE_CACHE.clear()
+
+    return None
+
+
+def truthtable_bitmask(bitExpre, vnumber):
+    """generate the packed truth table of a bitwise expression, the i-th bit is the value on the i-th row.
+    Args:
+        bitExpre: a bitwise expression.
+        vnumber: the number of variables in a expression.
+    Returns:
+        bitmask: the truth table on a format of integer.
+    """
+    bitmask = BITWISE_CACHE.get(bitExpre, vnumber)[1]
+
+    return bitmask
+
+
+def bitmask_2_truthtable(bitmask, vnumber):
+    """unpack the integer truth table into list.
+    Args:
+        bitmask: the truth table on a format of integer.
+        vnumber: the number of variables.
+    Returns:
+        truthList: a truth table on a format of list.
+    """
+    truthList = [(bitmask >> row) & 1 for row in range(2**vnumber)]
+
+    return truthList
 
 
 def truthtable_bitwise(bitExpre, vnumber):
@@ -218,12 +839,71 @@ def truthtable_bitwise(bitExpre, vnumber):
     Returns:
         truthList: a truth table on a format of list.
     """
-    truthList = postfix_cal(postfix(bitExpre), vnumber)
+    truthList = list(BITWISE_CACHE.get(bitExpre, vnumber)[2])
 
     return truthList
 
 
 
+#the signature matrix of every packed truth table, key: the number of variables.
+SIGNATURE_BASIS = {}
+
+
+def signature_basis_matrix(vnumber):
+    """the precomputed signature matrix of all the packed truth tables,
+    the row of bitmask is the truth table of the bitwise expression whose packed truth table is bitmask.
+    Args:
+        vnumber: the number of variables.
+    Returns:
+        basisMatrix: the numpy array in the shape of (2**(2**vnumber), 2**vnumber).
+    """
+    if vnumber in SIGNATURE_BASIS:
+        return SIGNATURE_BASIS[vnumber]
+    (variableDict, mask) = variable_bitmask(vnumber)
+    rowArray = np.arange(2**vnumber, dtype=np.int64)
+    bitmaskArray = np.arange(mask + 1, dtype=np.int64)
+    basisMatrix = (bitmaskArray[:, None] >> rowArray[None, :]) & 1
+    SIGNATURE_BASIS[vnumber] = basisMatrix
+
+    return basisMatrix
+
+
+def truthtable_matrix(expreList, vnumber):
+    """generate the signature vectors of many linear MBA expressions in one pass,
+    the signature matrix is the product of the coefficient matrix(expressions x packed truth tables)
+    and the basis signature matrix, the coefficient matrix is sparse, so the product is accumulated 
+    on the nonzero coefficients only.
+    Args:
+        expreList: the list of linear MBA expressions.
+        vnumber: the number of variables in the expressions.
+    Returns:
+        signatureMatrix: the numpy array in the shape of (len(expreList), 2**vnumber), 
+                        the i-th row is truthtable_expression(expreList[i], vnumber).
+    """
+    (variableDict, mask) = variable_bitmask(vnumber)
+    rowList = []
+    bitmaskList = []
+    coeList = []
+    for (idx, expreStr) in enumerate(expreList):
+        for item in expression_2_term(expreStr):
+            (coefficient, bitwiseExpre) = term_coefficient_bitwise(item)
+            if not coefficient:
+                continue
+            rowList.append(idx)
+            #the constant is on the truth table with all rows true
+            if bitwiseExpre:
+                bitmaskList.append(truthtable_bitmask(bitwiseExpre, vnumber))
+            else:
+                bitmaskList.append(mask)
+            coeList.append(coefficient)
+    basisMatrix = signature_basis_matrix(vnumber)
+    termMatrix = np.array(coeList, dtype=np.int64)[:, None] * basisMatrix[np.array(bitmaskList, dtype=np.int64)]
+    signatureMatrix = np.zeros((len(expreList), 2**vnumber), dtype=np.int64)
+    np.add.at(signatureMatrix, np.array(rowList, dtype=np.int64), termMatrix)
+
+    return signatureMatrix
+
+
 def truthtable_expression(expreStr, vnumber):
     """generate the truth table on a linear MBA expression.
     Args:
@@ -242,36 +922,21 @@ def truthtable_expression(expreStr, vnumber):
 
 
 def expression_2_term(expreStr):
-    """generate the truth table on a linear MBA expression.
+    """split the mba expression into the terms of the "+" and "-" out of the parentheses.
     Args:
-        expreStr: a linear MBA expression.
+        expreStr: a linear MBA expression, or the non-poly one with "+"/"-" in the parentheses.
     Returns:
-        termList: a list of terms on bitwise expression.
-        constantList: a list of constant term of the linear MBA expression.
-    """
-    itemList = re.split("([\+-])", expreStr)
-    item0 = itemList[0]
-    termList = []
-    constantList = []
-    if item0 != "":
-        itemList.insert(0, "")
-    for (idx, item) in enumerate(itemList):
-        if item == "+" or item == "-" or item == "":
-            continue
-        #bitwise term
-        elif re.search("\w+", item):
-            term = itemList[idx - 1] + itemList[idx]
-            termList.append(term)
-        #constant term
-        elif re.search("\d+", item):
-            term = itemList[idx - 1] + itemList[idx]
-            constantList.append(term)
-        else:
-            print("This is something wrong in mba expression.")
-            traceback.print_stack()
-            sys.exit(0)
+        termList: a list of terms with their signs, such as ["3*(x&y)", "-2*~x", "+5"], in the order of the expression,
+                  the constant terms stay in place, as the regex split did.
+    """
+    try:
+        termList = expression_terms(expreStr)
+    except ValueError:
+        print("This is something wrong in mba expression.")
+        traceback.print_stack()
+        sys.exit(0)
 
-    return termList +  constantList
+    return termList
 
 
 def generate_coe_bit(mbatermList):
@@ -279,32 +944,21 @@ def generate_coe_bit(mbatermList):
     Arg:
         mbatermList: one list of terms.
     Return:
-        coeBitList: one list of pair [coe, bit]
+        coeBitList: one list of pair [coe, bit], coe is the string of the coefficient, 1 or -1 without the coefficient,
+                    the constant c is taken as the pair [-c, "~(x&~x)"].
     """
     coeBitList = []
     for term in mbatermList:
-        itemList = re.split("\*", term)
-        maycoe= itemList[0]
+        (sign, coe, bit) = term_coefficient_split(term)
         #not coefficient
-        if not bool(re.search("\d", maycoe)):
-            bit = itemList[0]
-            bit = bit.replace("+", "")
-            if "-" not in term:
-                coe = 1
-            else:
-                coe = -1
-                bit = bit.replace("-", "")
-            coeBitList.append([coe, bit])
+        if coe is None and bit:
+            coeBitList.append([sign, bit])
         #multi bitwise expression
-        elif len(itemList) >= 2:
-            #1 is for the first time synbol
-            bit = term[len(maycoe)+1:]
-            coeBitList.append([maycoe, bit])
+        elif bit:
+            coeBitList.append([str(sign * coe), bit])
         #only constant
-        elif len(itemList) == 1 and bool(re.search("\d", maycoe)):
-            coeValue = int(maycoe) * -1
-            coeBitList.append([str(coeValue), "~(x&~x)"])
-            
+        elif coe is not None:
+            coeBitList.append([str(-sign * coe), "~(x&~x)"])
         else:
             print("error in function of generate_coe_bit")
             exit(0)
@@ -312,53 +966,22 @@ def generate_coe_bit(mbatermList):
     return coeBitList 
 
 
-def combine_term(mbaExpre):
+def combine_term(mbaExpre, policy=None):
     """combining like terms of the mba expression
     Args:
         mbaExpre: the mba expression.
+        policy: the VerifyPolicy object, None for DEFAULT_POLICY.
     Return:
-        newmbaExpre: new mba expression have combined like terms.
-    """
-    #get pair of coefficient and bitwise on the mba expression
-    termList = expression_2_term(mbaExpre)
-    coeBitList = generate_coe_bit(termList)
-
-    #firstly sort the list
-    coeBitList = sorted(coeBitList, key=lambda x: x[1])
-    #walk the list and combine like terms
-    newcoeBitList = []
-    itemList = coeBitList[0]
-    for item in coeBitList[1:]:
-        if item[1] != itemList[1]:
-            #delete 0 term
-            if itemList[0] != "0":
-                newcoeBitList.append(itemList)
-            itemList = item
-        else:
-            coe1 = itemList[0]
-            coe2 = item[0]
-            coe = eval(coe1) + eval(coe2)
-            itemList[0] = str(coe)
-    #handle the last one term
-    if newcoeBitList[-1][1] != itemList[1]:
-        newcoeBitList.append(itemList)
-    #coefficent and bitwise expression to terms
-    newtermList = []
-    for item in newcoeBitList:
-        coe = item[0]
-        bit = item[1]
-        if coe[0] == "+" or coe[0] == "-":
-            term = "{coe}*{bit}".format(coe=coe, bit=bit)
-        else:
-            coe = "+" + coe
-            term = "{coe}*{bit}".format(coe=coe, bit=bit)
-        newtermList.append(term)
-    #terms to expression
-    newmbaExpre = "".join(newtermList) 
-    if newmbaExpre[0] == "+":
-        newmbaExpre = newmbaExpre[1:]
+        newmbaExpre: new mba expression have combined like terms, sorted by the bitwise expression.
+    """
+    #the constant goes into the term on ~(x&~x) like generate_coe_bit
+    linearMBA = linear_mba_parse(mbaExpre).bitwise_constant().combine().sort()
+    newmbaExpre = linearMBA.to_string()
+
     #verification
-    z3res = verify_mba_unsat(mbaExpre, newmbaExpre)
+    if not policy:
+        policy = DEFAULT_POLICY
+    z3res = policy.verify(mbaExpre, newmbaExpre, kind="linear")
     if not z3res:
         print("error in merge_bitwise!")
         sys.exit(0)
@@ -368,51 +991,19 @@ def combine_term(mbaExpre):
 
 
 
-def addMBA(mbaExpre1, mbaExpre2):
+def addMBA(mbaExpre1, mbaExpre2, policy=None):
     """two mba expression addition.
     Args:
         mbaExpre1: one MBA expression.
         mbaExpre2: another one MBA expression.
+        policy: the VerifyPolicy object, None for DEFAULT_POLICY.
     Return:
         mbaExpre: the mba expression by addition of mbaExpre1 and mbaExpre2
     """
-    #get the coefficient and related bitwise 
-    mbaterm1List = expression_2_term(mbaExpre1)
-    coeBitList1 = generate_coe_bit(mbaterm1List)
-    coeBitDict1 = {}
-    for item in coeBitList1:
-        coeBitDict1[item[1]] = item[0]
-    mbaterm2List = expression_2_term(mbaExpre2)
-    coeBitList2 = generate_coe_bit(mbaterm2List)
-    coeBitDict2 = {}
-    for item in coeBitList2:
-        coeBitDict2[item[1]] = item[0]
-
-    commonKey = set(coeBitDict1.keys()) & set(coeBitDict2.keys())
-    for key in commonKey:
-        coe1 = coeBitDict1[key]
-        coe2 = coeBitDict2[key]
-        res = eval(coe1) + eval(coe2)
-        if not res:
-            coeBitDict1.pop(key)
-        else:
-            coeBitDict1[key] = str(res)
-        coeBitDict2.pop(key)
-    #the last pair of coefficient and bitwise
-    coeBitDict = coeBitDict1
-    coeBitDict.update(coeBitDict2)
-    termList = []
-    for item in coeBitDict.items():
-        term = item[1] + "*" + item[0]
-        if term[0] == "-" or term[0] == "+":
-            termList.append(term)
-        else:
-            term = "+" + term
-            termList.append(term)
-    #construct the mba expression
-    mbaExpre = "".join(termList)
-    if mbaExpre[0] == "+":
-        mbaExpre = mbaExpre[1:]
+    #the products of the bitwise expressions are kept as one key of the IR
+    linearMBA1 = linear_mba_parse(mbaExpre1).bitwise_constant()
+    linearMBA2 = linear_mba_parse(mbaExpre2).bitwise_constant()
+    mbaExpre = linearMBA1.add(linearMBA2).to_string()
 
     #verification
     oriExpre = ""
@@ -420,7 +1011,9 @@ def addMBA(mbaExpre1, mbaExpre2):
         oriExpre = mbaExpre1 + mbaExpre2
     else:
         oriExpre = mbaExpre1 + "+" + mbaExpre2
-    z3res = verify_mba_unsat(oriExpre, mbaExpre)
+    if not policy:
+        policy = DEFAULT_POLICY
+    z3res = policy.verify(oriExpre, mbaExpre, kind="poly")
     if not z3res:
         print("error in addMBA!")
         sys.exit(0)
@@ -433,23 +1026,372 @@ def variable_list(expreStr):
     Args:
         expreStr: the mba expression string.
     Return:
-        variableList: the list of variables.
+        variableList: the list of variables in the order of their first appearance.
     """
-    varSet = set(expreStr)
-    variableList = []
-    for i in varSet:
-        #the variable name
-        if i in ["x", "y", "z", "t", "a", "b", "c", "d", "e", "f"]:
-            variableList.append(i)
+    #the variable name
+    variableList = [name for name in expression_names(expreStr) if name in VERIFY_VARIABLE]
 
     return variableList
 
 
+def truthtable_vnumber(expreStr):
+    """get the number of variables of the truth table containing all the variables of the expression,
+    the variables take the truth table in the order of x, y, z, t, so "x+t" needs the 4-variable truth table.
+    Args:
+        expreStr: the mba expression string.
+    Return:
+        vnumber: the number of variables.
+    """
+    vnumber = 0
+    for (idx, var) in enumerate(["x", "y", "z", "t"]):
+        if var in expreStr:
+            vnumber = idx + 1
+
+    return vnumber
+
+
+def linear_mba_check(expreStr):
+    """check whether the expression is one linear mba expression on the variables x, y, z, t,
+    every term is one constant or the product of one integer coefficient and one bitwise expression.
+    Args:
+        expreStr: the mba expression string.
+    Return:
+        True: linear mba expression.
+        False: others, such as polynomial, non-polynomial mba expression.
+    """
+    expreStr = expreStr.replace(" ", "")
+    if not expreStr:
+        return False
+    for term in re.split("(?<=[^\+\-\*])(?=[\+-])", expreStr):
+        if re.fullmatch("[\+-]*\d+", term):
+            continue
+        matchObj = re.fullmatch("[\+-]*(\d+\*)?([xyzt~&|^()]+)", term)
+        if not matchObj:
+            return False
+        #the parentheses of one bitwise expression must be balanced
+        depth = 0
+        for char in matchObj.group(2):
+            if char == "(":
+                depth += 1
+            elif char == ")":
+                depth -= 1
+                if depth < 0:
+                    return False
+        if depth:
+            return False
+
+    return True
+
+
+def verify_linear_mba(leftExpre, rightExpre, bitnumber=2, z3check=False):
+    """check the relation whether the left linear mba expression is equal to the right one by the signature vectors,
+    on n-bit variables, the linear mba expressions are equal iff the signature vectors are equal modulo 2**n,
+    the expressions out of linear mba are checked by z3.
+    Args:
+        leftExpre: left expression.
+        rightExpre: right expression.
+        bitnumber: the number of the bits of the variable, None for all the bit numbers.
+        z3check: cross-check the result by z3.
+    Returns:
+        True: equation.
+        False: unequal.
+    Raises:
+        through out SystemExit exception.
+    """
+    if not linear_mba_check(leftExpre) or not linear_mba_check(rightExpre):
+        return verify_mba_unsat(leftExpre, rightExpre, bitnumber if bitnumber else 8)
+    vnumber = max([truthtable_vnumber(leftExpre), truthtable_vnumber(rightExpre), 1])
+    leftTruth = truthtable_expression(leftExpre, vnumber)
+    rightTruth = truthtable_expression(rightExpre, vnumber)
+    if bitnumber:
+        modulus = 2**bitnumber
+        result = all((left - right) % modulus == 0 for (left, right) in zip(leftTruth, rightTruth))
+    else:
+        result = leftTruth == rightTruth
+    if z3check:
+        z3res = verify_mba_unsat(leftExpre, rightExpre, bitnumber if bitnumber else 8)
+        if z3res != result:
+            print("the signature vector is inconsistent with z3: ", leftExpre, rightExpre)
+            traceback.print_stack()
+            sys.exit(0)
+
+    return result
+
+
+def poly_add(polyDict1, polyDict2, coefficient=1):
+    """add coefficient * polyDict2 into polyDict1, the polynomial is one dictionary on the minterms,
+    key: the sorted tuple of the rows of the minterms in one monomial, value: the coefficient.
+    Args:
+        polyDict1: one polynomial, updated in place.
+        polyDict2: another one polynomial.
+        coefficient: the coefficient of polyDict2.
+    Returns:
+        polyDict1: the sum of the polynomials.
+    """
+    for (monomial, coe) in polyDict2.items():
+        value = polyDict1.get(monomial, 0) + coefficient * coe
+        if value:
+            polyDict1[monomial] = value
+        elif monomial in polyDict1:
+            polyDict1.pop(monomial)
+
+    return polyDict1
+
+
+def poly_multiply(polyDict1, polyDict2):
+    """the product of two polynomials on the minterms, the minterms are disjoint, m_r & m_s = 0 for r != s,
+    but the product m_r * m_s is not 0, so the monomial keeps the rows of all the minterms.
+    Args:
+        polyDict1: one polynomial.
+        polyDict2: another one polynomial.
+    Returns:
+        polyDict: the product of the polynomials.
+    """
+    polyDict = {}
+    for (monomial1, coe1) in polyDict1.items():
+        for (monomial2, coe2) in polyDict2.items():
+            monomial = tuple(sorted(monomial1 + monomial2))
+            polyDict[monomial] = polyDict.get(monomial, 0) + coe1 * coe2
+    polyDict = {monomial: coe for (monomial, coe) in polyDict.items() if coe}
+
+    return polyDict
+
+
+def poly_parse_sum(expreStr, idx, vnumber):
+    """parse the sum of the products from the position idx to the end or the unmatched ")".
+    Args:
+        expreStr: the expression string without spaces.
+        idx: the start position.
+        vnumber: the number of variables.
+    Returns:
+        (polyDict, idx): the polynomial and the end position, polyDict is None out of the sum of products of bitwise expressions.
+    """
+    polyDict = {}
+    while idx < len(expreStr) and expreStr[idx] != ")":
+        sign = 1
+        while idx < len(expreStr) and expreStr[idx] in "+-":
+            if expreStr[idx] == "-":
+                sign = -sign
+            idx += 1
+        (termDict, idx) = poly_parse_term(expreStr, idx, vnumber)
+        if termDict is None:
+            return (None, idx)
+        poly_add(polyDict, termDict, sign)
+        if idx < len(expreStr) and expreStr[idx] not in "+-)":
+            return (None, idx)
+
+    return (polyDict, idx)
+
+
+def poly_parse_term(expreStr, idx, vnumber):
+    """parse the product of the factors, one factor is one constant, one bitwise expression, 
+    one parenthesized sum of products or ~ of them.
+    Args:
+        expreStr: the expression string without spaces.
+        idx: the start position.
+        vnumber: the number of variables.
+    Returns:
+        (polyDict, idx): the polynomial and the end position, polyDict is None out of the sum of products of bitwise expressions.
+    """
+    termDict = {(): 1}
+    while True:
+        #constant
+        matchObj = re.match("\d+", expreStr[idx:])
+        if matchObj:
+            factorDict = {(): int(matchObj.group())}
+            idx += len(matchObj.group())
+        else:
+            #the unary operators and the variable or the parenthesized expression
+            start = idx
+            while idx < len(expreStr) and expreStr[idx] == "~":
+                idx += 1
+            if idx < len(expreStr) and expreStr[idx] in "xyzt":
+                idx += 1
+            elif idx < len(expreStr) and expreStr[idx] == "(":
+                depth = 0
+                for end in range(idx, len(expreStr)):
+                    if expreStr[end] == "(":
+                        depth += 1
+                    elif expreStr[end] == ")":
+                        depth -= 1
+                        if not depth:
+                            break
+                if depth:
+                    return (None, idx)
+                idx = end + 1
+            else:
+                return (None, idx)
+            factor = expreStr[start:idx]
+            notNumber = factor.index(factor.lstrip("~")[0])
+            if re.fullmatch("[xyzt~&|^()]+", factor):
+                #bitwise expression, the sum of the minterms on the rows where the truth table is 1
+                bitmask = truthtable_bitmask(factor, vnumber)
+                factorDict = {(row,): 1 for row in range(2**vnumber) if (bitmask >> row) & 1}
+            else:
+                (factorDict, end) = poly_parse_sum(expreStr, start + notNumber + 1, vnumber)
+                if factorDict is None or end != idx - 1:
+                    return (None, idx)
+                #~e = -e - 1
+                for i in range(notNumber):
+                    factorDict = poly_add({(): -1}, factorDict, -1)
+        termDict = poly_multiply(termDict, factorDict)
+        if idx < len(expreStr) and expreStr[idx] == "*" and expreStr[idx + 1:idx + 2] != "*":
+            idx += 1
+        else:
+            break
+
+    return (termDict, idx)
+
+
+def poly_homogenize(polyDict, vnumber):
+    """homogenize the polynomial on the minterms by 1 = -(m_0 + m_1 + ... ), since the sum of all the minterms is -1,
+    the homogeneous polynomial of the same function may be different only out of the relation.
+    Args:
+        polyDict: the polynomial.
+        vnumber: the number of variables.
+    Returns:
+        homoDict: the homogeneous polynomial.
+    """
+    if not polyDict:
+        return {}
+    degree = max(len(monomial) for monomial in polyDict)
+    oneDict = {(row,): -1 for row in range(2**vnumber)}
+    homoDict = {}
+    for (monomial, coe) in polyDict.items():
+        termDict = {monomial: coe}
+        for i in range(degree - len(monomial)):
+            termDict = poly_multiply(termDict, oneDict)
+        poly_add(homoDict, termDict)
+
+    return homoDict
+
+
+def bitwise_polynomial(expreStr, vnumber):
+    """the polynomial on the minterms of one sum of products of bitwise expressions,
+    every bitwise expression is the sum of the minterms on the rows where its truth table is 1.
+    Args:
+        expreStr: the expression string, such as "3*(x&y)*~x-2*(x|y)+(x-y)*(x^y)".
+        vnumber: the number of variables.
+    Returns:
+        polyDict: the polynomial, None out of the sum of products of bitwise expressions.
+    """
+    expreStr = expreStr.replace(" ", "")
+    if not expreStr or re.search("[^xyzt~&|^()\d\+\-\*]", expreStr):
+        return None
+    if re.fullmatch("[xyzt~&|^()]+", expreStr):
+        expreStr = "(" + expreStr + ")"
+    (polyDict, idx) = poly_parse_sum(expreStr, 0, vnumber)
+    if polyDict is None or idx != len(expreStr):
+        return None
+
+    return polyDict
+
+
+def verify_poly_mba(leftExpre, rightExpre, bitnumber=2, z3check=False):
+    """check the relation whether the left polynomial mba expression is equal to the right one by the product signature,
+    every product of bitwise expressions is expanded into the monomials of the minterms,
+    the homogeneous difference polynomial on the minterms is 0(mod 2**n) proves the equation on n-bit variables,
+    the others are checked by verify_mba_unsat.
+    Args:
+        leftExpre: left expression.
+        rightExpre: right expression.
+        bitnumber: the number of the bits of the variable, None for all the bit numbers.
+        z3check: cross-check the result by z3.
+    Returns:
+        True: equation.
+        False: unequal.
+    Raises:
+        through out SystemExit exception.
+    """
+    vnumber = max([truthtable_vnumber(leftExpre), truthtable_vnumber(rightExpre), 1])
+    leftDict = bitwise_polynomial(leftExpre, vnumber)
+    rightDict = None
+    if leftDict is not None:
+        rightDict = bitwise_polynomial(rightExpre, vnumber)
+    if leftDict is None or rightDict is None:
+        return verify_mba_unsat(leftExpre, rightExpre, bitnumber if bitnumber else 8)
+    difDict = poly_homogenize(poly_add(dict(leftDict), rightDict, -1), vnumber)
+    if bitnumber:
+        result = all(coe % 2**bitnumber == 0 for coe in difDict.values())
+    else:
+        result = not difDict
+    #the different polynomials may be the same function
+    if not result:
+        result = verify_mba_unsat(leftExpre, rightExpre, bitnumber if bitnumber else 8)
+    elif z3check:
+        z3res = verify_mba_unsat(leftExpre, rightExpre, bitnumber if bitnumber else 8)
+        if not z3res:
+            print("the product signature is inconsistent with z3: ", leftExpre, rightExpre)
+            traceback.print_stack()
+            sys.exit(0)
+
+    return result
+
+
+class VerifyPolicy():
+    """the verification policy honored by every generation stage.
+    Attributes:
+        mode: "off": no verification,
+              "sampled": the numpy check on the random or all inputs, without the z3 proof,
+              "signature": the signature of linear/poly mba expression, verify_mba_unsat for the others,
+              "z3": the proof by verify_mba_unsat on every check, the cached result is returned first,
+                    the equation on all the small inputs is proved by the exhaustive numpy check,
+                    z3 is only called when the inputs are too many to be enumerated.
+        bitnumber: the number of the bits of the variable on every check, None for the default of every stage.
+        finalonly: only verify the final expression of mba_obfuscator, the intermediate stages are skipped.
+    """
+    def __init__(self, mode="signature", bitnumber=None, finalonly=False):
+        if mode not in ["off", "sampled", "signature", "z3"]:
+            print("the verification mode must be in off, sampled, signature, z3!")
+            traceback.print_stack()
+            sys.exit(0)
+        self.mode = mode
+        self.bitnumber = bitnumber
+        self.finalonly = finalonly
 
+        return None
 
 
+    def verify(self, leftExpre, rightExpre, bitnumber=2, kind="mba", final=False):
+        """check the relation whether the left expression is equal to the right expression by the policy.
+        Args:
+            leftExpre: left expression.
+            rightExpre: right expression.
+            bitnumber: the default number of the bits of the stage.
+            kind: "linear", "poly" or "mba", the class of the expressions.
+            final: the check of the final expression.
+        Returns:
+            True: equation or skipped.
+            False: unequal.
+        """
+        return self.verify_equation(MBAEquation(leftExpre, rightExpre, kind), bitnumber, final)
 
 
+    def verify_equation(self, equation, bitnumber=2, final=False):
+        """check one MBAEquation object by the policy, the hook of the expressions not given as strings.
+        Args:
+            equation: the MBAEquation object, or the one of its subclasses.
+            bitnumber: the default number of the bits of the stage.
+            final: the check of the final expression.
+        Returns:
+            True: equation or skipped.
+            False: unequal.
+        """
+        if self.mode == "off":
+            return True
+        if self.finalonly and not final:
+            return True
+        if self.bitnumber:
+            bitnumber = self.bitnumber
+        if self.mode == "sampled":
+            return verify_mba_equation(equation, bitnumber, prove=False)
+        elif self.mode == "signature":
+            result = equation.signature(bitnumber)
+            if result is not None:
+                return result
 
+        return verify_mba_equation(equation, bitnumber)
 
 
+#the policy of the stages called without one policy, the signature checks on every stage.
+DEFAULT_POLICY = VerifyPolicy()
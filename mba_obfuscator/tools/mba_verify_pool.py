@@ -0,0 +1,243 @@
+#!/usr/bin/python3
+
+"""
+This file including the process pool verifying the MBA equations in parallel.
+Every worker keeps one long-lived Z3Verifier with the timeout of one query, the outcome of one query is
+"unsat" for equation, "sat" for unequal and "unknown" when the solver gives up or the worker is stuck.
+A stuck worker is killed by restarting the pool, the other queries are submitted again.
+"""
+
+import collections
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from mba_ast_operation import expression_parse, get_z3_verifier
+from mba_string_operation import verify_mba_sample, VERIFY_CACHE
+
+
+#the z3flag column of the dataset for every outcome.
+Z3_FLAG = {"unsat": True, "sat": False, "unknown": "unknown"}
+
+
+def pool_check(leftExpre, rightExpre, bitnumber, timeout):
+    """check one equation in the worker, the numpy check goes first.
+    Args:
+        leftExpre: left expression.
+        rightExpre: right expression.
+        bitnumber: the number of the bits of the variable.
+        timeout: the timeout of the solver in milliseconds.
+    Returns:
+        result: "unsat", "sat" or "unknown".
+    """
+    (sampleres, exhaustive) = verify_mba_sample(leftExpre, rightExpre, bitnumber)
+    if sampleres is False:
+        return "sat"
+    elif sampleres and exhaustive:
+        return "unsat"
+    try:
+        verifier = get_z3_verifier(bitnumber, timeout)
+        return verifier.check(expression_parse(leftExpre), expression_parse(rightExpre))
+    except ValueError:
+        return "unknown"
+
+
+class Z3VerifyPool():
+    """process pool of the z3 verification.
+    Attributes:
+        workers: the number of the worker processes.
+        timeout: the timeout of one query in milliseconds.
+        bitnumber: the number of the bits of the variable.
+        walltime: the time in seconds after which one query is regarded as stuck.
+        chunksize: the number of the equations the dataset builders verify at once.
+        stats: the number of the queries, the outcomes, the cached ones, the restarts of the pool and the time waiting for the workers.
+    """
+    def __init__(self, workers=None, timeout=60000, bitnumber=2):
+        self.workers = workers if workers else os.cpu_count()
+        self.timeout = timeout
+        self.bitnumber = bitnumber
+        self.walltime = 2 * timeout / 1000 + 5
+        self.chunksize = 4 * self.workers
+        self.stats = {"queries": 0, "unsat": 0, "sat": 0, "unknown": 0, "cached": 0, "restarts": 0, "elapsed": 0.0}
+        #spawn keeps the z3 context of the parent out of the workers
+        self.context = multiprocessing.get_context("spawn")
+        self.pool = None
+
+        return None
+
+
+    def start(self):
+        """start the worker processes.
+        """
+        if not self.pool:
+            self.pool = self.context.Pool(self.workers)
+
+        return None
+
+
+    def restart(self):
+        """kill the worker processes, one of them is stuck.
+        """
+        self.pool.terminate()
+        self.pool.join()
+        self.pool = None
+        self.stats["restarts"] += 1
+        self.start()
+
+        return None
+
+
+    def close(self):
+        """stop the worker processes.
+        """
+        if self.pool:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+        return None
+
+
+    def __enter__(self):
+        self.start()
+        return self
+
+
+    def __exit__(self, excType, excValue, excTrace):
+        if excType:
+            self.pool.terminate()
+            self.pool = None
+        self.close()
+        return False
+
+
+    def verify_iter(self, itemIter, bitnumber=None, window=None):
+        """check a stream of equations in parallel, at most window equations are in the workers at once,
+        the results keep the order of the stream.
+        Args:
+            itemIter: the iterable of (left expression, right expression, payload).
+            bitnumber: the number of the bits of the variable, None for the one of the pool.
+            window: the maximum number of the equations in the workers, None for the chunk size.
+        Yields:
+            (payload, result): result is "unsat", "sat" or "unknown".
+        """
+        if not bitnumber:
+            bitnumber = self.bitnumber
+        if not window:
+            window = self.chunksize
+        self.start()
+        itemIter = iter(itemIter)
+        #every entry: [left expression, right expression, payload, key, async result, result]
+        inflight = collections.deque()
+        exhausted = False
+        while True:
+            while not exhausted and len(inflight) < window:
+                item = next(itemIter, None)
+                if item is None:
+                    exhausted = True
+                    break
+                entry = [item[0], item[1], item[2], VERIFY_CACHE.key(item[0], item[1], bitnumber), None, None]
+                cached = VERIFY_CACHE.get(entry[3]) if entry[3] else None
+                if cached is not None:
+                    entry[5] = "unsat" if cached else "sat"
+                    self.stats["cached"] += 1
+                else:
+                    entry[4] = self.pool.apply_async(pool_check, (entry[0], entry[1], bitnumber, self.timeout))
+                inflight.append(entry)
+            if not inflight:
+                break
+            entry = inflight.popleft()
+            start = time.time()
+            if entry[5] is None:
+                try:
+                    entry[5] = entry[4].get(self.walltime)
+                except multiprocessing.TimeoutError:
+                    entry[5] = "unknown"
+                    #the pool is killed, the unfinished queries are submitted again
+                    for other in inflight:
+                        if other[5] is None and other[4].ready():
+                            other[5] = other[4].get()
+                    self.restart()
+                    for other in inflight:
+                        if other[5] is None:
+                            other[4] = self.pool.apply_async(pool_check, (other[0], other[1], bitnumber, self.timeout))
+                if entry[3] and entry[5] != "unknown":
+                    VERIFY_CACHE.put(entry[3], entry[5] == "unsat")
+            self.stats["elapsed"] += time.time() - start
+            self.stats["queries"] += 1
+            self.stats[entry[5]] += 1
+            yield (entry[2], entry[5])
+
+        return None
+
+
+    def verify_list(self, pairList, bitnumber=None):
+        """check a list of equations in parallel, the results keep the order of the list.
+        Args:
+            pairList: the list of (left expression, right expression).
+            bitnumber: the number of the bits of the variable, None for the one of the pool.
+        Returns:
+            resultList: the list of "unsat", "sat" or "unknown".
+        """
+        itemIter = ((leftExpre, rightExpre, None) for (leftExpre, rightExpre) in pairList)
+
+        return [result for (_, result) in self.verify_iter(itemIter, bitnumber, max(len(pairList), 1))]
+
+
+    def verify(self, leftExpre, rightExpre, bitnumber=None):
+        """check one equation in the pool.
+        Args:
+            leftExpre: left expression.
+            rightExpre: right expression.
+            bitnumber: the number of the bits of the variable, None for the one of the pool.
+        Returns:
+            result: "unsat", "sat" or "unknown".
+        """
+        return self.verify_list([(leftExpre, rightExpre)], bitnumber)[0]
+
+
+    def z3flag_list(self, pairList, bitnumber=None):
+        """check a list of equations in parallel for the z3flag column of the dataset.
+        Args:
+            pairList: the list of (left expression, right expression).
+            bitnumber: the number of the bits of the variable, None for the one of the pool.
+        Returns:
+            flagList: the list of True, False or "unknown".
+        """
+        return [Z3_FLAG[result] for result in self.verify_list(pairList, bitnumber)]
+
+
+    def info(self):
+        """the statistics of the pool.
+        """
+        infoDict = dict(self.stats)
+        infoDict["workers"] = self.workers
+        infoDict["timeout"] = self.timeout
+
+        return infoDict
+
+
+
+def unittest():
+    """unit test of the pool, one hard equation is cut off by the timeout.
+    """
+    pairList = [("x+y", "(x|y)+(x&y)"), ("x^y", "x|y"), ("x*y", "(x&y)*(x|y)+(x&~y)*(~x&y)"), ("x*y*z*t", "t*z*y*x")]
+    with Z3VerifyPool(workers=2, timeout=5000, bitnumber=8) as pool:
+        resultList = pool.verify_list(pairList)
+        print(resultList)
+        #the product over 32 bits is too hard for the timeout
+        resultList += pool.verify_list([("x*y", "(x&y)*(x|y)+(x&~y)*(~x&y)")], 32)
+        print(resultList)
+        if resultList != ["unsat", "sat", "unsat", "unsat", "unknown"]:
+            print("error in the verification pool!")
+            traceback.print_stack()
+            sys.exit(0)
+        print(pool.info())
+
+    return None
+
+
+
+if __name__ == "__main__":
+    unittest()